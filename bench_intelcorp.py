@@ -0,0 +1,513 @@
+# ─────────────────────────────────────────────────────────────
+#  INTELCORP — Banc d'essai hors ligne
+#  Rejoue des réponses OpenCorporates / OpenSanctions / Groq enregistrées
+#  via un stub HTTP local (latence et erreurs injectables), puis pilote
+#  live_search, ai_research, les contrôles sanctions et les callbacks Dash
+#  à concurrence contrôlée. Aucun appel réel, aucun quota consommé.
+#
+#  python bench_intelcorp.py run --concurrency 8 --requests 200
+#  python bench_intelcorp.py run --workers 4 --latency groq=1.5 --errors opencorporates=0.05
+#  python bench_intelcorp.py run --json bench_output.json --baseline bench_base.json
+#  python bench_intelcorp.py capacity --users 50,200,400 --latency opencorporates=1
+#  python bench_intelcorp.py record noms.txt        # ré-enregistre les fixtures (consomme du quota)
+# ─────────────────────────────────────────────────────────────
+import os, sys, json, gzip, time, uuid, random, zlib, resource, argparse, importlib, threading, asyncio
+import multiprocessing as mp
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures.json")
+SCENARIOS = ("live", "ai", "sanctions", "pep", "search_cb", "more_cb", "dossier_cb")
+NAMES = ("Trafigura", "TotalEnergies", "Vitol", "Gunvor", "Mercuria", "Glencore", "Sovcomflot", "Cargill")
+
+# ── STUB AMONT ──────────────────────────────────────────────
+# Un serveur par fournisseur (port distinct → URL de base distincte).
+# La fixture est choisie par hash stable de la requête : même requête,
+# même réponse, et un mélange de résultats vides / non vides.
+
+def _pick(items, key):
+    return items[zlib.crc32(key.encode()) % len(items)]
+
+class Stub(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # file d'accept : des centaines de connexions simultanées (scénario capacity)
+
+    def __init__(self, provider, fixtures, latency=0.0, errors=0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.provider, self.fixtures = provider, fixtures
+        self.latency, self.errors = latency, errors
+        self.calls = 0
+
+    def handle_error(self, request, client_address):
+        # client parti (pool plein côté threads, annulation) : pas une erreur du stub
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme les vraies APIs
+    # réponse écrite en un seul envoi : sans ça, Nagle + ACK retardé ajoutent ~40 ms
+    wbufsize, disable_nagle_algorithm = 65536, True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _serve(self, body_fn):
+        stub = self.server
+        stub.calls += 1
+        if stub.latency:
+            time.sleep(random.uniform(0.7, 1.3) * stub.latency)
+        if random.random() < stub.errors:
+            return self._reply(503, {"error": "injected"})
+        self._reply(200, body_fn())
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = parse_qs(url.query).get("q", [""])[0]
+        fx = self.server.fixtures
+        if self.server.provider == "opencorporates":
+            self._serve(lambda: _pick(fx["opencorporates"], q))
+        else:
+            schema = parse_qs(url.query).get("schema", ["Company"])[0]
+            self._serve(lambda: _pick(fx["opensanctions"][schema], q))
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = req.get("messages", [{}])[-1].get("content", "")
+        kind = "suggest" if prompt.startswith("List real companies") else "research"
+        content = self.server.fixtures["groq"][kind]
+        self._serve(lambda: {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": req.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+def start_stubs(fixtures, latency, errors):
+    stubs = {}
+    for provider in ("opencorporates", "opensanctions", "groq"):
+        stub = Stub(provider, fixtures, latency.get(provider, 0.0), errors.get(provider, 0.0))
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        stubs[provider] = stub
+    return stubs
+
+# ── SCÉNARIOS ───────────────────────────────────────────────
+# Chaque appel utilise un nom unique (cache froid) sauf avec --warm,
+# où l'on tourne sur quelques noms pour mesurer le chemin cache.
+
+def _dash_body(app, part, inputs, state=()):
+    key = next(k for k in app.callback_map if part in k)
+    outs = key.strip(".").split("...") if key.startswith("..") else [key]
+    spec = lambda s: dict(zip(("id", "property"), s.rsplit(".", 1)))
+    return {
+        "output": key,
+        "outputs": [spec(o) for o in outs] if key.startswith("..") else spec(key),
+        "inputs": inputs, "state": list(state),
+        "changedPropIds": [f"{i['id']}.{i['property']}" for i in inputs if isinstance(i, dict)],
+    }
+
+# Octets par callback : [appels, requête, réponse brute, réponse envoyée]
+PAYLOAD, _payload_lock = {}, threading.Lock()
+
+def _decode(r):
+    if r.headers.get("Content-Encoding") == "br":
+        return importlib.import_module("brotli").decompress(r.data)
+    return gzip.decompress(r.data) if r.headers.get("Content-Encoding") == "gzip" else r.data
+
+def _dash_call(client, app, part, inputs, state=()):
+    body = json.dumps(_dash_body(app, part, inputs, state)).encode()
+    r = client.post("/_dash-update-component", data=body, content_type="application/json")
+    if r.status_code == 204:
+        return {}
+    if r.status_code != 200:
+        raise RuntimeError(f"callback {part}: HTTP {r.status_code}")
+    data = _decode(r)
+    with _payload_lock:
+        row = PAYLOAD.setdefault(part.rstrip("@"), [0, 0, 0, 0])
+        for i, n in enumerate((1, len(body), len(data), len(r.data))):
+            row[i] += n
+    return json.loads(data)["response"]
+
+def scenarios(ic, warm):
+    client = ic.server.test_client()
+    client.environ_base["HTTP_ACCEPT_ENCODING"] = "gzip, br"  # comme un navigateur
+    client.get("/")  # premier appel : Dash rattache les callbacks déclarés par dash.callback
+    name = lambda i: NAMES[i % len(NAMES)] if warm else f"{NAMES[i % len(NAMES)]} {uuid.uuid4().hex[:8]}"
+
+    def search_cb(i):
+        req = {"q": name(i), "country": "", "tab": f"bench-{threading.get_ident()}", "seq": i}
+        _dash_call(client, ic.app, "search-response.data",
+                   [{"id": "search-request", "property": "data", "value": req}])
+
+    def more_cb(i):
+        # page suivante demandée au défilement (la frappe a rendu LIVE_PAGE lignes)
+        req = {"q": name(i), "country": "", "src": "opencorporates", "offset": ic.LIVE_PAGE,
+               "tab": f"bench-{threading.get_ident()}", "seq": i}
+        _dash_call(client, ic.app, "search-page.data",
+                   [{"id": "live-more", "property": "data", "value": req}])
+
+    def dossier_cb(i):
+        # les entrées ALL (boutons de ligne) sont des listes, vides ici
+        out = _dash_call(client, ic.app, "analysis-target.data",
+            [[], {"id": "search-btn", "property": "n_clicks", "value": 1}],
+            [[], {"id": "company-input", "property": "value", "value": name(i)}])
+        target, jobs = out["analysis-target"]["data"], out["analysis-jobs"]["data"]
+        ai, sc, deadline = out["dossier-ai"]["data"], out["dossier-sanctions"]["data"], time.time() + ic.JOB_TIMEOUT
+        while jobs and time.time() < deadline:
+            time.sleep(0.05)
+            out = _dash_call(client, ic.app, "dossier-sanctions.data@", [
+                {"id": "dossier-poll", "property": "n_intervals", "value": 1}], [
+                {"id": "analysis-jobs", "property": "data", "value": jobs},
+                {"id": "analysis-target", "property": "data", "value": target},
+                {"id": "dossier-ai", "property": "data", "value": ai},
+                {"id": "dossier-sanctions", "property": "data", "value": sc}])
+            ai = out.get("dossier-ai", {}).get("data", ai)
+            sc = out.get("dossier-sanctions", {}).get("data", sc)
+            jobs = out.get("analysis-jobs", {}).get("data", jobs)
+        if jobs:
+            raise TimeoutError("dossier incomplet")
+        # rendu du dossier : clientside_callback, aucun aller-retour serveur
+
+    return {
+        "live":       lambda i: ic.live_search(name(i), ""),
+        "ai":         lambda i: ic.ai_research(name(i), ""),
+        "sanctions":  lambda i: ic.check_sanctions(name(i)),
+        "pep":        lambda i: ic.check_persons(name(i)),
+        "search_cb":  search_cb,
+        "more_cb":    more_cb,
+        "dossier_cb": dossier_cb,
+    }
+
+# ── MESURE ──────────────────────────────────────────────────
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def run_worker(opts):
+    # Exécuté dans chaque process : import « à froid » comme un worker gunicorn
+    ic = importlib.import_module("intelcorp_v2")
+    rss_import = _rss_mb()
+    table = scenarios(ic, opts["warm"])
+    out = {"pid": os.getpid(), "rss_import": rss_import, "scenarios": {}}
+    for sc in opts["scenarios"]:
+        lat, errors = [], 0
+        def one(i):
+            t = time.perf_counter()
+            try:
+                table[sc](i)
+                return time.perf_counter() - t, None
+            except Exception as e:
+                return time.perf_counter() - t, f"{type(e).__name__}: {e}"
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(opts["concurrency"]) as pool:
+            for dt, err in pool.map(one, range(opts["requests"])):
+                lat.append(dt)
+                errors += err is not None
+        out["scenarios"][sc] = {"lat": lat, "errors": errors, "wall": time.perf_counter() - t0}
+    out["payload"] = PAYLOAD
+    out["rss_end"] = _rss_mb()
+    out["rss_peak"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return out
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+def summarize(workers):
+    report = {"workers": [{k: round(w[k], 1) for k in ("rss_import", "rss_end", "rss_peak")} for w in workers], "scenarios": {}, "payload": {}}
+    for w in workers:
+        for part, row in w["payload"].items():
+            total = report["payload"].setdefault(part, [0, 0, 0, 0])
+            total[:] = [a + b for a, b in zip(total, row)]
+    report["payload"] = {part: {"calls": n, "request": rq // n, "raw": raw // n, "sent": sent // n}
+                         for part, (n, rq, raw, sent) in sorted(report["payload"].items())}
+    for sc in workers[0]["scenarios"]:
+        lat = [x for w in workers for x in w["scenarios"][sc]["lat"]]
+        report["scenarios"][sc] = {
+            "requests": len(lat),
+            "errors": sum(w["scenarios"][sc]["errors"] for w in workers),
+            "rps": round(sum(len(w["scenarios"][sc]["lat"]) / w["scenarios"][sc]["wall"] for w in workers), 2),
+            "p50": round(_pct(lat, 50) * 1000, 1),
+            "p95": round(_pct(lat, 95) * 1000, 1),
+            "p99": round(_pct(lat, 99) * 1000, 1),
+        }
+    return report
+
+def print_report(report, stubs):
+    print(f"{'scénario':<12}{'req':>7}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("─" * 65)
+    for sc, r in report["scenarios"].items():
+        print(f"{sc:<12}{r['requests']:>7}{r['errors']:>6}{r['rps']:>10}{r['p50']:>10}{r['p95']:>10}{r['p99']:>10}")
+    print("─" * 65)
+    if report["payload"]:
+        print(f"{'callback':<28}{'appels':>7}{'requête o':>11}{'brut o':>9}{'envoyé o':>10}")
+        for part, p in report["payload"].items():
+            print(f"{part:<28}{p['calls']:>7}{p['request']:>11}{p['raw']:>9}{p['sent']:>10}")
+        print("─" * 65)
+    for i, w in enumerate(report["workers"]):
+        print(f"worker {i}: RSS {w['rss_import']} Mo après import · {w['rss_end']} Mo en fin · pic {w['rss_peak']} Mo")
+    print("appels amont : " + " · ".join(f"{p} {s.calls}" for p, s in stubs.items()))
+
+def compare(report, baseline, tolerance):
+    # Régression : p95 plus lent ou débit plus faible que la référence au-delà de la tolérance
+    failed = []
+    for sc, r in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(sc)
+        if not base:
+            continue
+        if base["p95"] and r["p95"] > base["p95"] * (1 + tolerance):
+            failed.append(f"{sc}: p95 {base['p95']} → {r['p95']} ms")
+        if base["rps"] and r["rps"] < base["rps"] * (1 - tolerance):
+            failed.append(f"{sc}: débit {base['rps']} → {r['rps']} req/s")
+    return failed
+
+def _specs(values):
+    out = {}
+    for spec in values:
+        provider, _, value = spec.partition("=")
+        out[provider.strip()] = float(value)
+    return out
+
+# ── CAPACITÉ ────────────────────────────────────────────────
+# Recherches en vol tenues par UN process et mémoire consommée : threads
+# (chemin synchrone, une requête par thread, comme un worker gthread) contre
+# coroutines (jumeaux async, INTELCORP_BACKEND=quart). Chemin « upstream » :
+# live_search / alive_search ; « callback » : callback Dash de la frappe via le
+# client de test Flask ou Quart. Stubs dans un process à part (leurs threads
+# ne comptent pas), un process neuf par mesure.
+
+CAPACITY_MODES = ("threads", "asyncio")
+
+def _stub_process(conn, fixtures, latency, errors):
+    stubs = start_stubs(fixtures, latency, errors)
+    conn.send({p: s.url for p, s in stubs.items()})
+    threading.Event().wait()
+
+def _search_req(q, i):
+    return [{"id": "search-request", "property": "data", "value": {"q": q, "country": "", "tab": f"cap-{i}", "seq": 1}}]
+
+def capacity_worker(opts):
+    n, path, aio = opts["users"], opts["path"], opts["mode"] == "asyncio"
+    os.environ["INTELCORP_BACKEND"] = "quart" if aio else "flask"
+    os.environ["GUNICORN_THREADS"] = str(n)  # pool HTTP à la taille des threads
+    ic = importlib.import_module("intelcorp_v2")
+    names = [f"{NAMES[i % len(NAMES)]} {uuid.uuid4().hex[:8]}" for i in range(n + 1)]
+    ok = lambda value: value[1] not in ("none", "degraded") if path == "upstream" else bool(value)
+    peak, stop, lat = [0.0], threading.Event(), []
+
+    def sample():
+        while not stop.is_set():
+            peak[0] = max(peak[0], _rss_mb())
+            stop.wait(0.01)
+
+    def start():
+        # après échauffement (imports différés, clients, callbacks rattachés)
+        base = _rss_mb()
+        threading.Thread(target=sample, daemon=True).start()
+        return base, time.perf_counter()
+
+    if not aio:
+        client = ic.server.test_client() if path == "callback" else None
+        if client:
+            client.get("/")
+        def one(i):
+            t = time.perf_counter()
+            try:
+                if client:
+                    return ok(_dash_call(client, ic.app, "search-response.data", _search_req(names[i], i)))
+                return ok(ic.live_search(names[i], ""))
+            except Exception:
+                return False
+            finally:
+                lat.append(time.perf_counter() - t)
+        one(n)
+        base, t0 = start()
+        with ThreadPoolExecutor(n) as pool:
+            results = list(pool.map(one, range(n)))
+    else:
+        async def run():
+            client = ic.server.test_client() if path == "callback" else None
+            if client:
+                await client.get("/")
+            body = lambda i: _dash_body(ic.app, "search-response.data", _search_req(names[i], i))
+            async def one(i):
+                t = time.perf_counter()
+                try:
+                    if client:
+                        r = await client.post("/_dash-update-component", json=body(i))
+                        return r.status_code == 200 and ok((await r.get_json())["response"])
+                    return ok(await ic.alive_search(names[i], ""))
+                except Exception:
+                    return False
+                finally:
+                    lat.append(time.perf_counter() - t)
+            await one(n)
+            base, t0 = start()
+            return base, t0, await asyncio.gather(*[one(i) for i in range(n)])
+        base, t0, results = asyncio.run(run())
+    wall = time.perf_counter() - t0
+    stop.set()
+    lat = lat[1:]  # sans l'échauffement
+    # en vol : concurrence moyenne effective sur la mesure (loi de Little, Σ latences / durée)
+    return {"mode": opts["mode"], "path": path, "users": n, "wall": round(wall, 2), "errors": results.count(False),
+            "rps": round(n / wall, 1), "p95": round(_pct(lat, 95), 2), "inflight": round(sum(lat) / wall, 1),
+            "rss_base": round(base, 1), "rss_peak": round(max(peak[0], _rss_mb()), 1)}
+
+def run_capacity(users, modes, path):
+    out = []
+    for mode in modes:
+        for n in users:
+            with mp.get_context("spawn").Pool(1) as pool:
+                out.append(pool.apply(capacity_worker, ({"mode": mode, "users": n, "path": path},)))
+    return out
+
+def print_capacity(rows):
+    print(f"{'mode':<9}{'chemin':<10}{'lancées':>8}{'err':>5}{'req/s':>8}{'p95 s':>7}{'en vol':>8}"
+          f"{'RSS repos':>11}{'RSS pic':>9}{'Ko/req':>8}{'en vol/Go':>11}")
+    print("─" * 94)
+    for r in rows:
+        per_req = (r["rss_peak"] - r["rss_base"]) * 1024 / r["users"]
+        print(f"{r['mode']:<9}{r['path']:<10}{r['users']:>8}{r['errors']:>5}{r['rps']:>8}{r['p95']:>7}{r['inflight']:>8}"
+              f"{r['rss_base']:>11}{r['rss_peak']:>9}{per_req:>8.0f}{r['inflight'] * 1024 / r['rss_peak']:>11.0f}")
+    print("─" * 94)
+    base = min((r["rss_base"] for r in rows if r["mode"] == "threads"), default=None)
+    if base:
+        # référence : worker gunicorn sync, une requête en vol par process
+        print(f"worker sync (1 en vol / {base:.0f} Mo) : {1024 / base:.0f} req/Go")
+
+# ── ENREGISTREMENT ──────────────────────────────────────────
+# Interroge les vraies APIs pour quelques noms et remplace les fixtures.
+
+def record(names_path, out):
+    ic = importlib.import_module("intelcorp_v2")
+    with open(names_path, encoding="utf-8") as f:
+        names = [line.strip() for line in f if line.strip()]
+    with open(FIXTURES, encoding="utf-8") as f:
+        fx = json.load(f)
+    fx["opencorporates"], fx["opensanctions"] = [], {"Company": [], "Person": []}
+    headers = {"Authorization": f"ApiKey {os.environ['OPENSANCTIONS_API_KEY']}"} if os.environ.get("OPENSANCTIONS_API_KEY") else {}
+    for name in names:
+        try:
+            r = ic.http_get(f"{ic.UPSTREAMS['opencorporates']}/v0.4/companies/search", params={"q": name, "per_page": ic.LIVE_PAGE})
+            fx["opencorporates"].append(r.json())
+        except Exception as e:
+            print(f"⚠  OpenCorporates {name} : {e}", file=sys.stderr)
+        for schema in ("Company", "Person"):
+            try:
+                r = ic.http_get(f"{ic.UPSTREAMS['opensanctions']}/search/default", params={"q": name, "schema": schema}, headers=headers)
+                fx["opensanctions"][schema].append(r.json())
+            except Exception as e:
+                print(f"⚠  OpenSanctions {name} : {e}", file=sys.stderr)
+    resp = ic.groq_chat(model="llama-3.3-70b-versatile", temperature=0.2, max_tokens=4000,
+        messages=[{"role": "user", "content": f'Due diligence on "{names[0]}". Return ONLY valid JSON with the Intelcorp dossier fields.'}])
+    fx["groq"]["research"] = resp.choices[0].message.content
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(fx, f, ensure_ascii=False, indent=1)
+    print(f"✓ fixtures enregistrées pour {len(names)} noms dans {out}")
+
+# ── CLI ─────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench_intelcorp.py")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="rejoue les fixtures et mesure débit / latences / mémoire")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"parmi {','.join(SCENARIOS)}")
+    p.add_argument("-c", "--concurrency", type=int, default=8, help="requêtes simultanées par worker")
+    p.add_argument("-n", "--requests", type=int, default=100, help="requêtes par scénario et par worker")
+    p.add_argument("-w", "--workers", type=int, default=1, help="process simulant des workers gunicorn")
+    p.add_argument("--warm", action="store_true", help="noms répétés : mesure le chemin cache")
+    p.add_argument("--latency", action="append", default=[], metavar="SOURCE=S",
+        help="latence moyenne injectée, ex : --latency groq=1.5 --latency opencorporates=0.3")
+    p.add_argument("--errors", action="append", default=[], metavar="SOURCE=P",
+        help="taux de 503 injectés, ex : --errors opensanctions=0.05")
+    p.add_argument("--fixtures", default=FIXTURES)
+    p.add_argument("--json", default=None, help="écrit le rapport JSON (référence pour --baseline)")
+    p.add_argument("--baseline", default=None, help="rapport JSON de référence : code 1 si régression")
+    p.add_argument("--tolerance", type=float, default=0.2, help="écart toléré vs la référence (défaut 20 %%)")
+    p = sub.add_parser("capacity", help="recherches en vol par process et mémoire : threads contre asyncio")
+    p.add_argument("-u", "--users", default="50,200,400", help="recherches simultanées, ex : 50,200,400")
+    p.add_argument("--modes", default=",".join(CAPACITY_MODES), help=f"parmi {','.join(CAPACITY_MODES)}")
+    p.add_argument("--path", choices=("upstream", "callback"), default="upstream")
+    p.add_argument("--latency", action="append", default=[], metavar="SOURCE=S",
+        help="latence injectée (défaut 1 s partout : les requêtes restent en vol)")
+    p.add_argument("--errors", action="append", default=[], metavar="SOURCE=P")
+    p.add_argument("--fixtures", default=FIXTURES)
+    p.add_argument("--json", default=None, help="écrit les mesures JSON")
+    p = sub.add_parser("record", help="ré-enregistre les fixtures depuis les vraies APIs")
+    p.add_argument("names", help="fichier texte, un nom de société par ligne")
+    p.add_argument("-o", "--out", default=FIXTURES)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "record":
+        return record(args.names, args.out)
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    if args.cmd == "capacity":
+        latency = _specs(args.latency) or {"opencorporates": 1.0, "opensanctions": 1.0, "groq": 1.0}
+        conn, child = mp.get_context("spawn").Pipe()
+        mp.get_context("spawn").Process(target=_stub_process, args=(child, fixtures, latency, _specs(args.errors)), daemon=True).start()
+        urls = conn.recv()
+    else:
+        stubs = start_stubs(fixtures, _specs(args.latency), _specs(args.errors))
+        urls = {p: s.url for p, s in stubs.items()}
+    # Configuration lue à l'import d'intelcorp_v2 : fixée avant, héritée par les workers
+    os.environ.update({
+        "INTELCORP_OPENCORPORATES_URL": urls["opencorporates"],
+        "INTELCORP_OPENSANCTIONS_URL": urls["opensanctions"],
+        "GROQ_BASE_URL": urls["groq"],
+        "GROQ_API_KEY": "bench", "INTELCORP_LOG_LEVEL": "ERROR",
+        "INTELCORP_REGISTRY_DB": "", "INTELCORP_SANCTIONS_DB": "", "INTELCORP_CACHE_DB": "", "INTELCORP_DOSSIER_DB": "",
+    })
+    if args.cmd == "capacity":
+        modes = [m for m in args.modes.split(",") if m]
+        if set(modes) - set(CAPACITY_MODES):
+            parser.error(f"modes inconnus : {', '.join(sorted(set(modes) - set(CAPACITY_MODES)))}")
+        rows = run_capacity([int(n) for n in args.users.split(",") if n], modes, args.path)
+        print_capacity(rows)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(rows, f, indent=1)
+        return 0
+    opts = {"scenarios": [s for s in args.scenarios.split(",") if s], "concurrency": args.concurrency,
+            "requests": args.requests, "warm": args.warm}
+    unknown = set(opts["scenarios"]) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"scénarios inconnus : {', '.join(sorted(unknown))}")
+
+    if args.workers == 1:
+        workers = [run_worker(opts)]
+    else:
+        with mp.get_context("spawn").Pool(args.workers) as pool:
+            workers = pool.map(run_worker, [opts] * args.workers)
+    report = summarize(workers)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("cmd", "json", "baseline")}
+    print_report(report, stubs)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = compare(report, json.load(f), args.tolerance)
+        for line in failed:
+            print(f"✗ régression {line}", file=sys.stderr)
+        return 1 if failed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,12 +5,33 @@
 # pip3 install dash requests groq
 # export GROQ_API_KEY="gsk_..."
 # python3 intelcorp_v2.py → http://127.0.0.1:8051
+# ASGI : pip3 install -r requirements-async.txt ; INTELCORP_BACKEND=quart uvicorn --factory intelcorp_v2:create_server
+#        en production : Procfile.async (gunicorn + workers uvicorn, à copier en Procfile)
+# Tests : pip3 install pytest ; python3 -m pytest
 # ============================================================
 
-import os, requests, json
-from datetime import datetime
-from dash import Dash, dcc, html, Input, Output, State, no_update, ctx, ALL
-from groq import Groq
+import os, re, sys, uuid, zlib, hashlib, struct, glob, logging, importlib, contextvars, asyncio, weakref, requests, json, time, sqlite3, threading, unicodedata, functools, random, csv, gzip, argparse
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import combinations
+from difflib import SequenceMatcher
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from datetime import datetime, timezone
+from typing import Annotated, Literal
+from pydantic import BaseModel, ConfigDict, BeforeValidator, ValidationError
+from dash import Dash, dcc, html, Input, Output, State, no_update, ctx, ALL, callback, clientside_callback
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-process
+    fcntl = None
+try:
+    import brotli  # optionnel : pip3 install brotli → Content-Encoding br
+except ImportError:
+    brotli = None
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36"}
 
@@ -32,8 +53,6 @@ NAMES = {
 
 # ── CSS Global injecté via index_string ─────────────────────
 CUSTOM_CSS = """
-@import url('https://fonts.googleapis.com/css2?family=DM+Mono:wght@300;400;500&family=Playfair+Display:wght@400;600&display=swap');
-
 * { box-sizing: border-box; margin: 0; padding: 0; }
 
 :root {
@@ -78,582 +97,3754 @@ body { background: var(--bg); color: var(--text); font-family: var(--mono); }
 
 @keyframes pulse { 0%,100%{opacity:1} 50%{opacity:0.4} }
 .loading { animation: pulse 1.2s ease infinite; }
+
+/* Teinte portée par une variable : .tone-* sur le conteneur, var(--tone) dedans */
+.tone-red { --tone: var(--red); } .tone-orange { --tone: var(--orange); } .tone-green { --tone: var(--green); }
+.tone-gold { --tone: var(--gold); } .tone-muted { --tone: var(--text3); } .tone-blue { --tone: #4a9eff; }
+.c-tone { color: var(--tone); }
+
+.ghost-btn { background:transparent; color:var(--gold); border:1px solid rgba(200,169,81,0.4); padding:7px 16px; font-size:10px;
+    letter-spacing:1.5px; cursor:pointer; font-family:var(--mono); border-radius:3px; transition:all 0.2s; white-space:nowrap; }
+
+/* Résultats live (rendus côté navigateur) */
+.live { background:var(--bg2); border:1px solid var(--border); border-radius:6px; overflow:hidden; margin-bottom:24px; }
+.live-head { padding:12px 20px; border-bottom:1px solid var(--border); display:flex; justify-content:space-between; align-items:center; }
+.live-head > div { display:flex; align-items:center; gap:10px; }
+.live-count { color:var(--gold); font-size:9px; letter-spacing:3px; font-weight:500; }
+.live-src { color:var(--tone); font-size:8px; letter-spacing:2px; border:1px solid var(--tone); padding:2px 7px; border-radius:2px; opacity:0.7; }
+.live-hint { color:var(--text3); font-size:10px; }
+.result-row { display:flex; justify-content:space-between; align-items:center; padding:14px 20px; border-bottom:1px solid var(--border); transition:background 0.15s; }
+.row-main { display:flex; align-items:center; gap:16px; flex:1; }
+.row-flag { font-size:26px; line-height:1; min-width:34px; text-align:center; }
+.row-body { flex:1; }
+.row-name { color:#fff; font-size:14px; font-weight:500; margin-bottom:4px; letter-spacing:0.3px; }
+.row-meta { display:flex; gap:16px; flex-wrap:wrap; align-items:center; color:var(--text3); font-size:11px; }
+.row-meta .loc { color:var(--text2); } .row-meta .num { color:var(--border2); font-size:10px; }
+.row-side { display:flex; align-items:center; gap:12px; margin-left:20px; }
+.live-tools { display:flex; gap:10px; margin-top:10px; align-items:center; }
+.live-tools .tool { width:190px; font-family:var(--mono); font-size:11px; }
+.tool-input { background:var(--bg3); border:1px solid var(--border2); color:#fff; padding:8px 12px; font-family:var(--mono);
+    font-size:11px; width:190px; border-radius:3px; outline:none; }
+/* Liste fenêtrée : hauteur de ligne fixe (ROW_H du rendu navigateur) */
+.live-list { max-height:612px; overflow-y:auto; }
+.live-list .result-row { height:68px; box-sizing:border-box; padding-top:0; padding-bottom:0; }
+.live-list .row-main, .live-list .row-body { min-width:0; }
+.live-list .row-name, .live-list .row-meta { white-space:nowrap; overflow:hidden; text-overflow:ellipsis; }
+.live-list .row-meta { flex-wrap:nowrap; }
+.live-loading { height:68px; display:flex; align-items:center; justify-content:center; color:var(--text3); font-size:10px; letter-spacing:2px; }
+.empty { text-align:center; padding:40px; color:var(--text3); font-size:13px; }
+.empty-icon { font-size:30px; margin-bottom:10px; }
+
+/* Dossier */
+.card { background:var(--bg2); border:1px solid var(--border); border-radius:6px; padding:22px 26px; margin-bottom:16px; }
+.card-title { color:var(--tone, var(--gold)); font-size:9px; letter-spacing:4px; font-weight:500; margin-bottom:18px; padding-bottom:10px; border-bottom:1px solid var(--border); }
+.info-row { display:flex; padding:8px 0; border-bottom:1px solid var(--border); }
+.info-label { color:var(--text3); font-size:11px; min-width:210px; letter-spacing:0.5px; }
+.info-val { color:var(--text); font-size:12px; flex:1; letter-spacing:0.3px; }
+.info-val.hl { color:var(--gold); }
+.pending { color:var(--text3); font-size:12px; letter-spacing:1px; }
+.error { color:var(--red); padding:20px; }
+.grid2 { display:grid; grid-template-columns:1fr 1fr; gap:16px; margin-bottom:16px; }
+.grid2.tight { gap:10px; margin-bottom:0; }
+.grid4 { display:grid; grid-template-columns:repeat(4,1fr); gap:10px; margin-bottom:16px; }
+.kicker { color:var(--text3); font-size:9px; letter-spacing:3px; margin-bottom:10px; }
+.kicker.wide { letter-spacing:4px; margin-bottom:12px; }
+.kicker.sep { padding-top:16px; border-top:1px solid var(--border); }
+.banner { background:rgba(255,140,0,0.05); border-left:3px solid var(--tone); padding:12px 16px; margin-bottom:8px; border-radius:3px; }
+.banner.tone-red { background:rgba(255,68,85,0.05); } .banner.tone-green { background:rgba(0,204,102,0.05); }
+.banner.sources { background:rgba(255,140,0,0.06); margin-bottom:16px; }
+.banner-title { color:var(--tone); font-size:9px; letter-spacing:3px; margin-bottom:8px; }
+.tags { display:flex; gap:8px; flex-wrap:wrap; }
+.score-card { border-top:3px solid var(--tone); padding:28px 30px; }
+.score-head { display:flex; justify-content:space-between; align-items:flex-start; }
+.score-id { flex:1; }
+.score-name { font-family:var(--serif); color:#fff; font-size:28px; font-weight:600; margin-bottom:8px; letter-spacing:-0.3px; }
+.score-desc { color:var(--text2); font-size:13px; line-height:1.7; max-width:600px; font-style:italic; }
+.score-risk { text-align:right; padding-left:30px; min-width:160px; }
+.score-risk .kicker { font-size:8px; margin-bottom:6px; }
+.score-level { color:var(--tone); font-size:30px; font-family:var(--serif); font-weight:600; margin-bottom:4px; }
+.watch-btn { margin-top:12px; }
+.score-bar { display:flex; align-items:center; gap:8px; justify-content:flex-end; }
+.bar { flex:1; height:4px; background:var(--border); border-radius:2px; overflow:hidden; }
+.bar-fill { height:100%; background:var(--tone); border-radius:2px; transition:width 1s ease; }
+.bar-label { color:var(--text3); font-size:10px; white-space:nowrap; }
+.mini-card { background:var(--bg); border:1px solid var(--border); border-radius:5px; padding:16px; position:relative; }
+.dir-head { display:flex; justify-content:space-between; align-items:flex-start; margin-bottom:6px; }
+.dir-name { color:#fff; font-size:14px; font-weight:500; }
+.dir-bio { color:var(--text3); font-size:11px; margin-bottom:8px; line-height:1.5; }
+.dir-meta { display:flex; gap:16px; color:var(--text3); font-size:10px; }
+.shares { display:flex; gap:10px; flex-wrap:wrap; }
+.share { background:var(--bg); border:1px solid var(--border); border-radius:5px; padding:14px 18px; text-align:center; min-width:130px; }
+.share-name { color:var(--text); font-size:12px; font-weight:500; margin-bottom:4px; }
+.share-pct { color:var(--gold); font-size:20px; font-family:var(--serif); font-weight:600; margin-bottom:2px; }
+.stat { background:var(--bg); border:1px solid var(--border); border-radius:5px; padding:14px; text-align:center; }
+.stat-label { color:var(--text3); font-size:9px; letter-spacing:2px; margin-bottom:6px; }
+.stat-val { color:var(--tone, var(--text2)); font-size:11px; font-weight:500; }
+.hit-title { color:#ff8899; font-size:13px; font-weight:500; margin-bottom:3px; }
+.hit-detail { color:var(--text3); font-size:10px; }
+.note { color:var(--tone); font-size:12px; }
+.sub-block { margin-top:14px; padding-top:14px; border-top:1px solid var(--border); }
+.sub-title { color:var(--tone); font-size:10px; letter-spacing:2px; margin-bottom:8px; }
+.list-row { display:flex; justify-content:space-between; padding:5px 0; border-bottom:1px solid var(--border); color:var(--text); font-size:12px; }
+.flag-head { display:flex; justify-content:space-between; margin-bottom:3px; }
+.flag-title { color:var(--tone); font-size:11px; font-weight:500; letter-spacing:0.5px; }
+.flag-detail { color:var(--text2); font-size:11px; line-height:1.5; }
+.col-title { color:var(--tone); font-size:9px; letter-spacing:3px; margin-bottom:10px; }
+.bullet { display:flex; gap:8px; margin-bottom:6px; align-items:flex-start; color:var(--text2); font-size:12px; line-height:1.5; }
+.bullet > :first-child { color:var(--tone); margin-top:1px; }
+.verdict { border-left:4px solid var(--tone); padding:24px 28px; }
+.verdict-text { color:var(--text); font-size:14px; line-height:1.8; margin-bottom:20px; font-family:var(--serif); }
+.reco { display:flex; gap:10px; margin-bottom:8px; align-items:flex-start; }
+.reco-num { color:var(--gold); font-size:11px; font-family:var(--serif); font-weight:600; min-width:24px; margin-top:2px; }
+.reco-text { color:var(--text2); font-size:12px; line-height:1.6; }
 """
 
+# ── MÉTRIQUES ───────────────────────────────────────────────
+# Histogrammes de latence par étape (appels amont, parsing JSON, layout Dash)
+# et compteurs (cache, fallbacks, timeouts, erreurs), exposés au format
+# Prometheus sur /metrics. Avec INTELCORP_METRICS_DIR, chaque worker y dépose
+# son instantané et /metrics agrège tous les workers vivants.
+# En-tête « X-Intelcorp-Trace: 1 » → réponse avec Server-Timing par étape.
+
+log = logging.getLogger("intelcorp")
+logging.basicConfig(level=os.environ.get("INTELCORP_LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("httpx").setLevel(logging.WARNING)  # une ligne INFO par requête amont sinon
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+METRICS_DIR = os.environ.get("INTELCORP_METRICS_DIR", "")
+
+class Metrics:
+    def __init__(self):
+        self.counters, self.hists = {}, {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+        self._ensure_flusher()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.hists.get(key)
+            if h is None:
+                h = self.hists[key] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+        self._ensure_flusher()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                "hists": [[n, dict(l), list(h[0]), h[1], h[2]] for (n, l), h in self.hists.items()],
+            }
+
+    def _ensure_flusher(self):
+        # un thread par process (donc après le fork gunicorn)
+        if METRICS_DIR and self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="metrics", daemon=True).start()
+
+    def flush(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(5)
+            try:
+                self.flush()
+            except OSError as e:
+                log.warning("Metrics flush error: %s", e)
+
+    def collect(self):
+        if not METRICS_DIR:
+            return [self.snapshot()]
+        self.flush()
+        snaps = []
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            try:
+                if time.time() - os.path.getmtime(path) > 60:  # worker mort
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    snaps.append(json.load(f))
+            except (OSError, ValueError):
+                pass
+        return snaps
+
+    def render(self):
+        counters, hists = {}, {}
+        for snap in self.collect():
+            for n, l, v in snap["counters"]:
+                key = (n, tuple(sorted(l.items())))
+                counters[key] = counters.get(key, 0) + v
+            for n, l, b, total, count in snap["hists"]:
+                key = (n, tuple(sorted(l.items())))
+                h = hists.setdefault(key, [[0] * len(BUCKETS), 0.0, 0])
+                h[0] = [x + y for x, y in zip(h[0], b)]
+                h[1] += total
+                h[2] += count
+        fmt = lambda labels, **extra: "{" + ",".join(f'{k}="{v}"' for k, v in [*labels, *extra.items()]) + "}"
+        lines, typed = [], set()
+        for (n, l), v in sorted(counters.items()):
+            if n not in typed:
+                lines.append(f"# TYPE {n} counter")
+                typed.add(n)
+            lines.append(f"{n}{fmt(l)} {v}")
+        for (n, l), (b, total, count) in sorted(hists.items()):
+            if n not in typed:
+                lines.append(f"# TYPE {n} histogram")
+                typed.add(n)
+            for bound, c in zip(BUCKETS, b):
+                lines.append(f"{n}_bucket{fmt(l, le=bound)} {c}")
+            lines.append(f"{n}_bucket{fmt(l, le='+Inf')} {count}")
+            lines.append(f"{n}_sum{fmt(l)} {total:.6f}")
+            lines.append(f"{n}_count{fmt(l)} {count}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+_trace = contextvars.ContextVar("intelcorp_trace", default=None)
+
+@contextmanager
+def span(stage):
+    t = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        METRICS.inc("intelcorp_errors_total", stage=stage)
+        raise
+    finally:
+        dt = time.perf_counter() - t
+        METRICS.observe("intelcorp_stage_seconds", dt, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, dt))
+
+# ── CACHE ───────────────────────────────────────────────────
+# Deux niveaux : LRU en mémoire (par worker) + SQLite optionnel partagé
+# par tous les workers gunicorn (INTELCORP_CACHE_DB=/chemin/cache.db).
+
+CACHE_TTL = {
+    "live":      int(os.environ.get("INTELCORP_TTL_LIVE", 6 * 3600)),
+    "ai":        int(os.environ.get("INTELCORP_TTL_AI", 7 * 86400)),
+    "sanctions": int(os.environ.get("INTELCORP_TTL_SANCTIONS", 1800)),
+    "party":     int(os.environ.get("INTELCORP_TTL_PARTY", 6 * 3600)),  # parties liées (graphe de détention)
+}
+CACHE_STALE = int(os.environ.get("INTELCORP_CACHE_STALE", 7 * 86400))
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+_inherited = []  # connexions héritées du master : ni utilisées ni fermées (la fermeture toucherait au WAL du parent)
+
+def local_db(local, connect):
+    # connexion SQLite par thread ET par process : après le fork gunicorn
+    # (--preload), le thread principal du worker retrouverait celle du master
+    db = getattr(local, "db", None)
+    if db is not None and getattr(local, "pid", None) == os.getpid():
+        return db
+    if db is not None:
+        _inherited.append(db)
+    local.db, local.pid = connect(), os.getpid()
+    return local.db
+
+class Cache:
+    def __init__(self, maxsize=2048, path=None):
+        self.maxsize, self.path = maxsize, path
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _db(self):
+        return local_db(self._local, self._connect)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS cache (ns TEXT, key TEXT, value TEXT, expires REAL, PRIMARY KEY (ns, key))")
+        return db
+
+    def peek(self, ns, key):
+        # niveau mémoire seul (sans E/S) : appelable depuis la boucle asyncio
+        with self._lock:
+            item = self._mem.get((ns, key))
+            if item and item[1] > time.time():
+                self._mem.move_to_end((ns, key))
+                return True, item[0]
+        return False, None
+
+    def get(self, ns, key):
+        now = time.time()
+        hit, value = self.peek(ns, key)
+        if hit:
+            return hit, value
+        if self.path:
+            try:
+                row = self._db().execute("SELECT value, expires FROM cache WHERE ns=? AND key=? AND expires>?", (ns, key, now)).fetchone()
+            except sqlite3.Error as e:
+                log.warning("Cache error: %s", e)
+                row = None
+            if row:
+                value = json.loads(row[0])
+                self._remember(ns, key, value, row[1])
+                return True, value
+        return False, None
+
+    def get_stale(self, ns, key):
+        # entrée même expirée (gardée CACHE_STALE s en SQLite) : repli quand l'amont est coupé
+        with self._lock:
+            item = self._mem.get((ns, key))
+        if item:
+            return item[0]
+        if self.path:
+            try:
+                row = self._db().execute("SELECT value FROM cache WHERE ns=? AND key=?", (ns, key)).fetchone()
+            except sqlite3.Error as e:
+                log.warning("Cache error: %s", e)
+                row = None
+            if row:
+                return json.loads(row[0])
+        return None
+
+    def set(self, ns, key, value, ttl):
+        expires = time.time() + ttl
+        self._remember(ns, key, value, expires)
+        if self.path:
+            try:
+                with self._db() as db:
+                    db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?)", (ns, key, json.dumps(value), expires))
+                    if random.random() < 0.01:
+                        db.execute("DELETE FROM cache WHERE expires<?", (time.time() - CACHE_STALE,))
+            except sqlite3.Error as e:
+                log.warning("Cache error: %s", e)
+
+    def _remember(self, ns, key, value, expires):
+        with self._lock:
+            self._mem[(ns, key)] = (value, expires)
+            self._mem.move_to_end((ns, key))
+            while len(self._mem) > self.maxsize:
+                self._mem.popitem(last=False)
+
+CACHE = Cache(int(os.environ.get("INTELCORP_CACHE_SIZE", "2048")), os.environ.get("INTELCORP_CACHE_DB"))
+_cache_hit = contextvars.ContextVar("intelcorp_cache_hit", default=False)
+
+def last_cache_hit():
+    # True si le dernier appel caché de ce thread (ou de cette coroutine) a été servi par le cache
+    return _cache_hit.get()
+
+# ── SINGLE-FLIGHT ───────────────────────────────────────────
+# Des appels concurrents identiques partagent une seule requête amont :
+# dans un worker via un Event, entre workers via un verrou fichier (fcntl)
+# sur INTELCORP_LOCK_DIR — le suiveur relit ensuite le cache SQLite partagé.
+
+LOCK_DIR = os.environ.get("INTELCORP_LOCK_DIR") or (f"{CACHE.path}.locks" if CACHE.path else "")
+
+class SingleFlight:
+    def __init__(self):
+        self._calls, self._lock = {}, threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"event": threading.Event(), "value": None, "error": None}
+        if not leader:
+            METRICS.inc("intelcorp_singleflight_shared_total")
+            call["event"].wait()
+            if call["error"]:
+                raise call["error"]
+            return call["value"]
+        try:
+            call["value"] = fn()
+            return call["value"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+
+FLIGHTS = SingleFlight()
+
+@contextmanager
+def worker_lock(key, timeout=None):
+    # verrou exclusif entre process, un fichier par clé (sha1) supprimé à la
+    # libération ; sans LOCK_DIR ou au-delà du timeout, on continue sans verrou
+    if not LOCK_DIR or fcntl is None:
+        yield
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    path = os.path.join(LOCK_DIR, hashlib.sha1(key.encode()).hexdigest() + ".lock")
+    deadline = time.monotonic() + (ANALYSE_BUDGET if timeout is None else timeout)
+    f = None
+    while time.monotonic() < deadline:
+        f = open(path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.path.exists(path) and os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                break
+        except BlockingIOError:
+            time.sleep(0.05)
+        # occupé, ou fichier supprimé par le détenteur précédent : on recommence
+        f.close()
+        f = None
+    try:
+        yield
+    finally:
+        if f is not None:
+            os.unlink(path)
+            f.close()
+
+def cached(ns, keep=lambda value: value is not None, ttl=None, wait=None):
+    # wait : attente max du verrou inter-worker (défaut ANALYSE_BUDGET)
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = "|".join(normalize(a) for a in args)
+            hit, value = CACHE.get(ns, key)
+            _cache_hit.set(hit)
+            METRICS.inc("intelcorp_cache_total", ns=ns, result="hit" if hit else "miss")
+            if hit:
+                return value
+
+            def load():
+                with worker_lock(f"{ns}|{key}", wait):
+                    hit, value = CACHE.get(ns, key)  # rempli par un autre worker pendant l'attente
+                    if hit:
+                        return value
+                    value = fn(*args)
+                    if keep(value):
+                        CACHE.set(ns, key, value, ttl(*args) if ttl else CACHE_TTL[ns])
+                    return value
+            return FLIGHTS.do(f"{ns}|{key}", load)
+        return wrapper
+    return decorator
+
+# ── HTTP ────────────────────────────────────────────────────
+# Une session et un client Groq par process : keep-alive, pool dimensionné
+# sur les threads du worker + ceux du fan-out, retries bornés avec backoff.
+
+POOL_THREADS = int(os.environ.get("INTELCORP_POOL", "16"))
+HTTP_POOL = POOL_THREADS + int(os.environ.get("GUNICORN_THREADS", "1"))
+RETRY_AFTER_MAX = float(os.environ.get("INTELCORP_RETRY_AFTER_MAX", "10"))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# URLs de base surchargeables (stub local du banc d'essai, proxy, mock)
+UPSTREAMS = {
+    "opencorporates": os.environ.get("INTELCORP_OPENCORPORATES_URL", "https://api.opencorporates.com").rstrip("/"),
+    "opensanctions":  os.environ.get("INTELCORP_OPENSANCTIONS_URL", "https://api.opensanctions.org").rstrip("/"),
+    "groq":           os.environ.get("GROQ_BASE_URL", "https://api.groq.com").rstrip("/"),
+}
+TIMEOUTS = {  # (connexion, lecture) par fournisseur
+    "opencorporates": (3.05, 6),
+    "opensanctions":  (3.05, 8),
+    "groq":           (3.05, 60),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Échéance du fan_out en cours (time.monotonic), propagée avec le contexte :
+# un appel lancé pour un dossier plafonne ses délais au budget restant et
+# renonce une fois l'échéance passée (un thread du pool ne s'annule pas).
+_deadline = contextvars.ContextVar("intelcorp_deadline", default=None)
+
+class BudgetExceeded(requests.Timeout):
+    pass
+
+def budget_left():
+    # secondes restantes (None hors fan_out) ; BudgetExceeded une fois l'échéance passée
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise BudgetExceeded("budget d'analyse épuisé")
+    return left
+
+class _Retry(Retry):
+    # Retry-After respecté, mais plafonné : au-delà on préfère échouer vite
+    def get_retry_after(self, response):
+        after = super().get_retry_after(response)
+        return None if after is None else min(after, RETRY_AFTER_MAX)
+
+    def increment(self, *args, **kwargs):
+        # sous fan_out, plus de relance après l'échéance : l'erreur remonte telle quelle
+        deadline = _deadline.get()
+        if deadline is not None and time.monotonic() >= deadline:
+            return Retry.increment(self.new(total=0, connect=0, read=False, status=0), *args, **kwargs)
+        return super().increment(*args, **kwargs)
+
+def _session():
+    s = requests.Session()
+    retry = _Retry(
+        total=3, connect=2, read=1, status=2,
+        status_forcelist=RETRY_STATUS, allowed_methods=("GET",),
+        backoff_factor=0.4, backoff_max=5, backoff_jitter=0.3,
+        respect_retry_after_header=True, raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL, max_retries=retry)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update(HEADERS)
+    return s
+
+_http, _http_lock = (None, None), threading.Lock()
+
+def http():
+    # session créée au premier appel de chaque process : un pool ouvert dans
+    # le master gunicorn (--preload) serait partagé par les workers forkés
+    global _http
+    with _http_lock:
+        if _http[0] != os.getpid():
+            _http = (os.getpid(), _session())
+        return _http[1]
+
+PROVIDERS = {urlparse(url).netloc: provider for provider, url in UPSTREAMS.items()}
+
+# Quotas et disjoncteurs par fournisseur (Guard) : seau à jetons dont le débit
+# est divisé par deux à chaque 429 puis remonte par paliers, et disjoncteur
+# ouvert après BREAKER_FAILS échecs consécutifs (429, 5xx, timeout). Ouvert,
+# l'appel échoue tout de suite (CircuitOpen) et l'appelant se replie sur le
+# cache ou l'index local ; après BREAKER_COOLDOWN une seule sonde passe.
+# Avec LOCK_DIR, l'état vit dans un fichier verrouillé partagé par les workers.
+BREAKER_FAILS = int(os.environ.get("INTELCORP_BREAKER_FAILS", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("INTELCORP_BREAKER_COOLDOWN", "30"))
+GUARD_FIELDS = ("tokens", "stamp", "rate", "open_until", "failures")
+
+class CircuitOpen(requests.ConnectionError):
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} : {reason}")
+        self.provider, self.reason = provider, reason
+
+class Guard:
+    def __init__(self, provider, rate=None, burst=None, path=None):
+        self.provider, self.base, self.path = provider, rate, path
+        self.burst = burst or max(1.0, rate or 1.0)
+        self._lock = threading.Lock()
+        self._mem = self._initial()
+
+    def _initial(self):
+        return {"tokens": self.burst, "stamp": time.time(), "rate": self.base or 0.0, "open_until": 0.0, "failures": 0.0}
+
+    @contextmanager
+    def _state(self):
+        # fichier ouvert à chaque appel : un descripteur hérité du fork
+        # partagerait son verrou flock entre workers ; écriture non bufferisée
+        # faite avant la libération du verrou
+        with self._lock:
+            if not self.path or fcntl is None:
+                yield self._mem
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.pread(fd, 40, 0)
+                st = dict(zip(GUARD_FIELDS, struct.unpack("5d", raw))) if len(raw) == 40 else self._initial()
+                if not self.base or not 0 < st["rate"] <= self.base:  # quota reconfiguré depuis
+                    st["rate"] = self.base or 0.0
+                yield st
+                os.pwrite(fd, struct.pack("5d", *(st[k] for k in GUARD_FIELDS)), 0)
+            finally:
+                os.close(fd)  # libère le verrou
+
+    def reserve(self, max_wait=None):
+        # Réserve un jeton → secondes à attendre (hors verrou). CircuitOpen si le
+        # disjoncteur est ouvert, ou si l'attente dépasserait max_wait (appel interactif).
+        with self._state() as st:
+            now = time.time()
+            if st["open_until"] > now:
+                METRICS.inc("intelcorp_guard_rejected_total", provider=self.provider, reason="circuit")
+                raise CircuitOpen(self.provider, "disjoncteur ouvert")
+            if st["failures"] >= BREAKER_FAILS:  # demi-ouvert : cette sonde passe, les autres attendent son verdict
+                st["open_until"] = now + BREAKER_COOLDOWN
+            wait_for = 0
+            if st["rate"]:
+                st["tokens"] = min(self.burst, st["tokens"] + (now - st["stamp"]) * st["rate"])
+                st["stamp"] = now
+                wait_for = (1 - st["tokens"]) / st["rate"] if st["tokens"] < 1 else 0
+                if max_wait is not None and wait_for > max_wait:
+                    METRICS.inc("intelcorp_guard_rejected_total", provider=self.provider, reason="quota")
+                    raise CircuitOpen(self.provider, "quota")
+                st["tokens"] -= 1
+        return wait_for
+
+    def acquire(self, max_wait=None):
+        wait_for = self.reserve(max_wait)
+        if wait_for:
+            time.sleep(wait_for)
+
+    async def aacquire(self, max_wait=None):
+        # même réservation, attente sans bloquer la boucle asyncio ; état
+        # partagé (flock) lu dans un thread : un verrou contendu gèlerait la boucle
+        wait_for = await asyncio.to_thread(self.reserve, max_wait) if self.path else self.reserve(max_wait)
+        if wait_for:
+            await asyncio.sleep(wait_for)
+
+    def success(self):
+        with self._state() as st:
+            st["failures"], st["open_until"] = 0, 0
+            if self.base and st["rate"] < self.base:
+                st["rate"] = min(self.base, st["rate"] + self.base / 8)
+
+    def failure(self, throttled=False, retry_after=None):
+        with self._state() as st:
+            st["failures"] += 1
+            if throttled and self.base:
+                st["rate"] = max(self.base / 16, st["rate"] / 2)
+            if st["failures"] >= BREAKER_FAILS:
+                st["open_until"] = time.time() + max(BREAKER_COOLDOWN, retry_after or 0)
+                METRICS.inc("intelcorp_breaker_trips_total", provider=self.provider)
+                log.warning("Circuit %s ouvert (%d échecs)", self.provider, st["failures"])
+
+    def is_open(self):
+        with self._state() as st:
+            return st["open_until"] > time.time()
+
+def make_guard(provider, rate=None):
+    path = os.path.join(LOCK_DIR, f"guard-{provider}") if LOCK_DIR else None
+    if path:
+        os.makedirs(LOCK_DIR, exist_ok=True)
+    return Guard(provider, rate, path=path)
+
+GUARDS = {p: make_guard(p, float(os.environ[f"INTELCORP_RATE_{p.upper()}"]) if os.environ.get(f"INTELCORP_RATE_{p.upper()}") else None)
+          for p in UPSTREAMS}
+
+def degraded():
+    # fournisseurs dont le disjoncteur est ouvert
+    return [p for p, g in GUARDS.items() if g.is_open()]
+
+def _retry_after(headers):
+    try:
+        return float((headers or {}).get("retry-after") or 0) or None
+    except ValueError:
+        return None
+
+def http_get(url, max_wait=None, **kwargs):
+    provider = PROVIDERS.get(urlparse(url).netloc)
+    guard = GUARDS.get(provider)
+    timeout = kwargs.pop("timeout", TIMEOUTS.get(provider, DEFAULT_TIMEOUT))
+    left = budget_left()
+    if left is not None:  # fan_out : ni attente ni lecture au-delà du budget
+        timeout = tuple(min(t, left) for t in timeout) if isinstance(timeout, tuple) else min(timeout, left)
+        max_wait = left if max_wait is None else min(max_wait, left)
+    if guard:
+        guard.acquire(max_wait)
+    try:
+        r = http().get(url, timeout=timeout, **kwargs)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if guard and not (left is not None and isinstance(e, requests.Timeout)):  # délai écourté : pas une panne
+            guard.failure()
+        raise
+    if guard:
+        if r.status_code == 429 or r.status_code >= 500:
+            guard.failure(r.status_code == 429, _retry_after(r.headers))
+        else:
+            guard.success()
+    r.raise_for_status()
+    return r
+
+_groq, _groq_lock = None, threading.Lock()
+
+def _groq_sdk():
+    # import différé (~120 ms, httpx compris) : au premier appel Groq, ou dans
+    # le master gunicorn avec create_server(preload=True)
+    import groq
+    return groq
+
+def groq_client():
+    global _groq
+    with _groq_lock:
+        if _groq is None:
+            _groq = _groq_sdk().Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=2,
+                                     base_url=UPSTREAMS["groq"], timeout=TIMEOUTS["groq"][1])
+        return _groq
+
+def _groq_failure(guard, e):
+    sdk = _groq_sdk()
+    if isinstance(e, sdk.RateLimitError):
+        guard.failure(True, _retry_after(e.response.headers))
+    elif isinstance(e, sdk.APIStatusError):  # 400 (json_validate_failed…) : Groq répond, ce n'est pas une panne
+        if e.status_code >= 500:
+            guard.failure()
+        else:
+            guard.success()
+    elif isinstance(e, sdk.APIConnectionError):
+        guard.failure()
+
+def groq_chat(max_wait=None, **kwargs):
+    guard, client, left = GUARDS["groq"], groq_client(), budget_left()
+    if left is not None:  # fan_out : une relance du SDK partirait après l'échéance
+        client = client.with_options(timeout=min(left, TIMEOUTS["groq"][1]), max_retries=0)
+        max_wait = left if max_wait is None else min(max_wait, left)
+    guard.acquire(max_wait)
+    try:
+        resp = client.chat.completions.create(**kwargs)
+    except Exception as e:
+        if not (left is not None and isinstance(e, _groq_sdk().APITimeoutError)):  # délai écourté : pas une panne
+            _groq_failure(guard, e)
+        raise
+    guard.success()
+    return resp
+
+# ── ROUTEUR LLM ─────────────────────────────────────────────
+# Un modèle par tâche (INTELCORP_MODEL_<TÂCHE> = modèles par ordre de
+# préférence) : petit modèle rapide pour les suggestions de frappe, grand
+# modèle pour les dossiers. Latence et erreurs glissantes par modèle (par
+# worker) : un modèle en erreur ou dont la médiane dépasse l'objectif passe
+# après les autres. Pour « suggest », une requête de couverture part après
+# le p95 observé et la première réponse l'emporte.
+
+MODEL_ROUTES = {
+    "suggest": os.environ.get("INTELCORP_MODEL_SUGGEST", "llama-3.1-8b-instant,llama-3.3-70b-versatile"),
+    "dossier": os.environ.get("INTELCORP_MODEL_DOSSIER", os.environ.get("INTELCORP_AI_MODEL", "llama-3.3-70b-versatile")),
+}
+MODEL_ROUTES = {task: [m.strip() for m in models.split(",") if m.strip()] for task, models in MODEL_ROUTES.items()}
+MODEL_SLO = {"suggest": 1.0, "dossier": 15}  # latence médiane visée (s)
+ROUTER_WINDOW = 100  # derniers appels retenus par modèle…
+ROUTER_HORIZON = 300  # …dans les 5 dernières minutes : un modèle écarté est retenté ensuite
+ROUTER_MAX_ERRORS = 0.3
+HEDGE_TASKS = {"suggest"}
+HEDGE_DELAY = (0.3, 2.0)  # bornes du délai de couverture ; min tant qu'il n'y a pas d'historique
+HEDGE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+class ModelRouter:
+    def __init__(self, routes, window=ROUTER_WINDOW):
+        self.routes, self.window = routes, window
+        self.calls = {}  # modèle → deque de (horodatage, latence, ok)
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds, ok):
+        with self._lock:
+            self.calls.setdefault(model, deque(maxlen=self.window)).append((time.time(), seconds, ok))
+
+    def stats(self, model):
+        # → (taux d'erreur, médiane, p95 des succès) ; latences None sous 20 succès
+        since = time.time() - ROUTER_HORIZON
+        with self._lock:
+            calls = [(s, good) for ts, s, good in self.calls.get(model, ()) if ts >= since]
+        ok = sorted(s for s, good in calls if good)
+        errors = (len(calls) - len(ok)) / len(calls) if calls else 0.0
+        if len(ok) < 20:
+            return errors, None, None
+        return errors, ok[len(ok) // 2], ok[int(len(ok) * 0.95)]
+
+    def order(self, task):
+        # ordre de préférence, modèles sains (erreurs et médiane dans l'objectif) d'abord
+        models = self.routes[task]
+        def healthy(m):
+            errors, p50, _ = self.stats(m)
+            return errors < ROUTER_MAX_ERRORS and (p50 is None or p50 <= MODEL_SLO[task])
+        return sorted(models, key=lambda m: not healthy(m))
+
+    def hedge_delay(self, model):
+        p95 = self.stats(model)[2]
+        return min(max(p95 or 0, HEDGE_DELAY[0]), HEDGE_DELAY[1])
+
+ROUTER = ModelRouter(MODEL_ROUTES)
+
+def count_tokens(resp, call):
+    usage, model = getattr(resp, "usage", None), getattr(resp, "model", "") or ""
+    if usage:
+        METRICS.inc("intelcorp_llm_tokens_total", usage.prompt_tokens or 0, call=call, model=model, kind="prompt")
+        METRICS.inc("intelcorp_llm_tokens_total", usage.completion_tokens or 0, call=call, model=model, kind="completion")
+        log.debug("LLM %s %s : %s + %s tokens", call, model, usage.prompt_tokens, usage.completion_tokens)
+    return (usage.completion_tokens or 0) if usage else 0
+
+def _llm_record(task, model, t, error=None):
+    # 400 (json_validate_failed…) : le modèle a répondu
+    dt, ok = time.perf_counter() - t, error is None or isinstance(error, _groq_sdk().BadRequestError)
+    ROUTER.record(model, dt, ok)
+    METRICS.inc("intelcorp_llm_calls_total", task=task, model=model, result="ok" if ok else "error")
+    if error is None:
+        METRICS.observe("intelcorp_llm_seconds", dt, task=task, model=model)
+
+def _llm_call(task, model, max_wait, kwargs):
+    t = time.perf_counter()
+    try:
+        resp = groq_chat(max_wait, model=model, **kwargs)
+    except CircuitOpen:  # fournisseur en pause : rien à reprocher au modèle
+        raise
+    except Exception as e:
+        _llm_record(task, model, t, e)
+        raise
+    _llm_record(task, model, t)
+    return resp
+
+def llm_chat(task, max_wait=None, **kwargs):
+    # Appel Groq routé : modèle choisi pour la tâche, couverture pour HEDGE_TASKS
+    models = ROUTER.order(task)
+    if task not in HEDGE_TASKS:
+        return _llm_call(task, models[0], max_wait, kwargs)
+    first = HEDGE_POOL.submit(contextvars.copy_context().run, _llm_call, task, models[0], max_wait, kwargs)
+    futures = [first]
+    done, _ = wait(futures, timeout=ROUTER.hedge_delay(models[0]))
+    error = first.exception() if done else None
+    if not done or error and not isinstance(error, CircuitOpen):
+        # lente ou en échec : seconde requête sur le modèle suivant (ou le même)
+        METRICS.inc("intelcorp_llm_hedges_total", task=task, reason="slow" if not done else "error")
+        hedge = models[1] if len(models) > 1 else models[0]
+        futures.append(HEDGE_POOL.submit(contextvars.copy_context().run, _llm_call, task, hedge, max_wait, kwargs))
+    error = None
+    for fut in as_completed(futures):
+        try:
+            resp = fut.result()
+        except Exception as e:
+            error = error or e
+            continue
+        if fut is not first:
+            METRICS.inc("intelcorp_llm_hedges_won_total", task=task)
+        return resp
+    raise error
+
+# ── REGISTRE LOCAL ──────────────────────────────────────────
+# Index SQLite FTS5 construit depuis un export bulk (OpenCorporates CSV) :
+#   python3 intelcorp_v2.py build-registry companies.csv.gz
+# Fichier ouvert en lecture seule + mmap : partagé par tous les workers
+# via le page cache. live_search l'interroge avant le réseau.
+
+REGISTRY_DB = os.environ.get("INTELCORP_REGISTRY_DB", "")
+LIVE_PAGE = 12
+FUZZY_MIN = float(os.environ.get("INTELCORP_FUZZY_MIN", "0.45"))
+
+def _grams(norm):
+    norm = f"  {norm} "
+    return {norm[i:i+3] for i in range(len(norm) - 2)}
+
+def trigrams(text):
+    return _grams(normalize(text))
+
+def _jaccard(ta, tb):
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+def similarity(a, b):
+    return _jaccard(trigrams(a), trigrams(b))
+
+def name_score(query, name):
+    # query et name déjà normalisés. Un début de nom tapé avec une faute doit
+    # rester bien classé : on compare aussi aux premiers mots du nom.
+    tq, words = _grams(query), name.split()
+    return max(_jaccard(tq, _grams(name)), _jaccard(tq, _grams(" ".join(words[:len(query.split())]))))
+
+def fuzzy_candidates(db, table, q, sql, extra=(), cap=200):
+    # Lignes partageant au moins 2 des trigrammes les plus rares de q (paires
+    # les plus rares d'abord) : sélectif même avec une faute de frappe.
+    # sql reçoit l'expression MATCH en premier paramètre, puis extra.
+    docs = ((g, db.execute(f"SELECT doc FROM {table}_vocab WHERE term = ?", (g,)).fetchone())
+            for g in _grams(q) if " " not in g)
+    rare = sorted(((d[0], g) for g, d in docs if d))[:6]
+    pairs = sorted(combinations(rare, 2)) if len(rare) > 1 else [(r,) for r in rare]
+    cand = {}
+    for pair in pairs:
+        match = " AND ".join(f'"{g}"' for _, g in pair)
+        for r in db.execute(sql, (match, *extra)):
+            cand.setdefault(r["id"], r)
+            if len(cand) >= cap:
+                return list(cand.values())
+    return list(cand.values())
+
+def _open_ro(path):
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    db.execute("PRAGMA mmap_size=268435456")
+    db.row_factory = sqlite3.Row
+    return db
+
+def _thread_db(local, path, connect):
+    # connexion par thread, rouverte si le fichier a été remplacé (build-* fait
+    # un os.replace : l'ancienne connexion lirait l'index supprimé jusqu'au redémarrage)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    sig = (os.getpid(), st.st_ino, st.st_mtime_ns)
+    if getattr(local, "sig", None) != sig:
+        if getattr(local, "sig", (os.getpid(),))[0] != os.getpid():
+            _inherited.append(local.db)  # héritée du master : jamais fermée ici
+        elif getattr(local, "db", None) is not None:
+            local.db.close()
+        local.db, local.sig = connect(path), sig
+    return local.db
+
+_registry_local = threading.local()
+
+def _registry():
+    if not REGISTRY_DB:
+        return None
+    return _thread_db(_registry_local, REGISTRY_DB, _open_ro)
+
+def _registry_row(row):
+    cc = row["cc"]
+    return {
+        "nom": row["nom"], "numero": row["numero"],
+        "cc": cc, "jcode": row["jcode"], "pays": NAMES.get(cc, row["jcode"].upper()),
+        "flag": FLAGS.get(cc, "🏳️"),
+        "statut": row["statut"], "date": row["date"], "ville": row["ville"],
+        "type": row["type"], "url": row["url"],
+    }
+
+def registry_search(query, country_filter="", limit=LIVE_PAGE):
+    db = _registry()
+    q = normalize(query)
+    if db is None or len(q) < 2:
+        return []
+    where = " AND c.cc = ?" if country_filter else ""
+    extra = (country_filter,) if country_filter else ()
+    try:
+        # 1. préfixe / tokens : chaque mot tapé doit commencer un mot du nom
+        match = " ".join(f'"{t}"*' for t in q.replace('"', " ").split())
+        rows = db.execute(f"""SELECT c.* FROM companies c JOIN (SELECT rowid, rank FROM companies_fts
+            WHERE companies_fts MATCH ? LIMIT 2000) f ON c.id = f.rowid
+            WHERE 1{where} ORDER BY f.rank LIMIT ?""", (match, *extra, limit)).fetchall()
+        if len(rows) >= limit or len(q) < 3:
+            return [_registry_row(r) for r in rows]
+        # 2. fuzzy : candidats par trigrammes rares, classés par similarité
+        seen = {r["id"] for r in rows}
+        cand = fuzzy_candidates(db, "companies_tri", q, f"""SELECT c.* FROM companies c JOIN (SELECT rowid FROM companies_tri
+            WHERE companies_tri MATCH ? LIMIT 500) t ON c.id = t.rowid WHERE 1{where}""", extra)
+        scored = sorted(((name_score(q, r["norm"]), r) for r in cand if r["id"] not in seen), key=lambda x: -x[0])
+        rows += [r for score, r in scored if score >= FUZZY_MIN][:limit - len(rows)]
+        return [_registry_row(r) for r in rows]
+    except sqlite3.Error as e:
+        log.warning("Registry error: %s", e)
+        return []
+
+def _read_bulk(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if path.removesuffix(".gz").endswith((".jsonl", ".json")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def build_registry(src, dest=None):
+    dest = dest or REGISTRY_DB or "registry.db"
+    tmp = dest + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    db.executescript("""
+        PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;
+        CREATE TABLE companies (id INTEGER PRIMARY KEY, nom TEXT, numero TEXT, jcode TEXT, cc TEXT,
+            statut TEXT, date TEXT, ville TEXT, type TEXT, url TEXT, norm TEXT);
+        CREATE VIRTUAL TABLE companies_fts USING fts5(norm, content='companies', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4');
+        CREATE VIRTUAL TABLE companies_tri USING fts5(norm, content='companies', content_rowid='id', tokenize='trigram');
+        CREATE VIRTUAL TABLE companies_tri_vocab USING fts5vocab(companies_tri, 'row');
+    """)
+    def rows():
+        for co in _read_bulk(src):
+            name = co.get("name") or co.get("nom") or ""
+            if not name:
+                continue
+            jcode = (co.get("jurisdiction_code") or "").lower()
+            numero = co.get("company_number") or ""
+            yield (name, numero, jcode, jcode.split("_")[0],
+                   co.get("current_status") or "", co.get("incorporation_date") or "",
+                   co.get("registered_address.locality") or co.get("city") or "",
+                   co.get("company_type") or "",
+                   co.get("opencorporates_url") or (f"https://opencorporates.com/companies/{jcode}/{numero}" if jcode and numero else ""),
+                   normalize(name))
+    n, batch, it = 0, [], rows()
+    for row in it:
+        batch.append(row)
+        if len(batch) >= 50000:
+            db.executemany("INSERT INTO companies (nom,numero,jcode,cc,statut,date,ville,type,url,norm) VALUES (?,?,?,?,?,?,?,?,?,?)", batch)
+            n, batch = n + len(batch), []
+    db.executemany("INSERT INTO companies (nom,numero,jcode,cc,statut,date,ville,type,url,norm) VALUES (?,?,?,?,?,?,?,?,?,?)", batch)
+    n += len(batch)
+    db.executescript("""
+        CREATE INDEX companies_cc ON companies(cc);
+        INSERT INTO companies_fts(companies_fts) VALUES('rebuild');
+        INSERT INTO companies_tri(companies_tri) VALUES('rebuild');
+        INSERT INTO companies_fts(companies_fts) VALUES('optimize');
+        INSERT INTO companies_tri(companies_tri) VALUES('optimize');
+    """)
+    db.commit()
+    db.close()
+    os.replace(tmp, dest)
+    return n
+
+# ── SANCTIONS LOCALES ───────────────────────────────────────
+# Moteur de screening sur l'export bulk OpenSanctions (FollowTheMoney JSON lines) :
+#   python3 intelcorp_v2.py build-sanctions entities.ftm.json
+#   python3 intelcorp_v2.py update-sanctions delta.json     (ops ADD/MOD/DEL)
+# Un nom par alias (name, alias, weakAlias, previousName, prénom + nom),
+# normalisé sans formes juridiques. Même contrat (total, hits) que l'API.
+
+SANCTIONS_DB = os.environ.get("INTELCORP_SANCTIONS_DB", "")
+SCREEN_MIN = float(os.environ.get("INTELCORP_SCREEN_MIN", "0.85"))
+
+SCHEMA_KIND = {"Company":"company", "Organization":"company", "LegalEntity":"company", "PublicBody":"company", "Person":"person"}
+ALIAS_PROPS = ("name", "alias", "weakAlias", "previousName")
+LEGAL_FORMS = {
+    "ltd","limited","llc","inc","incorporated","corp","corporation","co","plc","lp","llp",
+    "sa","sas","sarl","sasu","eurl","ag","gmbh","kg","bv","nv","spa","srl","ab","as","oy",
+    "jsc","pjsc","ojsc","cjsc","ooo","oao","zao","pao","fze","fzco","fzc","dmcc","pte","pty","bhd","sdn",
+}
+
+def name_key(text):
+    words = re.sub(r"[^\w\s]", " ", normalize(text)).split()
+    return " ".join(w for w in words if w not in LEGAL_FORMS) or " ".join(words)
+
+def screen_score(a, b):
+    # alignement mot à mot par ratio d'édition, pondéré par la longueur des mots,
+    # dans les deux sens : insensible à l'ordre (« Sechin Igor »), pénalise les
+    # mots en trop ou manquants
+    ta, tb = a.split(), b.split()
+    if not ta or not tb:
+        return 0.0
+    side = lambda x, y: sum(len(t) * max(SequenceMatcher(None, t, u).ratio() for u in y) for t in x)
+    return (side(ta, tb) + side(tb, ta)) / (sum(map(len, ta)) + sum(map(len, tb)))
+
+_sanctions_local = threading.local()
+
+def _sanctions_connect(path):
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute("PRAGMA mmap_size=268435456")
+    db.row_factory = sqlite3.Row
+    return db
+
+def _sanctions():
+    if not SANCTIONS_DB:
+        return None
+    return _thread_db(_sanctions_local, SANCTIONS_DB, _sanctions_connect)
+
+def _sanctions_schema(db):
+    db.executescript("""
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE IF NOT EXISTS entities (id TEXT PRIMARY KEY, schema TEXT, caption TEXT, data TEXT);
+        CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, entity_id TEXT, kind TEXT, norm TEXT);
+        CREATE INDEX IF NOT EXISTS names_entity ON names(entity_id);
+        CREATE INDEX IF NOT EXISTS names_norm ON names(norm);
+        CREATE VIRTUAL TABLE IF NOT EXISTS names_tri USING fts5(norm, tokenize='trigram', detail='none');
+        CREATE VIRTUAL TABLE IF NOT EXISTS names_tri_vocab USING fts5vocab(names_tri, 'row');
+        CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, entity_id TEXT, op TEXT, ts REAL);
+    """)
+
+def _aliases(entity):
+    props = entity.get("properties", {})
+    names = [n for p in ALIAS_PROPS for n in props.get(p, [])]
+    for first in props.get("firstName", []):
+        for last in props.get("lastName", []):
+            names += [f"{first} {last}", f"{last} {first}"]
+    return {k for k in map(name_key, names + [entity.get("caption", "")]) if len(k) >= 2}
+
+def _upsert_entity(db, entity):
+    kind = SCHEMA_KIND.get(entity.get("schema"))
+    _delete_entity(db, entity["id"])
+    if not kind:
+        return False
+    props = entity.get("properties", {})
+    data = {  # format d'un résultat de l'API /search
+        "id": entity["id"], "caption": entity.get("caption", ""), "schema": entity.get("schema"),
+        "datasets": entity.get("datasets", []),
+        "properties": {k: props[k] for k in ("topics", "country", "birthDate", "position", "alias") if k in props},
+    }
+    db.execute("INSERT INTO entities VALUES (?,?,?,?)", (entity["id"], entity.get("schema"), data["caption"], json.dumps(data)))
+    for key in _aliases(entity):
+        rowid = db.execute("INSERT INTO names (entity_id, kind, norm) VALUES (?,?,?)", (entity["id"], kind, key)).lastrowid
+        db.execute("INSERT INTO names_tri (rowid, norm) VALUES (?,?)", (rowid, key))
+    return True
+
+def _delete_entity(db, entity_id):
+    ids = [r[0] for r in db.execute("SELECT id FROM names WHERE entity_id = ?", (entity_id,))]
+    if ids:
+        marks = ",".join("?" * len(ids))
+        db.execute(f"DELETE FROM names_tri WHERE rowid IN ({marks})", ids)
+        db.execute(f"DELETE FROM names WHERE id IN ({marks})", ids)
+    db.execute("DELETE FROM entities WHERE id = ?", (entity_id,))
+
+def build_sanctions(src, dest=None):
+    dest = dest or SANCTIONS_DB or "sanctions.db"
+    tmp = dest + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    _sanctions_schema(db)
+    n = 0
+    with db:
+        for entity in _read_bulk(src):
+            n += _upsert_entity(db, entity)
+    db.execute("INSERT INTO names_tri(names_tri) VALUES('optimize')")
+    db.commit()
+    db.close()
+    os.replace(tmp, dest)
+    return n
+
+def update_sanctions(src, dest=None):
+    # Delta OpenSanctions : {"op": "ADD"|"MOD"|"DEL", "entity": {...}} par ligne.
+    # Une ligne sans "op" est traitée comme un ajout / remplacement.
+    db = sqlite3.connect(dest or SANCTIONS_DB or "sanctions.db", timeout=30)
+    _sanctions_schema(db)
+    counts = {"ADD": 0, "MOD": 0, "DEL": 0}
+    now = time.time()
+    with db:
+        for line in _read_bulk(src):
+            op, entity = (line.get("op", "MOD").upper(), line["entity"]) if "entity" in line else ("MOD", line)
+            if op == "DEL":
+                _delete_entity(db, entity["id"])
+            elif not _upsert_entity(db, entity):
+                continue
+            db.execute("INSERT INTO changes (entity_id, op, ts) VALUES (?,?,?)", (entity["id"], op, now))
+            counts[op if op in counts else "MOD"] += 1
+    db.close()
+    return counts
+
+def screen(name, kind=None, threshold=None, limit=5, db=None):
+    # → (total, hits) comme l'API ; kind = "company", "person" ou None (tous)
+    db = db or _sanctions()
+    q = name_key(name)
+    if db is None or len(q) < 2:
+        return 0, []
+    threshold = SCREEN_MIN if threshold is None else threshold
+    where = " AND n.kind = ?" if kind else ""
+    extra = (kind,) if kind else ()
+    rows = db.execute(f"SELECT n.* FROM names n WHERE n.norm = ?{where}", (q, *extra)).fetchall()
+    cand = fuzzy_candidates(db, "names_tri", q, f"""SELECT n.* FROM names n JOIN (SELECT rowid FROM names_tri
+        WHERE names_tri MATCH ? LIMIT 2000) t ON n.id = t.rowid WHERE 1{where}""", extra, cap=2000)
+    # présélection rapide par trigrammes, score d'édition sur les 150 meilleurs
+    tq = _grams(q)
+    rows += sorted(cand, key=lambda r: -_jaccard(tq, _grams(r["norm"])))[:150]
+    best = {}
+    for r in rows:
+        score = 1.0 if r["norm"] == q else screen_score(q, r["norm"])
+        if score >= threshold and score > best.get(r["entity_id"], 0):
+            best[r["entity_id"]] = score
+    top = sorted(best.items(), key=lambda x: -x[1])[:limit]
+    hits = []
+    for entity_id, score in top:
+        row = db.execute("SELECT data FROM entities WHERE id = ?", (entity_id,)).fetchone()
+        if row:
+            hits.append({**json.loads(row[0]), "score": round(score, 3)})
+    return len(best), hits
+
+# ── DOSSIER IA ──────────────────────────────────────────────
+# Schéma du dossier défini une seule fois : il génère le prompt (forme
+# compacte, en message système identique d'un appel à l'autre) et valide la
+# réponse. Groq est appelé en mode JSON ; une sortie tronquée est réparée,
+# un champ invalide est écarté sans perdre le reste, et les sections
+# absentes sont redemandées seules avec un budget de tokens réduit.
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+def _items(value):
+    if value is None or value == "":
+        return []
+    return value if isinstance(value, list) else [value]
+
+Text = Annotated[str, BeforeValidator(_text)]
+Texts = Annotated[list[Text], BeforeValidator(_items)]
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+class Dirigeant(_Section):
+    nom: Text = ""
+    poste: Text = ""
+    nationalite: Text = ""
+    depuis: Text = ""
+    parcours_anterieur: Text = ""
+
+class Actionnaire(_Section):
+    nom: Text = ""
+    pourcentage: Text = ""
+    type: Text = ""
+
+class Financier(_Section):
+    chiffre_affaires: Text = ""
+    benefice_net: Text = ""
+    capitalisation_boursiere: Text = ""
+    effectifs: Text = ""
+    notation_credit: Text = ""
+    bourse_cotation: Text = ""
+    ticker: Text = ""
+
+class Reputation(_Section):
+    positif: Texts = []
+    negatif: Texts = []
+    controverses: Texts = []
+    certifications: Texts = []
+
+class PresenceDigitale(_Section):
+    linkedin: Text = ""
+    twitter: Text = ""
+    wikipedia: Text = ""
+
+class SanctionsIA(_Section):
+    ofac: Text = ""
+    ue: Text = ""
+    onu: Text = ""
+    commentaire: Text = ""
+
+class RedFlag(_Section):
+    niveau: Annotated[Literal["rouge", "orange", "vert"], BeforeValidator(lambda v: _text(v).strip().lower())] = "orange"
+    titre: Text = ""
+    detail: Text = ""
+
+def _score(value):
+    if isinstance(value, str):  # "55", "55/100", "score : 55"
+        found = re.search(r"\d+(?:\.\d+)?", value)
+        value = found.group() if found else 0
+    return max(0, min(100, int(float(value or 0))))
+
+def _niveau(value):
+    value = normalize(_text(value)).upper()
+    return {"MODEREE": "MODERE", "ELEVEE": "ELEVE", "HIGH": "ELEVE", "MEDIUM": "MODERE", "LOW": "FAIBLE"}.get(value, value)
+
+class Dossier(_Section):
+    nom_complet: Text = ""
+    description: Text = ""
+    pays: Text = ""
+    ville_siege: Text = ""
+    adresse: Text = ""
+    site_web: Text = ""
+    email_contact: Text = ""
+    telephone: Text = ""
+    date_creation: Text = ""
+    forme_juridique: Text = ""
+    numero_enregistrement: Text = ""
+    secteur: Text = ""
+    activite_principale: Text = ""
+    produits_services: Texts = []
+    marches_operes: Texts = []
+    dirigeants: list[Dirigeant] = []
+    actionnaires: list[Actionnaire] = []
+    filiales: Texts = []
+    maison_mere: Text = ""
+    partenaires_connus: Texts = []
+    financier: Financier = Financier()
+    reputation: Reputation = Reputation()
+    presence_digitale: PresenceDigitale = PresenceDigitale()
+    sanctions: SanctionsIA = SanctionsIA()
+    red_flags: list[RedFlag] = []
+    score_risque: Annotated[int, BeforeValidator(_score)] = 0
+    niveau_risque: Annotated[Literal["FAIBLE", "MODERE", "ELEVE", ""], BeforeValidator(_niveau)] = ""
+    verdict: Text = ""
+    recommandations: Texts = []
+
+# Le dossier est généré par sections indépendantes : chacune a son appel,
+# son budget de tokens et sa durée de cache (la réputation bouge plus vite
+# que l'identité légale). Les sections de AI_EAGER partent dès l'analyse,
+# les autres à l'ouverture de leur panneau.
+DOSSIER_SECTIONS = {
+    "identite": ("nom_complet", "description", "pays", "ville_siege", "adresse", "site_web", "email_contact", "telephone",
+                 "date_creation", "forme_juridique", "numero_enregistrement", "secteur", "activite_principale",
+                 "produits_services", "marches_operes"),
+    "gouvernance": ("dirigeants", "actionnaires", "filiales", "maison_mere", "partenaires_connus"),
+    "financier": ("financier",),
+    "reputation": ("reputation", "presence_digitale"),
+    "risque": ("sanctions", "red_flags", "score_risque", "niveau_risque", "verdict", "recommandations"),
+}
+SECTION_TOKENS = {"identite": 900, "gouvernance": 1000, "financier": 400, "reputation": 700, "risque": 1000}
+SECTION_TTL = {sec: int(os.environ.get(f"INTELCORP_TTL_AI_{sec.upper()}", ttl)) for sec, ttl in {
+    "identite": 30 * 86400, "gouvernance": 7 * 86400, "financier": 7 * 86400,
+    "reputation": 86400, "risque": 2 * 86400}.items()}
+AI_EAGER = tuple(s for s in os.environ.get("INTELCORP_AI_EAGER", "identite,risque").split(",") if s in DOSSIER_SECTIONS)
+
+def _shape(annotation):
+    # forme compacte d'un type : "" · [""] · {a,b} · [{a,b}] · 0-100 · A|B
+    args = getattr(annotation, "__args__", ())
+    if getattr(annotation, "__origin__", None) is list:
+        return f"[{_shape(args[0])}]"
+    if annotation is int:
+        return "0-100"
+    if getattr(annotation, "__origin__", None) is Literal:
+        return "|".join(a for a in args if a)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        fields = ((f, _shape(info.annotation)) for f, info in annotation.model_fields.items())
+        return "{" + ",".join(f if shape == '""' else f"{f}:{shape}" for f, shape in fields) + "}"
+    if hasattr(annotation, "__metadata__"):
+        return _shape(annotation.__origin__)
+    return '""'
+
+def schema_prompt(fields=None):
+    fields = fields or Dossier.model_fields
+    return "{" + ",".join(f'"{f}":{_shape(Dossier.model_fields[f].annotation)}' for f in fields) + "}"
+
+def _repair_json(text):
+    # Sortie tronquée (max_tokens) : on coupe après la dernière valeur complète
+    # et on referme les structures ouvertes.
+    stack, cuts, in_str, escape = [], [], False, False
+    for i, ch in enumerate(text):
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+    for end, closers in reversed(cuts[-64:]):
+        try:
+            return json.loads(text[:end] + closers)
+        except ValueError:
+            continue
+    raise ValueError("JSON irréparable")
+
+def parse_llm_json(text):
+    text = text.strip()
+    if "```" in text:
+        text = text.split("```")[1]
+        if text.startswith("json"): text = text[4:]
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("pas de JSON dans la réponse")
+    text = text[start:].strip().rstrip("`")
+    try:
+        return json.loads(text), False
+    except ValueError:
+        return _repair_json(text), True
+
+def validate_dossier(data):
+    # Un champ invalide est écarté (puis redemandé) plutôt que de perdre le dossier
+    if not isinstance(data, dict):
+        raise ValueError("dossier non objet")
+    data, dropped = dict(data), set()
+    while True:
+        try:
+            return Dossier.model_validate(data), dropped
+        except ValidationError as e:
+            bad = {err["loc"][0] for err in e.errors() if err["loc"]} & set(data)
+            if not bad:
+                raise
+            dropped |= bad
+            for key in bad:
+                data.pop(key)
+
+def _json_request(system, user, max_tokens):
+    return {"temperature": 0.2, "max_tokens": max_tokens, "response_format": {"type": "json_object"},
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}]}
+
+def _json_rescue(e, call):
+    # Si Groq rejette la génération (json_validate_failed), le texte fautif
+    # est renvoyé dans l'erreur : on tente de le réparer.
+    if not isinstance(e, _groq_sdk().BadRequestError):
+        raise e
+    body = e.body if isinstance(e.body, dict) else {}
+    failed = (body.get("error") or body).get("failed_generation")
+    if not failed:
+        raise e
+    with span(f"parse_{call}"):
+        return parse_llm_json(failed)[0], 0
+
+def _json_data(resp, call):
+    completion = count_tokens(resp, call)
+    with span(f"parse_{call}"):
+        try:
+            data, repaired = parse_llm_json(resp.choices[0].message.content or "")
+        except ValueError:
+            METRICS.inc("intelcorp_llm_wasted_tokens_total", completion, call=call)
+            raise
+    if repaired:
+        METRICS.inc("intelcorp_ai_repaired_total", call=call)
+    return data, completion
+
+def groq_json(system, user, max_tokens, call):
+    # Mode JSON Groq → (données, tokens de complétion)
+    try:
+        with span(f"groq_{call}"):
+            resp = llm_chat("dossier", **_json_request(system, user, max_tokens))
+    except Exception as e:
+        return _json_rescue(e, call)
+    return _json_data(resp, call)
+
+RESEARCH_SYSTEM = ("Expert due diligence analyst, commodity trading. Answer with ONE JSON object, no prose, "
+    "following exactly this shape (\"\" = string, [..] = list, {a,b} = object with those string keys). "
+    "Unknown values: \"\" or []. French text.\n")
+
 # ── DATA ────────────────────────────────────────────────────
 
+def _from_prefix(query, country_filter):
+    # Si un préfixe plus court a déjà renvoyé un jeu COMPLET (moins d'une page),
+    # les résultats du préfixe long en sont un sous-ensemble : filtrage local.
+    q = normalize(query)
+    tokens = q.split()
+    names = lambda co: normalize(co.get("nom")).split()
+    for i in range(len(q) - 1, 1, -1):
+        for country in dict.fromkeys([country_filter, ""]):
+            hit, value = CACHE.get("live", f"{q[:i].rstrip()}|{normalize(country)}")
+            if not hit or value[1] != "opencorporates" or len(value[0]) >= LIVE_PAGE:
+                continue
+            return [co for co in value[0]
+                    if (not country_filter or co.get("cc") == country_filter)
+                    and all(any(w.startswith(t) for w in names(co)) for t in tokens)]
+    return None
+
+LIVE_MAX_WAIT = float(os.environ.get("INTELCORP_LIVE_MAX_WAIT", "0.5"))  # attente max d'un jeton pendant la frappe
+
+def _oc_row(co):
+    jcode = co.get("jurisdiction_code", "").lower()
+    cc = jcode.split("_")[0]
+    addr = co.get("registered_address", {})
+    city = (addr.get("city") or addr.get("locality") or "") if isinstance(addr, dict) else ""
+    return {
+        "nom": co.get("name", ""),
+        "numero": co.get("company_number", ""),
+        "cc": cc, "jcode": jcode, "pays": NAMES.get(cc, jcode.upper()),
+        "flag": FLAGS.get(cc, "🏳️"),
+        "statut": co.get("current_status", ""),
+        "date": co.get("incorporation_date", ""),
+        "ville": city,
+        "type": co.get("company_type", ""),
+        "url": co.get("opencorporates_url", ""),
+    }
+
+OC_SEARCH = f"{UPSTREAMS['opencorporates']}/v0.4/companies/search"
+
+def _oc_params(query, country_filter, per_page, page=None):
+    params = {"q": query, "per_page": per_page}
+    if page:
+        params["page"] = page
+    if country_filter:
+        params["jurisdiction_code"] = country_filter
+    return params
+
+def _live_local(query, country_filter):
+    # registre local, puis sous-ensemble d'un préfixe complet en cache → (lignes, source) ou None
+    with span("registry"):
+        local = registry_search(query, country_filter)
+    if local:
+        return local, "registry"
+    local = _from_prefix(query, country_filter)
+    if local is not None:  # [] : le préfixe complet prouve qu'il n'y a aucun résultat
+        _cache_hit.set(True)
+        return local, "opencorporates"
+    return None
+
+def _live_stale(query, country_filter, e):
+    # quota épuisé ou disjoncteur ouvert : pas de repli Groq pendant la
+    # frappe, seulement le cache (même expiré)
+    log.info("OpenCorporates skipped: %s", e)
+    stale = CACHE.get_stale("live", f"{normalize(query)}|{normalize(country_filter)}")
+    return (stale[0], "stale") if stale and stale[0] else ([], "degraded")
+
+def _suggest_request(query, country_filter):
+    prompt = f'List real companies matching "{query}"{f" in {country_filter}" if country_filter else ""}. Return ONLY JSON array max 10: [{{"nom":"","pays":"","pays_code":"2-letter ISO","ville":"","secteur":"","statut":"Active","type":"","date_creation":""}}]'
+    return {"messages": [{"role":"user","content":prompt}], "temperature": 0.1, "max_tokens": 1000}
+
+def _suggest_rows(resp):
+    count_tokens(resp, "suggest")
+    with span("parse_suggest"):
+        raw = parse_llm_json(resp.choices[0].message.content)[0]
+    results = []
+    for co in raw:
+        cc = co.get("pays_code","").lower()[:2]
+        results.append({
+            "nom": co.get("nom",""), "numero": "—",
+            "cc": cc, "jcode": cc, "pays": co.get("pays",""),
+            "flag": FLAGS.get(cc,"🏳️"),
+            "statut": co.get("statut","Active"),
+            "date": co.get("date_creation",""),
+            "ville": co.get("ville",""),
+            "type": co.get("type","") or co.get("secteur",""),
+            "url": "",
+        })
+    return results
+
+def _live_keep(value):
+    return value[1] not in ("none", "stale", "degraded")
+
+@cached("live", keep=_live_keep, wait=LIVE_MAX_WAIT)
 def live_search(query, country_filter=""):
     if not query or len(query) < 2:
         return [], "opencorporates"
+    local = _live_local(query, country_filter)
+    if local:
+        return local
     try:
-        url = f"https://api.opencorporates.com/v0.4/companies/search?q={requests.utils.quote(query)}&per_page=12"
-        if country_filter:
-            url += f"&jurisdiction_code={country_filter}"
-        r = requests.get(url, timeout=6, headers=HEADERS)
-        if r.status_code == 200:
+        with span("opencorporates"):
+            r = http_get(OC_SEARCH, max_wait=LIVE_MAX_WAIT, params=_oc_params(query, country_filter, LIVE_PAGE))
+        with span("parse_opencorporates"):
             companies = r.json().get("results", {}).get("companies", [])
-            if companies:
-                results = []
-                for c in companies:
-                    co = c.get("company", {})
-                    jcode = co.get("jurisdiction_code", "").lower()
-                    cc = jcode.split("_")[0]
-                    addr = co.get("registered_address", {})
-                    city = (addr.get("city") or addr.get("locality") or "") if isinstance(addr, dict) else ""
-                    results.append({
-                        "nom": co.get("name", ""),
-                        "numero": co.get("company_number", ""),
-                        "cc": cc, "pays": NAMES.get(cc, jcode.upper()),
-                        "flag": FLAGS.get(cc, "🏳️"),
-                        "statut": co.get("current_status", ""),
-                        "date": co.get("incorporation_date", ""),
-                        "ville": city,
-                        "type": co.get("company_type", ""),
-                        "url": co.get("opencorporates_url", ""),
-                    })
-                return results, "opencorporates"
-    except: pass
+        if companies:
+            return [_oc_row(c.get("company", {})) for c in companies], "opencorporates"
+    except CircuitOpen as e:
+        return _live_stale(query, country_filter, e)
+    except (requests.RequestException, ValueError) as e:
+        log.warning("OpenCorporates error: %s", e)
 
     # Fallback Groq
+    METRICS.inc("intelcorp_fallback_total", source="groq_suggest")
     try:
-        client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-        prompt = f'List real companies matching "{query}"{f" in {country_filter}" if country_filter else ""}. Return ONLY JSON array max 10: [{{"nom":"","pays":"","pays_code":"2-letter ISO","ville":"","secteur":"","statut":"Active","type":"","date_creation":""}}]'
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.1, max_tokens=1000,
-        )
-        text = resp.choices[0].message.content.strip()
-        if "```" in text:
-            text = text.split("```")[1]
-            if text.startswith("json"): text = text[4:]
-        raw = json.loads(text.strip().rstrip("```"))
-        results = []
-        for co in raw:
-            cc = co.get("pays_code","").lower()[:2]
-            results.append({
-                "nom": co.get("nom",""), "numero": "—",
-                "cc": cc, "pays": co.get("pays",""),
-                "flag": FLAGS.get(cc,"🏳️"),
-                "statut": co.get("statut","Active"),
-                "date": co.get("date_creation",""),
-                "ville": co.get("ville",""),
-                "type": co.get("type","") or co.get("secteur",""),
-                "url": "",
-            })
-        return results, "groq"
+        with span("groq_suggest"):
+            resp = llm_chat("suggest", max_wait=LIVE_MAX_WAIT, **_suggest_request(query, country_filter))
+        return _suggest_rows(resp), "groq"
     except Exception as e:
-        print(f"Groq suggest error: {e}")
+        log.warning("Groq suggest error: %s", e)
     return [], "none"
 
-def ai_research(company_name, country=""):
+# Pages suivantes, chargées au défilement de la liste : curseur = nombre de
+# lignes déjà affichées. Côté OpenCorporates, pages de LIVE_MORE lignes mises
+# en cache (la première recoupe les LIVE_PAGE lignes de la frappe) ; la page
+# d'après est préchargée en tâche de fond pendant que l'analyste fait défiler.
+
+LIVE_MORE = int(os.environ.get("INTELCORP_LIVE_MORE", "36"))
+LIVE_MAX_PAGES = int(os.environ.get("INTELCORP_LIVE_MAX_PAGES", "10"))
+
+@cached("pages", ttl=lambda *args: CACHE_TTL["live"], wait=LIVE_MAX_WAIT)
+def live_page(query, country_filter, page):
+    # → (lignes, nb de pages, nb total de sociétés)
+    with span("opencorporates_page"):
+        r = http_get(OC_SEARCH, params=_oc_params(query, country_filter, LIVE_MORE, page))
+    with span("parse_opencorporates"):
+        data = r.json().get("results", {})
+    return [_oc_row(c.get("company", {})) for c in data.get("companies", [])], data.get("total_pages", 0), data.get("total_count", 0)
+
+def _prefetch(fn, *args):
+    def run():
+        try:
+            fn(*args)
+        except Exception as e:
+            log.info("Prefetch %s skipped: %s", fn.__name__, e)
+    EXECUTOR.submit(run)
+
+def live_more(query, country_filter, source, offset):
+    # → (lignes, curseur suivant ou None, total connu ou None)
+    if source == "registry":
+        rows = registry_search(query, country_filter, offset + LIVE_MORE)[offset:]
+        return rows, offset + len(rows) if len(rows) == LIVE_MORE else None, None
+    page, skip = divmod(offset, LIVE_MORE)
+    rows, pages, total = live_page(query, country_filter, page + 1)
+    more = page + 1 < min(pages, LIVE_MAX_PAGES)
+    if more:
+        _prefetch(live_page, query, country_filter, page + 2)
+    return rows[skip:], (page + 1) * LIVE_MORE if more else None, total
+
+def _research_prompt(company_name, country, section, fields=None):
+    # → arguments de groq_json ; fields : champs redemandés seuls
+    who = f'"{company_name}"{f" from {country}" if country else ""}'
+    only = " Only these fields." if fields else ""
+    return (RESEARCH_SYSTEM + schema_prompt(fields or DOSSIER_SECTIONS[section]), f"Research {who}.{only}",
+            SECTION_TOKENS[section], f"research_{section}")
+
+def _section_check(data, fields):
+    # champs invalides ou absents (sortie tronquée) : redemandés une fois
+    dossier, dropped = validate_dossier({k: v for k, v in data.items() if k in fields})
+    return dossier, [f for f in fields if f in dropped or f not in data]
+
+def _section_merge(dossier, part, fields, retry):
+    merged, bad = validate_dossier({**dossier.model_dump(include=set(fields)), **{k: v for k, v in part.items() if k in retry}})
+    return dossier if bad else merged
+
+def _section_result(section, dossier=None, retry=None, error=None):
+    if error is not None:
+        log.warning("Groq research %s error: %s", section, error)
+        METRICS.inc("intelcorp_ai_sections_total", section=section, result="failed")
+        return None
+    METRICS.inc("intelcorp_ai_sections_total", section=section, result="partial" if retry else "ok")
+    return dossier.model_dump(include=set(DOSSIER_SECTIONS[section]))
+
+@cached("ai", ttl=lambda name, country, section: SECTION_TTL[section])
+def ai_section(company_name, country, section):
+    fields = DOSSIER_SECTIONS[section]
     try:
-        client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-        prompt = f"""Expert due diligence analyst, commodity trading. Research "{company_name}" {f"from {country}" if country else ""}.
-Return ONLY valid JSON:
-{{"nom_complet":"","description":"","pays":"","ville_siege":"","adresse":"","site_web":"","email_contact":"","telephone":"","date_creation":"","forme_juridique":"","numero_enregistrement":"","secteur":"","activite_principale":"","produits_services":[],"marches_operes":[],"dirigeants":[{{"nom":"","poste":"","nationalite":"","depuis":"","parcours_anterieur":""}}],"actionnaires":[{{"nom":"","pourcentage":"","type":""}}],"filiales":[],"maison_mere":"","partenaires_connus":[],"financier":{{"chiffre_affaires":"","benefice_net":"","capitalisation_boursiere":"","effectifs":"","notation_credit":"","bourse_cotation":"","ticker":""}},"reputation":{{"positif":[],"negatif":[],"controverses":[],"certifications":[]}},"presence_digitale":{{"linkedin":"","twitter":"","wikipedia":""}},"sanctions":{{"ofac":"","ue":"","onu":"","commentaire":""}},"red_flags":[{{"niveau":"rouge|orange|vert","titre":"","detail":""}}],"score_risque":0,"niveau_risque":"FAIBLE|MODERE|ELEVE","verdict":"","recommandations":[]}}"""
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.2, max_tokens=4000,
-        )
-        text = resp.choices[0].message.content.strip()
-        if "```" in text:
-            text = text.split("```")[1]
-            if text.startswith("json"): text = text[4:]
-        return json.loads(text.strip().rstrip("```"))
+        data, _ = groq_json(*_research_prompt(company_name, country, section))
+        dossier, retry = _section_check(data, fields)
+        if retry:
+            part, _ = groq_json(*_research_prompt(company_name, country, section, retry))
+            dossier = _section_merge(dossier, part, fields, retry)
     except Exception as e:
-        print(f"Groq error: {e}")
-        return None
+        return _section_result(section, error=e)
+    return _section_result(section, dossier, retry)
+
+def ai_calls(name, country, sections):
+    return {f"ai:{sec}": (ai_section, name, country, sec) for sec in sections}
+
+def merge_sections(res, sections):
+    ai, done = {}, []
+    for sec in sections:
+        if res.get(f"ai:{sec}") is not None:
+            ai.update(res[f"ai:{sec}"])
+            done.append(sec)
+    return ai, done
+
+def ai_research(company_name, country="", sections=tuple(DOSSIER_SECTIONS)):
+    # Dossier complet (ou partiel) : sections en parallèle, None si aucune n'a répondu.
+    # À appeler hors du pool (pas depuis un fan_out).
+    res, _ = fan_out(ai_calls(company_name, country, sections))
+    ai, done = merge_sections(res, sections)
+    return ai if done else None
+
+@cached("sanctions")
+def _opensanctions(name, schema):
+    # Lève une exception si la source est indisponible : une erreur ne doit
+    # jamais passer pour « aucun résultat » dans un contrôle de conformité.
+    headers = {"Authorization": f"ApiKey {os.environ['OPENSANCTIONS_API_KEY']}"} if os.environ.get("OPENSANCTIONS_API_KEY") else {}
+    with span(f"opensanctions_{schema.lower()}"):
+        r = http_get(f"{UPSTREAMS['opensanctions']}/search/default", params={"q": name, "schema": schema}, headers=headers)
+    with span("parse_opensanctions"):
+        d = r.json()
+    return d.get("total",{}).get("value",0), d.get("results",[])[:5]
 
 def check_sanctions(name):
-    try:
-        r = requests.get(f"https://api.opensanctions.org/search/default?q={requests.utils.quote(name)}&schema=Company", timeout=8)
-        if r.status_code == 200:
-            d = r.json()
-            return d.get("total",{}).get("value",0), d.get("results",[])[:5]
-    except: pass
-    return 0, []
+    if _sanctions():
+        with span("screen_company"):
+            return screen(name, "company")
+    return _opensanctions(name, "Company")
 
 def check_persons(name):
+    if _sanctions():
+        with span("screen_person"):
+            return screen(name, "person")
+    return _opensanctions(name, "Person")
+
+# ── FAN-OUT ─────────────────────────────────────────────────
+# Pool partagé par le process : les sources d'un dossier partent en parallèle
+# et on rend ce qui est revenu dans le budget global.
+
+ANALYSE_BUDGET = float(os.environ.get("INTELCORP_BUDGET", "20"))
+EXECUTOR = ThreadPoolExecutor(max_workers=POOL_THREADS, thread_name_prefix="intelcorp")
+
+SOURCE_LABELS = {"ai":"GROQ AI", "sanctions":"OPENSANCTIONS · SOCIÉTÉS", "pep":"OPENSANCTIONS · PERSONNES"}
+
+def fan_out(calls, budget=None):
+    # calls = {clé: (fonction, *args)} → ({clé: résultat}, [clés manquantes])
+    # le contexte (trace de la requête) suit les appels dans le pool, avec
+    # l'échéance : un appel en retard s'arrête de lui-même et rend son thread
+    deadline = time.monotonic() + (budget or ANALYSE_BUDGET)
+    deadline = min(deadline, _deadline.get() or deadline)  # fan_out imbriqué : l'échéance externe prime
+    futures = {}
+    for key, (fn, *args) in calls.items():
+        ctx = contextvars.copy_context()
+        ctx.run(_deadline.set, deadline)
+        futures[EXECUTOR.submit(ctx.run, fn, *args)] = key
+    done, pending = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    results, missing = {}, []
+    for fut in pending:
+        missing.append(futures[fut])
+        METRICS.inc("intelcorp_timeouts_total", source=futures[fut])
+    for fut in done:
+        try:
+            results[futures[fut]] = fut.result()
+        except Exception as e:
+            log.warning("%s error: %s", futures[fut], e)
+            missing.append(futures[fut])
+    return results, [k for k in calls if k in missing]
+
+def risk(ai, sc_count, graph=None):
+    # graph : exposition des parties liées (0-75, cf. graph_exposure)
+    score = (ai or {}).get("score_risque", 0)
+    exposure = (graph or {}).get("exposure", 0)
+    if sc_count > 0: score = max(score, 75)
+    score = max(score, exposure)
+    niveau = "ELEVE" if sc_count > 0 or exposure >= 60 else (ai or {}).get("niveau_risque") or "MODERE"
+    if exposure >= 30 and niveau == "FAIBLE": niveau = "MODERE"
+    return score, niveau
+
+# ── GRAPHE DE DÉTENTION ─────────────────────────────────────
+# Les parties liées du dossier IA (dirigeants, actionnaires, maison mère,
+# filiales) forment un graphe autour de la société. Chaque nœud (nom
+# normalisé, dédoublonné sur tout le graphe) est screené en parallèle et le
+# résultat est mis en cache par nœud : un dirigeant ou une maison mère commune
+# à plusieurs dossiers n'est screené qu'une fois par TTL. Au-delà de la
+# profondeur 1, les sociétés liées sont développées via leur propre section
+# IA « gouvernance » (en cache comme toute section).
+
+GRAPH_DEPTH = int(os.environ.get("INTELCORP_GRAPH_DEPTH", "1"))
+GRAPH_FANOUT = int(os.environ.get("INTELCORP_GRAPH_FANOUT", "12"))  # voisins retenus par nœud
+GRAPH_MAX = int(os.environ.get("INTELCORP_GRAPH_MAX", "40"))  # nœuds screenés par dossier
+# poids d'un hit selon le lien avec la société, divisé par 2 à chaque niveau
+GRAPH_WEIGHTS = {"maison_mere": 1.0, "actionnaire": 0.9, "dirigeant": 0.8, "filiale": 0.5}
+PARTY_SCHEMA = {"person": "Person", "company": "Company"}
+
+def relations(ai):
+    # → [(rôle, nom, nature)] par poids décroissant ; nature None : actionnaire personne ou société
+    rels = [("maison_mere", (ai or {}).get("maison_mere"), "company")]
+    rels += [("actionnaire", a.get("nom"), None) for a in (ai or {}).get("actionnaires", [])]
+    rels += [("dirigeant", d.get("nom"), "person") for d in (ai or {}).get("dirigeants", [])]
+    rels += [("filiale", f, "company") for f in (ai or {}).get("filiales", [])]
+    return [(role, nom.strip(), kind) for role, nom, kind in rels if nom and nom.strip() not in ("—", "-")]
+
+@cached("party")
+def screen_party(nom, kind):
+    if _sanctions():
+        return screen(nom, kind or None)
+    return _opensanctions(nom, PARTY_SCHEMA.get(kind, "LegalEntity"))
+
+def graph_exposure(role, depth, hits):
+    # sanction avérée : poids plein ; PEP, criminalité… : moitié
+    sanctioned = any(t.startswith("sanction") for h in hits for t in h.get("properties", {}).get("topics", []))
+    return round(75 * GRAPH_WEIGHTS[role] * 0.5 ** (depth - 1) * (1 if sanctioned else 0.5))
+
+def expand_graph(name, ai, depth=None, budget=None):
+    # → {clé: nœud} ; nœud = {nom, kind, role, depth, via}. Hors du pool (fan_out).
+    depth = GRAPH_DEPTH if depth is None else depth
+    root = name_key(name)
+    nodes, frontier = {}, [(None, ai)]
+    for level in range(1, depth + 1):
+        grow = []
+        for via, data in frontier:
+            for role, nom, kind in relations(data)[:GRAPH_FANOUT]:
+                key = name_key(nom)
+                if len(key) < 2 or key == root or key == via:
+                    continue
+                if key in nodes:  # déjà vu : on précise seulement sa nature
+                    nodes[key]["kind"] = nodes[key]["kind"] or kind
+                    continue
+                if len(nodes) >= GRAPH_MAX:
+                    break
+                nodes[key] = {"nom": nom, "kind": kind, "role": role, "depth": level, "via": via and nodes[via]["nom"]}
+                if kind == "company":
+                    grow.append(key)
+        if level == depth or not grow:
+            break
+        res, _ = fan_out({key: (ai_section, nodes[key]["nom"], "", "gouvernance") for key in grow}, budget)
+        frontier = [(key, res[key]) for key in grow if res.get(key)]
+    return nodes
+
+def screen_graph(name, ai, depth=None, budget=None):
+    # Screening de tous les nœuds + synthèse compacte pour le Store / le batch
+    with span("graph_expand"):
+        nodes = expand_graph(name, ai, depth, budget)
+    res, missing = fan_out({key: (screen_party, n["nom"], n["kind"] or "") for key, n in nodes.items()}, budget)
+    hits = []
+    for key, n in nodes.items():
+        total, found = res.get(key) or (0, [])
+        if total:
+            hits.append({"role": n["role"], "nom": n["nom"], "depth": n["depth"], "via": n["via"], "total": total,
+                         "hits": found[:3], "exposure": graph_exposure(n["role"], n["depth"], found)})
+    hits.sort(key=lambda h: -h["exposure"])
+    return {"checked": len(nodes) - len(missing), "nodes": len(nodes), "hits": hits,
+            "missing": [nodes[k]["nom"] for k in missing], "exposure": max((h["exposure"] for h in hits), default=0)}
+
+# ── AMONT ASYNCHRONE ────────────────────────────────────────
+# Jumeaux asyncio de la couche amont (httpx.AsyncClient, groq.AsyncGroq) pour
+# le service ASGI (INTELCORP_BACKEND=quart) et la file en mémoire : une
+# recherche en vol coûte une coroutine au lieu d'un thread, un process en
+# tient des centaines. Mêmes caches, quotas/disjoncteurs, exceptions
+# (requests.*) et valeurs de retour que les fonctions synchrones, qui restent
+# l'API des scripts, du batch et de la surveillance. Aucune E/S bloquante sur
+# la boucle : SQLite (registre, sanctions, cache) et état partagé des quotas
+# (flock) passent par asyncio.to_thread.
+
+BACKEND = os.environ.get("INTELCORP_BACKEND", "flask")  # quart : service ASGI (pip3 install -r requirements-async.txt)
+ASYNC_SERVING = BACKEND == "quart"
+AIO_POOL = int(os.environ.get("INTELCORP_AIO_POOL", "200"))  # connexions HTTP simultanées par boucle
+_aio_state = weakref.WeakKeyDictionary()
+
+def _httpx():
+    import httpx  # installé avec groq
+    return httpx
+
+def _aio():
+    # clients et vols en cours propres à la boucle courante (un client httpx
+    # ne change pas de boucle) ; client Groq créé au premier appel Groq
+    loop = asyncio.get_running_loop()
+    st = _aio_state.get(loop)
+    if st is None:
+        httpx = _httpx()
+        limits = httpx.Limits(max_connections=AIO_POOL, max_keepalive_connections=AIO_POOL)
+        st = _aio_state[loop] = {
+            "http": httpx.AsyncClient(headers=HEADERS, transport=httpx.AsyncHTTPTransport(retries=2, limits=limits)),
+            "groq": None,
+            "flights": {},
+        }
+    return st
+
+def agroq_client():
+    # comme groq_client : sans GROQ_API_KEY, seuls les appels Groq échouent
+    st = _aio()
+    if st["groq"] is None:
+        st["groq"] = _groq_sdk().AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=2,
+                                           base_url=UPSTREAMS["groq"], timeout=TIMEOUTS["groq"][1])
+    return st["groq"]
+
+async def _off_loop(blocking, fn, *args):
+    # E/S partagées (SQLite du cache, flock des quotas) dans un thread : un
+    # verrou contendu gèlerait toutes les coroutines ; état mémoire : appel direct
+    return await asyncio.to_thread(fn, *args) if blocking else fn(*args)
+
+def threaded_callback(fn):
+    # callback Dash synchrone qui touche SQLite ou flock (file de jobs,
+    # historique, surveillance) : Quart l'exécuterait sur la boucle, d'où un thread
+    if not ASYNC_SERVING:
+        return fn
+    @functools.wraps(fn)
+    async def wrapper(*args):
+        return await asyncio.to_thread(fn, *args)
+    return wrapper
+
+def acached(ns, keep=lambda value: value is not None, ttl=None):
+    # cached pour coroutines : même cache à deux niveaux, single-flight par
+    # boucle (entre workers, le cache SQLite partagé prend le relais)
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            key = "|".join(normalize(a) for a in args)
+            hit, value = CACHE.peek(ns, key)
+            if not hit and CACHE.path:
+                hit, value = await asyncio.to_thread(CACHE.get, ns, key)
+            _cache_hit.set(hit)
+            METRICS.inc("intelcorp_cache_total", ns=ns, result="hit" if hit else "miss")
+            if hit:
+                return value
+            flights, fkey = _aio()["flights"], f"{ns}|{key}"
+            flight = flights.get(fkey)
+            if flight is None:
+                async def load():
+                    # tâche à part : son contexte ne remonte pas à l'appelant,
+                    # le drapeau cache (ex. préfixe filtré localement) est rendu avec la valeur
+                    value = await fn(*args)
+                    if keep(value):
+                        await _off_loop(CACHE.path, CACHE.set, ns, key, value, ttl(*args) if ttl else CACHE_TTL[ns])
+                    return value, _cache_hit.get()
+                flight = flights[fkey] = asyncio.ensure_future(load())
+                flight.add_done_callback(lambda f: (flights.pop(fkey, None), f.cancelled() or f.exception()))
+            else:
+                METRICS.inc("intelcorp_singleflight_shared_total")
+            # un appelant annulé (budget dépassé) laisse finir l'appel pour les autres
+            value, hit = await asyncio.shield(flight)
+            _cache_hit.set(hit)
+            return value
+        return wrapper
+    return decorator
+
+async def ahttp_get(url, max_wait=None, **kwargs):
+    httpx = _httpx()
+    provider = PROVIDERS.get(urlparse(url).netloc)
+    guard = GUARDS.get(provider)
+    connect, read = TIMEOUTS.get(provider, DEFAULT_TIMEOUT)
+    kwargs.setdefault("timeout", httpx.Timeout(read, connect=connect))
+    if guard:
+        await guard.aacquire(max_wait)
+    try:
+        for attempt in range(3):  # retries de statut comme _session (connexion : transport)
+            r = await _aio()["http"].get(url, **kwargs)
+            if r.status_code not in RETRY_STATUS or attempt == 2:
+                break
+            backoff = 0.4 * 2 ** attempt + random.uniform(0, 0.3)
+            await asyncio.sleep(min(_retry_after(r.headers) or backoff, RETRY_AFTER_MAX))
+    except httpx.TransportError as e:
+        if guard:
+            await _off_loop(guard.path, guard.failure)
+        raise (requests.Timeout if isinstance(e, httpx.TimeoutException) else requests.ConnectionError)(str(e) or repr(e)) from e
+    if guard:
+        if r.status_code == 429 or r.status_code >= 500:
+            await _off_loop(guard.path, guard.failure, r.status_code == 429, _retry_after(r.headers))
+        else:
+            await _off_loop(guard.path, guard.success)
+    if r.status_code >= 400:
+        raise requests.HTTPError(f"{r.status_code} {r.reason_phrase} for url: {r.url}")
+    return r
+
+async def agroq_chat(max_wait=None, **kwargs):
+    guard = GUARDS["groq"]
+    await guard.aacquire(max_wait)
+    try:
+        resp = await agroq_client().chat.completions.create(**kwargs)
+    except Exception as e:
+        await _off_loop(guard.path, _groq_failure, guard, e)
+        raise
+    await _off_loop(guard.path, guard.success)
+    return resp
+
+async def _allm_call(task, model, max_wait, kwargs):
+    t = time.perf_counter()
     try:
-        r = requests.get(f"https://api.opensanctions.org/search/default?q={requests.utils.quote(name)}&schema=Person", timeout=8)
-        if r.status_code == 200:
-            d = r.json()
-            return d.get("total",{}).get("value",0), d.get("results",[])[:5]
-    except: pass
-    return 0, []
+        resp = await agroq_chat(max_wait, model=model, **kwargs)
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        _llm_record(task, model, t, e)
+        raise
+    _llm_record(task, model, t)
+    return resp
+
+async def allm_chat(task, max_wait=None, **kwargs):
+    # llm_chat en coroutines : la requête perdante de la couverture est annulée
+    models = ROUTER.order(task)
+    if task not in HEDGE_TASKS:
+        return await _allm_call(task, models[0], max_wait, kwargs)
+    first = asyncio.ensure_future(_allm_call(task, models[0], max_wait, kwargs))
+    pending = {first}
+    done, _ = await asyncio.wait(pending, timeout=ROUTER.hedge_delay(models[0]))
+    error = first.exception() if done else None
+    if not done or error and not isinstance(error, CircuitOpen):
+        METRICS.inc("intelcorp_llm_hedges_total", task=task, reason="slow" if not done else "error")
+        hedge = models[1] if len(models) > 1 else models[0]
+        pending.add(asyncio.ensure_future(_allm_call(task, hedge, max_wait, kwargs)))
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is not first:
+                        METRICS.inc("intelcorp_llm_hedges_won_total", task=task)
+                    return fut.result()
+                error = error or fut.exception()
+        raise error
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+async def agroq_json(system, user, max_tokens, call):
+    try:
+        with span(f"groq_{call}"):
+            resp = await allm_chat("dossier", **_json_request(system, user, max_tokens))
+    except Exception as e:
+        return _json_rescue(e, call)
+    return _json_data(resp, call)
+
+@acached("live", keep=_live_keep)
+async def alive_search(query, country_filter=""):
+    if not query or len(query) < 2:
+        return [], "opencorporates"
+    local = await asyncio.to_thread(_live_local, query, country_filter)
+    if local:
+        _cache_hit.set(local[1] == "opencorporates")  # préfixe en cache (fixé dans le thread)
+        return local
+    try:
+        with span("opencorporates"):
+            r = await ahttp_get(OC_SEARCH, max_wait=LIVE_MAX_WAIT, params=_oc_params(query, country_filter, LIVE_PAGE))
+        with span("parse_opencorporates"):
+            companies = r.json().get("results", {}).get("companies", [])
+        if companies:
+            return [_oc_row(c.get("company", {})) for c in companies], "opencorporates"
+    except CircuitOpen as e:
+        return await asyncio.to_thread(_live_stale, query, country_filter, e)
+    except (requests.RequestException, ValueError) as e:
+        log.warning("OpenCorporates error: %s", e)
+
+    METRICS.inc("intelcorp_fallback_total", source="groq_suggest")
+    try:
+        with span("groq_suggest"):
+            resp = await allm_chat("suggest", max_wait=LIVE_MAX_WAIT, **_suggest_request(query, country_filter))
+        return _suggest_rows(resp), "groq"
+    except Exception as e:
+        log.warning("Groq suggest error: %s", e)
+    return [], "none"
+
+@acached("ai", ttl=lambda name, country, section: SECTION_TTL[section])
+async def aai_section(company_name, country, section):
+    fields = DOSSIER_SECTIONS[section]
+    try:
+        data, _ = await agroq_json(*_research_prompt(company_name, country, section))
+        dossier, retry = _section_check(data, fields)
+        if retry:
+            part, _ = await agroq_json(*_research_prompt(company_name, country, section, retry))
+            dossier = _section_merge(dossier, part, fields, retry)
+    except Exception as e:
+        return _section_result(section, error=e)
+    return _section_result(section, dossier, retry)
+
+async def afan_out(calls, budget=None):
+    # fan_out pour coroutines : calls = {clé: (fonction async, *args)}
+    tasks = {asyncio.ensure_future(fn(*args)): key for key, (fn, *args) in calls.items()}
+    done, pending = await asyncio.wait(tasks, timeout=budget or ANALYSE_BUDGET)
+    results, missing = {}, []
+    for fut in pending:
+        fut.cancel()
+        missing.append(tasks[fut])
+        METRICS.inc("intelcorp_timeouts_total", source=tasks[fut])
+    for fut in done:
+        try:
+            results[tasks[fut]] = fut.result()
+        except Exception as e:
+            log.warning("%s error: %s", tasks[fut], e)
+            missing.append(tasks[fut])
+    return results, [k for k in calls if k in missing]
+
+async def aai_research(company_name, country="", sections=tuple(DOSSIER_SECTIONS)):
+    res, _ = await afan_out({f"ai:{sec}": (aai_section, company_name, country, sec) for sec in sections})
+    ai, done = merge_sections(res, sections)
+    return ai if done else None
+
+@acached("sanctions")
+async def _aopensanctions(name, schema):
+    headers = {"Authorization": f"ApiKey {os.environ['OPENSANCTIONS_API_KEY']}"} if os.environ.get("OPENSANCTIONS_API_KEY") else {}
+    with span(f"opensanctions_{schema.lower()}"):
+        r = await ahttp_get(f"{UPSTREAMS['opensanctions']}/search/default", params={"q": name, "schema": schema}, headers=headers)
+    with span("parse_opensanctions"):
+        d = r.json()
+    return d.get("total",{}).get("value",0), d.get("results",[])[:5]
+
+async def acheck_sanctions(name):
+    if SANCTIONS_DB and os.path.exists(SANCTIONS_DB):
+        return await asyncio.to_thread(check_sanctions, name)
+    return await _aopensanctions(name, "Company")
+
+async def acheck_persons(name):
+    if SANCTIONS_DB and os.path.exists(SANCTIONS_DB):
+        return await asyncio.to_thread(check_persons, name)
+    return await _aopensanctions(name, "Person")
+
+# ── HISTORIQUE ──────────────────────────────────────────────
+# Dossiers conservés par identité (juridiction + numéro quand le registre
+# les donne, sinon pays + nom normalisé) dans INTELCORP_DOSSIER_DB : versions
+# append-only, JSON compressé zlib. Chaque source (sanctions, pep, ai:<section>)
+# garde sa date de collecte ; une nouvelle analyse ne ré-interroge que celles
+# dont le TTL (CACHE_TTL / SECTION_TTL) est échu et affiche ce qui a changé.
+
+DOSSIER_DB = os.environ.get("INTELCORP_DOSSIER_DB", "")
+
+# champs comparés d'une version à l'autre ; les textes libres de l'IA
+# (description, verdict…) varient à chaque génération et ne sont pas suivis
+DIFF_FIELDS = {
+    "sanctions": "OpenSanctions · sociétés", "pep": "OpenSanctions · personnes",
+    "niveau_risque": "Niveau de risque", "score_risque": "Score de risque", "red_flags": "Red flags",
+    "dirigeants": "Dirigeants", "actionnaires": "Actionnaires", "maison_mere": "Maison mère", "filiales": "Filiales",
+    "forme_juridique": "Forme juridique", "adresse": "Adresse", "numero_enregistrement": "N° enregistrement",
+}
+
+def entity_key(name, jurisdiction="", numero=""):
+    if jurisdiction and numero and numero != "—":
+        return f"{normalize(jurisdiction)}:{normalize(numero)}"
+    return f"{normalize(jurisdiction)}|{name_key(name)}"
+
+def source_ttl(source):
+    return SECTION_TTL[source[3:]] if source.startswith("ai:") else CACHE_TTL["sanctions"]
+
+def _fields(sources):
+    # {source: valeur} → {champ: valeur} : sections IA à plat, sanctions / pep tels quels
+    out = {}
+    for src, value in sources.items():
+        out.update(value if src.startswith("ai:") else {src: value})
+    return out
+
+def _names(field, value):
+    # listes comparées par nom : hits OpenSanctions, dirigeants, red flags…
+    items = value[1] if field in ("sanctions", "pep") else value
+    names = [(v.get("caption") or v.get("nom") or v.get("titre") or "") if isinstance(v, dict) else str(v) for v in items]
+    return {normalize(n): n for n in names if n}
+
+def diff_versions(old, new):
+    # → [{"champ", "avant", "apres", "ajouts", "retraits"}] sur les champs suivis présents des deux côtés
+    old, new = _fields(old), _fields(new)
+    changes = []
+    for field, label in DIFF_FIELDS.items():
+        if field not in old or field not in new:
+            continue
+        a, b = old[field], new[field]
+        if field in ("sanctions", "pep") or isinstance(b, list):
+            na, nb = _names(field, a), _names(field, b)
+            change = {"ajouts": [n for k, n in nb.items() if k not in na], "retraits": [n for k, n in na.items() if k not in nb]}
+            if field in ("sanctions", "pep") and a[0] != b[0]:
+                change.update(avant=f"{a[0]} hit(s)", apres=f"{b[0]} hit(s)")
+            if not any(change.values()):
+                continue
+        elif normalize(a) == normalize(b):
+            continue
+        else:
+            change = {"avant": str(a), "apres": str(b)}
+        changes.append({"champ": label, **change})
+    return changes
+
+def _same_source(src, stored, value, now):
+    # source encore dans son TTL et de contenu identique : fresh() l'aurait
+    # reprise, la recollecter ne peut être qu'un doublon
+    canon = lambda v: json.dumps(v, ensure_ascii=False, sort_keys=True)
+    return stored is not None and stored["ts"] + source_ttl(src) > now and canon(stored["value"]) == canon(value)
+
+class DossierStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        return local_db(self._local, self._connect)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS dossiers (version INTEGER PRIMARY KEY AUTOINCREMENT, entity TEXT, nom TEXT, ts REAL, data BLOB);
+            CREATE INDEX IF NOT EXISTS dossiers_entity ON dossiers(entity, version);
+        """)
+        return db
+
+    @staticmethod
+    def _load(row):
+        return {"version": row[0], "nom": row[1], "ts": row[2], "sources": json.loads(zlib.decompress(row[3]))}
+
+    def versions(self, entity, limit=-1):
+        # du plus récent au plus ancien
+        rows = self._db().execute("SELECT version, nom, ts, data FROM dossiers WHERE entity=? ORDER BY version DESC LIMIT ?",
+                                  (entity, limit)).fetchall()
+        return [self._load(r) for r in rows]
+
+    def fresh(self, entity):
+        # → (dernière version ou None, {source: valeur} encore dans leur TTL)
+        try:
+            found = self.versions(entity, 1)
+        except sqlite3.Error as e:
+            log.warning("Dossier store error: %s", e)
+            return None, {}
+        if not found:
+            return None, {}
+        now = time.time()
+        fresh = {src: s["value"] for src, s in found[0]["sources"].items() if s["ts"] + source_ttl(src) > now}
+        METRICS.inc("intelcorp_dossier_sources_total", len(fresh), result="reused")
+        return found[0], fresh
+
+    def record(self, entity, name, collected):
+        # Nouvelle version = précédente + sources fraîchement collectées
+        # → (n° de version, changements sur ces sources) ; (None, []) en cas d'erreur
+        if not collected:
+            return None, []
+        now = time.time()
+        try:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")  # lecture + ajout atomiques entre workers
+                row = db.execute("SELECT version, nom, ts, data FROM dossiers WHERE entity=? ORDER BY version DESC LIMIT 1", (entity,)).fetchone()
+                prev = self._load(row)["sources"] if row else {}
+                if row and all(_same_source(src, prev.get(src), v, now) for src, v in collected.items()):
+                    return row[0], []  # déjà enregistrées (poll rejoué, second onglet) : pas de version vide
+                sources = {**prev, **{src: {"ts": now, "value": v} for src, v in collected.items()}}
+                data = zlib.compress(json.dumps(sources, ensure_ascii=False, separators=(",", ":")).encode())
+                version = db.execute("INSERT INTO dossiers (entity, nom, ts, data) VALUES (?,?,?,?)", (entity, name, now, data)).lastrowid
+        except sqlite3.Error as e:
+            log.warning("Dossier store error: %s", e)
+            return None, []
+        METRICS.inc("intelcorp_dossier_sources_total", len(collected), result="fetched")
+        return version, diff_versions({src: s["value"] for src, s in prev.items()}, collected)
+
+    def timeline(self, entity):
+        # → [(version, sources collectées, changements)] du plus ancien au plus récent
+        out, prev = [], {}
+        for v in reversed(self.versions(entity)):
+            collected = {src: s["value"] for src, s in v["sources"].items() if s["ts"] == v["ts"]}
+            out.append((v, sorted(collected), diff_versions(prev, collected)))
+            prev = {src: s["value"] for src, s in v["sources"].items()}
+        return out
+
+DOSSIERS = DossierStore(DOSSIER_DB) if DOSSIER_DB else None
+
+# ── BATCH ───────────────────────────────────────────────────
+# Screening d'un fichier de contreparties (CSV ou JSONL, colonnes nom/name
+# et pays/country) → JSONL en flux, une ligne par contrepartie unique :
+#   python3 intelcorp_v2.py batch contreparties.csv -o dossiers.jsonl
+# Le fichier de sortie sert de checkpoint : relancer la même commande
+# reprend là où le run précédent s'est arrêté.
+
+BATCH_SOURCES = ("live", "ai", "sanctions", "pep", "graph")  # graph : parties liées du dossier IA
+
+def _batch_rows(src):
+    groups = OrderedDict()
+    for i, row in enumerate(_read_bulk(src), 1):
+        row = {k.strip().lower(): (v or "").strip() if isinstance(v, str) else v for k, v in row.items() if k}
+        nom = row.get("nom") or row.get("name") or row.get("company") or ""
+        pays = (row.get("pays") or row.get("country") or row.get("jurisdiction_code") or "").lower()
+        jcode = (row.get("jurisdiction_code") or pays).lower()  # us_de ≠ us_ny pour un même numéro
+        numero = row.get("numero") or row.get("company_number") or ""
+        if not nom:
+            continue
+        key = f"{normalize(nom)}|{normalize(jcode)}"
+        groups.setdefault(key, {"key": key, "nom": nom, "pays": pays, "jcode": jcode, "numero": numero, "lignes": []})["lignes"].append(i)
+    return list(groups.values())
+
+def _batch_done(out):
+    # clés déjà écrites ; une dernière ligne tronquée par un crash est coupée
+    if not os.path.exists(out):
+        return set()
+    with open(out, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    done = set()
+    for line in data[:end].splitlines():
+        try:
+            done.add(json.loads(line)["key"])
+        except (ValueError, KeyError):
+            pass
+    return done
+
+def screen_counterparty(item, sources=BATCH_SOURCES, budget=None):
+    # Avec INTELCORP_DOSSIER_DB, les sources encore dans leur TTL sont reprises
+    # de la dernière version : une revue périodique ne paie que ce qui a expiré.
+    nom, pays = item["nom"], item["pays"]
+    entity = entity_key(nom, item.get("jcode") or pays, item.get("numero", ""))
+    prev, stored = DOSSIERS.fresh(entity) if DOSSIERS else (None, {})
+    calls = {
+        "live": (live_search, nom, pays),
+        "sanctions": (check_sanctions, nom),
+        "pep": (check_persons, nom),
+    }
+    calls = {k: v for k, v in calls.items() if k in sources and k not in stored}
+    if "ai" in sources:
+        calls.update({k: v for k, v in ai_calls(nom, pays, DOSSIER_SECTIONS).items() if k not in stored})
+    res, missing = fan_out(calls, budget)
+    missing = [k for k in missing if not k.startswith("ai:")]
+    collected = {k: v for k, v in res.items() if k in calls and k != "live" and v is not None}
+    res.update({k: v for k, v in stored.items() if k in sources or (k.startswith("ai:") and "ai" in sources)})
+    if "ai" in sources:
+        ai, done = merge_sections(res, DOSSIER_SECTIONS)
+        res["ai"] = ai if done else None
+        if len(done) < len(DOSSIER_SECTIONS):
+            missing.append("ai")
+    version, changes = DOSSIERS.record(entity, nom, collected) if DOSSIERS else (None, [])
+    # contrôle sanctions/PEP demandé mais non abouti : total null, jamais « 0 hit »
+    sc_count, sc_hits = res.get("sanctions") or (None, [])
+    pe_count, pe_hits = res.get("pep") or (None, [])
+    live, live_source = res.get("live", ([], "none"))
+    graph = screen_graph(nom, res["ai"], budget=budget) if "graph" in sources and res.get("ai") else None
+    score, niveau = risk(res.get("ai"), sc_count or 0, graph)
+    if niveau != "ELEVE" and any(k in sources and res.get(k) is None for k in ("sanctions", "pep")):
+        score, niveau = None, "INCOMPLET"  # pas de niveau « propre » sans screening
+    return {
+        **item,
+        "registre": live[0] if live else None, "registre_source": live_source,
+        "ai": res.get("ai"),
+        "sanctions": {"total": sc_count, "hits": sc_hits},
+        "pep": {"total": pe_count, "hits": pe_hits},
+        "parties": graph,
+        "score_risque": score, "niveau_risque": niveau,
+        "manquant": missing,
+        "version": version or (prev or {}).get("version"), "changements": changes,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def run_batch(src, out, workers=4, sources=BATCH_SOURCES, budget=120):
+    items = _batch_rows(src)
+    done = _batch_done(out)
+    todo = [it for it in items if it["key"] not in done]
+    print(f"⬡  {len(items)} contreparties uniques · {len(done)} déjà traitées · {len(todo)} à faire", file=sys.stderr)
+    n, failed, t = 0, 0, time.time()
+    with open(out, "a", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        # fenêtre bornée : on ne soumet jamais plus de 2×workers lignes d'avance
+        pending = {}
+        for item in todo:
+            pending[pool.submit(screen_counterparty, item, sources, budget)] = item
+            if len(pending) >= workers * 2:
+                finished, _ = wait(pending, return_when="FIRST_COMPLETED")
+                written, errors = _batch_write(f, {fut: pending.pop(fut) for fut in finished})
+                n, failed = n + written, failed + errors
+        written, errors = _batch_write(f, pending)
+        n, failed = n + written, failed + errors
+    print(f"✓ {n} dossiers écrits dans {out} en {time.time() - t:.1f}s", file=sys.stderr)
+    if failed:
+        print(f"⚠  {failed} contrepartie(s) en erreur, non écrites : relancer la commande les reprend", file=sys.stderr)
+    return n
+
+def _batch_write(f, finished):
+    # {future: ligne} → (écrites, en erreur) ; une contrepartie en erreur
+    # n'arrête pas le run et n'est pas écrite (reprise au prochain lancement)
+    written = 0
+    for fut, item in finished.items():
+        try:
+            row = fut.result()
+        except Exception as e:
+            log.warning("Batch %s error: %r", item["nom"], e)
+            continue
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        written += 1
+    f.flush()
+    return written, len(finished) - written
+
+# ── SURVEILLANCE ────────────────────────────────────────────
+# Watchlist (INTELCORP_WATCH_DB) : sociétés et leurs dirigeants, re-screenés
+# en tâche de fond contre l'index local OpenSanctions. Seules les entités
+# modifiées depuis la passe précédente (table changes d'update-sanctions)
+# sont comparées à la watchlist, via son propre index trigrammes ; les noms
+# ajoutés depuis, ou tous après un build-sanctions, sont screenés en entier
+# par lots. Un nouveau hit → alerte (table alerts, log, webhook optionnel).
+#   python3 intelcorp_v2.py watch add portefeuille.csv   (nom, pays, dirigeants séparés par « ; »)
+#   python3 intelcorp_v2.py watch run [--loop]           (ou INTELCORP_WATCH_INTERVAL côté serveur)
+#   python3 intelcorp_v2.py watch alerts
+
+WATCH_DB = os.environ.get("INTELCORP_WATCH_DB", "")
+WATCH_INTERVAL = int(os.environ.get("INTELCORP_WATCH_INTERVAL", "0"))  # secondes ; 0 = pas de passe côté serveur
+WATCH_WEBHOOK = os.environ.get("INTELCORP_WATCH_WEBHOOK", "")
+WATCH_BATCH = 500
+
+class Watchlist:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        return local_db(self._local, self._connect)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS watch (id INTEGER PRIMARY KEY, nom TEXT, norm TEXT, kind TEXT, pays TEXT,
+                parent INTEGER NOT NULL DEFAULT 0, added REAL, screened INTEGER NOT NULL DEFAULT 0, UNIQUE (norm, kind, parent));
+            CREATE INDEX IF NOT EXISTS watch_todo ON watch(screened);
+            CREATE VIRTUAL TABLE IF NOT EXISTS watch_tri USING fts5(norm, tokenize='trigram', detail='none');
+            CREATE VIRTUAL TABLE IF NOT EXISTS watch_tri_vocab USING fts5vocab(watch_tri, 'row');
+            CREATE TABLE IF NOT EXISTS alerts (id INTEGER PRIMARY KEY, watch_id INTEGER, entity_id TEXT, caption TEXT,
+                score REAL, ts REAL, removed REAL, UNIQUE (watch_id, entity_id));
+            CREATE INDEX IF NOT EXISTS alerts_entity ON alerts(entity_id);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        return db
+
+    @staticmethod
+    def _insert(db, nom, kind, pays, parent=0):
+        norm = name_key(nom)
+        if len(norm) < 2:
+            return None
+        row = db.execute("SELECT id FROM watch WHERE norm=? AND kind=? AND parent=?", (norm, kind, parent)).fetchone()
+        if row:
+            return row[0]
+        wid = db.execute("INSERT INTO watch (nom, norm, kind, pays, parent, added) VALUES (?,?,?,?,?,?)",
+                         (nom, norm, kind, pays, parent, time.time())).lastrowid
+        db.execute("INSERT INTO watch_tri (rowid, norm) VALUES (?,?)", (wid, norm))
+        return wid
+
+    def add(self, nom, pays="", dirigeants=()):
+        # société + ses dirigeants (rattachés) → id de la société ; screenés à la passe suivante
+        db = self._db()
+        with db:
+            cid = self._insert(db, nom, "company", pays)
+            for d in dirigeants:
+                self._insert(db, d, "person", pays, cid or 0)
+        return cid
+
+    def import_file(self, src):
+        n = 0
+        for row in _read_bulk(src):
+            row = {k.strip().lower(): (v or "").strip() if isinstance(v, str) else v for k, v in row.items() if k}
+            nom = row.get("nom") or row.get("name") or row.get("company") or ""
+            dirs = row.get("dirigeants") or row.get("directors") or ""
+            dirs = dirs if isinstance(dirs, list) else [d.strip() for d in re.split(r"[;|]", dirs) if d.strip()]
+            if nom and self.add(nom, (row.get("pays") or row.get("country") or "").lower(), dirs):
+                n += 1
+        return n
+
+    def is_watched(self, nom):
+        return self._db().execute("SELECT 1 FROM watch WHERE norm=? AND kind='company' AND parent=0", (name_key(nom),)).fetchone() is not None
+
+    def alerts(self, limit=100, active=True):
+        return [dict(r) for r in self._db().execute(f"""
+            SELECT a.*, w.nom AS nom, w.kind AS kind, p.nom AS societe FROM alerts a JOIN watch w ON w.id = a.watch_id
+            LEFT JOIN watch p ON p.id = w.parent {"WHERE a.removed IS NULL" if active else ""} ORDER BY a.ts DESC LIMIT ?""", (limit,))]
+
+    def _set_state(self, db, **values):
+        db.executemany("INSERT OR REPLACE INTO state VALUES (?,?)", [(k, str(v)) for k, v in values.items()])
+
+    def run(self):
+        # Une passe → nouvelles alertes. Delta des sanctions d'abord, puis les
+        # noms jamais screenés ; chaque lot est commité (reprise après arrêt).
+        if not SANCTIONS_DB or not os.path.exists(SANCTIONS_DB):
+            return []
+        db = self._db()
+        sdb = sqlite3.connect(SANCTIONS_DB, timeout=30)  # connexion neuve : suit un build-sanctions (os.replace)
+        sdb.row_factory = sqlite3.Row
+        try:
+            state = {r["key"]: r["value"] for r in db.execute("SELECT key, value FROM state")}
+            build = str(os.stat(SANCTIONS_DB).st_ino)
+            head = sdb.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            last = int(state.get("seq", 0))
+            if state.get("build") != build:
+                # index reconstruit : numérotation des changements repartie de zéro, tout est re-screené
+                with db:
+                    db.execute("UPDATE watch SET screened=0")
+                    self._set_state(db, build=build, seq=head)
+                last = head
+            alerts = []
+            while last < head:
+                rows = sdb.execute("SELECT seq, entity_id FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (last, WATCH_BATCH)).fetchall()
+                last = rows[-1]["seq"]
+                alerts += self._delta(db, sdb, {r["entity_id"] for r in rows}, last)
+            while True:
+                todo = db.execute("SELECT * FROM watch WHERE screened=0 LIMIT ?", (WATCH_BATCH,)).fetchall()
+                if not todo:
+                    break
+                alerts += self._full(db, sdb, todo)
+        finally:
+            sdb.close()
+        METRICS.inc("intelcorp_watch_alerts_total", len(alerts))
+        return alerts
+
+    def _delta(self, db, sdb, ids, seq):
+        # entités modifiées → noms actuels comparés à la watchlist ; disparues → alertes levées
+        marks = ",".join("?" * len(ids))
+        names = sdb.execute(f"SELECT entity_id, kind, norm FROM names WHERE entity_id IN ({marks})", list(ids)).fetchall()
+        captions = dict(sdb.execute(f"SELECT id, caption FROM entities WHERE id IN ({marks})", list(ids)).fetchall())
+        sql = """SELECT w.* FROM watch w JOIN (SELECT rowid FROM watch_tri WHERE watch_tri MATCH ? LIMIT 2000) t
+                 ON w.id = t.rowid WHERE w.kind = ?"""
+        hits = {}
+        for n in names:
+            cand = db.execute("SELECT * FROM watch WHERE norm = ? AND kind = ?", (n["norm"], n["kind"])).fetchall()
+            cand += fuzzy_candidates(db, "watch_tri", n["norm"], sql, (n["kind"],), cap=2000)
+            for w in cand:
+                score = 1.0 if w["norm"] == n["norm"] else screen_score(n["norm"], w["norm"])
+                key = (w["id"], n["entity_id"])
+                if score >= SCREEN_MIN and score > hits.get(key, (0,))[0]:
+                    hits[key] = (score, captions.get(n["entity_id"], ""))
+        with db:
+            now = time.time()
+            db.executemany("UPDATE alerts SET removed=? WHERE entity_id=? AND removed IS NULL",
+                           [(now, eid) for eid in ids if eid not in captions])
+            alerts = self._alert(db, hits, now)
+            self._set_state(db, seq=seq)
+        return alerts
+
+    def _full(self, db, sdb, todo):
+        hits = {}
+        for w in todo:
+            for h in screen(w["nom"], w["kind"], db=sdb)[1]:
+                hits[(w["id"], h["id"])] = (h["score"], h.get("caption", ""))
+        with db:
+            alerts = self._alert(db, hits, time.time())
+            db.executemany("UPDATE watch SET screened=1 WHERE id=?", [(w["id"],) for w in todo])
+        return alerts
+
+    def _alert(self, db, hits, now):
+        # nouvelle paire (surveillé, entité) ou entité revenue sur une liste → alerte
+        new = []
+        for (wid, eid), (score, caption) in hits.items():
+            cur = db.execute("""INSERT INTO alerts (watch_id, entity_id, caption, score, ts) VALUES (?,?,?,?,?)
+                ON CONFLICT (watch_id, entity_id) DO UPDATE SET removed=NULL, ts=excluded.ts, score=excluded.score
+                WHERE alerts.removed IS NOT NULL""", (wid, eid, caption, round(score, 3), now))
+            if cur.rowcount:
+                w = db.execute("SELECT w.nom, w.kind, p.nom FROM watch w LEFT JOIN watch p ON p.id = w.parent WHERE w.id=?", (wid,)).fetchone()
+                new.append({"watch_id": wid, "nom": w[0], "kind": w[1], "societe": w[2], "entity_id": eid,
+                            "caption": caption, "score": round(score, 3), "ts": now})
+        return new
+
+def notify(alerts):
+    for a in alerts:
+        log.warning("Watchlist alert: %s%s → %s (%s, %.2f)", a["nom"], f" [{a['societe']}]" if a["societe"] else "",
+                    a["caption"], a["entity_id"], a["score"])
+    if alerts and WATCH_WEBHOOK:
+        try:
+            http().post(WATCH_WEBHOOK, json={"alerts": alerts}, timeout=DEFAULT_TIMEOUT).raise_for_status()
+        except requests.RequestException as e:
+            log.warning("Watchlist webhook error: %s", e)
+
+@contextmanager
+def _watch_turn(path):
+    # une seule passe à la fois tous workers confondus : les autres sautent leur tour
+    if fcntl is None:
+        yield True
+        return
+    with open(path + ".lock", "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def watch_pass(watch):
+    with _watch_turn(watch.path) as mine:
+        if not mine:
+            return []
+        with span("watch_pass"):
+            alerts = watch.run()
+        notify(alerts)
+        return alerts
+
+def _watch_loop(watch, interval):
+    while True:
+        try:
+            watch_pass(watch)
+        except (sqlite3.Error, OSError) as e:
+            log.warning("Watchlist error: %s", e)
+        time.sleep(interval)
+
+WATCH = Watchlist(WATCH_DB) if WATCH_DB else None
+_watch_pid = None
+
+def ensure_monitor():
+    # un thread par process (après le fork gunicorn), verrou fichier entre eux
+    global _watch_pid
+    if WATCH and WATCH_INTERVAL and _watch_pid != os.getpid():
+        _watch_pid = os.getpid()
+        threading.Thread(target=_watch_loop, args=(WATCH, WATCH_INTERVAL), name="watchlist", daemon=True).start()
+
+# ── FILE D'ATTENTE ──────────────────────────────────────────
+# La génération des dossiers tourne hors requête : le callback soumet un job
+# et rend la main, l'UI interroge son état. Backend via INTELCORP_QUEUE :
+#   memory (défaut, un seul worker gunicorn) · sqlite:/chemin/jobs.db (partagé
+#   par tous les workers) · module:Classe (broker de production, même interface).
+# Les jobs identiques en cours sont fusionnés ; au-delà de INTELCORP_QUEUE_MAX
+# jobs en attente, les nouvelles demandes sont refusées.
+
+QUEUE_MAX = int(os.environ.get("INTELCORP_QUEUE_MAX", "64"))
+QUEUE_WORKERS = int(os.environ.get("INTELCORP_QUEUE_WORKERS", "4"))
+JOB_TIMEOUT = ANALYSE_BUDGET * 3
+
+class QueueFull(Exception):
+    pass
+
+def dossier_sanctions(name):
+    res, missing = fan_out({"sanctions": (check_sanctions, name), "pep": (check_persons, name)})
+    return {"sanctions": res.get("sanctions", (0, [])), "pep": res.get("pep", (0, [])), "missing": missing}
+
+def dossier_ai(name, country="", sections=",".join(DOSSIER_SECTIONS)):
+    sections = sections.split(",")
+    res, _ = fan_out(ai_calls(name, country, sections))
+    ai, done = merge_sections(res, sections)
+    parties = screen_graph(name, ai) if "gouvernance" in done else None
+    return {"ai": ai, "sections": done, "parties": parties, "missing": [] if len(done) == len(sections) else ["ai"]}
+
+def dossier_graph(name, gouvernance):
+    # section gouvernance reprise de l'historique : graphe screené seul
+    return screen_graph(name, gouvernance)
+
+JOB_TASKS = {"sanctions": dossier_sanctions, "ai": dossier_ai, "graph": dossier_graph}
+
+# Sous ASYNC_SERVING, la file en mémoire exécute ces variantes sur une boucle
+# de fond : QUEUE_MAX dossiers simultanés au lieu de QUEUE_WORKERS threads.
+# Le graphe (screen_graph) reste synchrone, dans un thread.
+
+async def adossier_sanctions(name):
+    res, missing = await afan_out({"sanctions": (acheck_sanctions, name), "pep": (acheck_persons, name)})
+    return {"sanctions": res.get("sanctions", (0, [])), "pep": res.get("pep", (0, [])), "missing": missing}
+
+async def adossier_ai(name, country="", sections=",".join(DOSSIER_SECTIONS)):
+    sections = sections.split(",")
+    res, _ = await afan_out({f"ai:{sec}": (aai_section, name, country, sec) for sec in sections})
+    ai, done = merge_sections(res, sections)
+    parties = await asyncio.to_thread(screen_graph, name, ai) if "gouvernance" in done else None
+    return {"ai": ai, "sections": done, "parties": parties, "missing": [] if len(done) == len(sections) else ["ai"]}
+
+async def adossier_graph(name, gouvernance):
+    return await asyncio.to_thread(screen_graph, name, gouvernance)
+
+AJOB_TASKS = {"sanctions": adossier_sanctions, "ai": adossier_ai, "graph": adossier_graph}
+
+_loop, _loop_lock = (None, None), threading.Lock()
+
+def aio_loop():
+    # boucle asyncio de fond du process, démarrée au premier usage (après le fork)
+    global _loop
+    with _loop_lock:
+        if _loop[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="aio", daemon=True).start()
+            _loop = (os.getpid(), loop)
+        return _loop[1]
+
+class JobQueue(ABC):
+    # Interface commune : submit() → id de job, get(id) → {"status", "result"}
+    # avec status ∈ queued · running · done · error (ou None si id inconnu).
+    # Un backend incomplet (module:Classe) échoue dès son instanciation.
+    @abstractmethod
+    def submit(self, task, *args): ...
+
+    @abstractmethod
+    def get(self, job_id): ...
+
+    @staticmethod
+    def job_key(task, args):
+        return "|".join([task, *(normalize(a) for a in args)])
+
+class MemoryQueue(JobQueue):
+    def __init__(self, workers=QUEUE_WORKERS, maxsize=QUEUE_MAX, aio=False):
+        self.maxsize, self.aio = maxsize, aio
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.jobs, self.inflight = {}, {}
+        self._lock = threading.Lock()
+
+    def submit(self, task, *args):
+        key = self.job_key(task, args)
+        with self._lock:
+            if key in self.inflight:
+                return self.inflight[key]
+            if len(self.inflight) >= self.maxsize:
+                raise QueueFull(f"{len(self.inflight)} jobs en cours")
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {"status": "queued", "result": None, "ts": time.time()}
+            self.inflight[key] = job_id
+            now = time.time()
+            for old in [j for j, v in self.jobs.items() if v["status"] in ("done", "error") and now - v["ts"] > 600]:
+                del self.jobs[old]
+        if self.aio:
+            asyncio.run_coroutine_threadsafe(self._arun(job_id, key, task, args), aio_loop())
+        else:
+            self.pool.submit(self._run, job_id, key, task, args)
+        return job_id
+
+    def _run(self, job_id, key, task, args):
+        self.jobs[job_id]["status"] = "running"
+        try:
+            result, status = JOB_TASKS[task](*args), "done"
+        except Exception as e:
+            log.warning("Job %s error: %s", task, e)
+            result, status = None, "error"
+        self._finish(job_id, key, result, status)
+
+    async def _arun(self, job_id, key, task, args):
+        self.jobs[job_id]["status"] = "running"
+        try:
+            result, status = await AJOB_TASKS[task](*args), "done"
+        except Exception as e:
+            log.warning("Job %s error: %s", task, e)
+            result, status = None, "error"
+        self._finish(job_id, key, result, status)
+
+    def _finish(self, job_id, key, result, status):
+        with self._lock:
+            self.jobs[job_id] = {"status": status, "result": result, "ts": time.time()}
+            self.inflight.pop(key, None)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id, {"status": None, "result": None})
+
+class SqliteQueue(JobQueue):
+    def __init__(self, path, workers=QUEUE_WORKERS, maxsize=QUEUE_MAX):
+        self.path, self.workers, self.maxsize = path, workers, maxsize
+        self._local, self._pid = threading.local(), None
+        self._wake = threading.Event()
+        # schéma sur une connexion jetable : rien d'ouvert dans le master avant le fork
+        db = self._connect()
+        try:
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, key TEXT, task TEXT, args TEXT,
+                status TEXT, result TEXT, created REAL, started REAL, finished REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs(key, status)")
+        finally:
+            db.close()
+
+    def _db(self):
+        return local_db(self._local, self._connect)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _ensure_workers(self):
+        # threads démarrés dans chaque process (après le fork gunicorn)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._loop, name=f"job-{i}", daemon=True).start()
+
+    def submit(self, task, *args):
+        self._ensure_workers()
+        key, db = self.job_key(task, args), self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT id FROM jobs WHERE key=? AND status IN ('queued','running')", (key,)).fetchone()
+            if row:
+                return row[0]
+            depth = db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued','running')").fetchone()[0]
+            if depth >= self.maxsize:
+                raise QueueFull(f"{depth} jobs en cours")
+            job_id = uuid.uuid4().hex
+            db.execute("INSERT INTO jobs (id, key, task, args, status, created) VALUES (?,?,?,?,'queued',?)",
+                       (job_id, key, task, json.dumps(args), time.time()))
+            return job_id
+        finally:
+            db.execute("COMMIT")
+            self._wake.set()
+
+    def get(self, job_id):
+        self._ensure_workers()
+        row = self._db().execute("SELECT status, result FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if not row:
+            return {"status": None, "result": None}
+        return {"status": row[0], "result": json.loads(row[1]) if row[1] else None}
+
+    def _claim(self):
+        # un job en attente, ou un job « running » abandonné par un worker mort
+        now = time.time()
+        return self._db().execute("""UPDATE jobs SET status='running', started=?
+            WHERE id = (SELECT id FROM jobs WHERE status='queued' OR (status='running' AND started<?)
+                        ORDER BY created LIMIT 1)
+            RETURNING id, task, args""", (now, now - JOB_TIMEOUT)).fetchone()
+
+    def _loop(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                log.warning("Queue error: %s", e)
+                job = None
+            if not job:
+                self._wake.wait(0.5)
+                self._wake.clear()
+                continue
+            job_id, task, args = job
+            try:
+                result, status = json.dumps(JOB_TASKS[task](*json.loads(args))), "done"
+            except Exception as e:
+                log.warning("Job %s error: %s", task, e)
+                result, status = None, "error"
+            db = self._db()
+            db.execute("UPDATE jobs SET status=?, result=?, finished=? WHERE id=?", (status, result, time.time(), job_id))
+            if random.random() < 0.02:
+                db.execute("DELETE FROM jobs WHERE status IN ('done','error') AND finished<?", (time.time() - 3600,))
+
+def make_queue(spec):
+    spec = spec or "memory"
+    if spec == "memory":
+        return MemoryQueue(aio=ASYNC_SERVING)
+    if spec.startswith("sqlite:"):
+        return SqliteQueue(spec[len("sqlite:"):])
+    module, _, cls = spec.partition(":")
+    return getattr(importlib.import_module(module), cls)()
+
+JOBS = make_queue(os.environ.get("INTELCORP_QUEUE"))
 
 # ── APP ─────────────────────────────────────────────────────
 
-app = Dash(__name__, suppress_callback_exceptions=True)
+LIVE_DEBOUNCE = float(os.environ.get("INTELCORP_DEBOUNCE", "0.35"))
 
-app.index_string = f'''<!DOCTYPE html>
+# Polices : préconnexion + feuille Google Fonts dans <head> (plus d'@import
+# en tête de CUSTOM_CSS, qui sérialisait les téléchargements). CUSTOM_CSS est
+# servi à une URL empreinte (crc32) avec un cache navigateur d'un an.
+FONTS_URL = "https://fonts.googleapis.com/css2?family=DM+Mono:wght@300;400;500&family=Playfair+Display:wght@400;600&display=swap"
+CSS_FILE = f"intelcorp.{zlib.crc32(CUSTOM_CSS.encode()):08x}.css"
+
+INDEX_STRING = '''<!DOCTYPE html>
 <html>
 <head>
-    {{%metas%}}
+    {%metas%}
     <title>IntelCorp — Company Intelligence</title>
-    {{%favicon%}}
-    {{%css%}}
-    <style>{CUSTOM_CSS}</style>
+    {%favicon%}
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    {%css%}
 </head>
 <body>
-    {{%app_entry%}}
-    <footer>{{%config%}}{{%scripts%}}{{%renderer%}}</footer>
+    {%app_entry%}
+    <footer>{%config%}{%scripts%}{%renderer%}</footer>
 </body>
 </html>'''
 
-app.layout = html.Div(style={"backgroundColor":"var(--bg)","minHeight":"100vh","fontFamily":"var(--mono)"}, children=[
+def layout():
+    # construit une seule fois par create_app()
+    return html.Div(style={"backgroundColor":"var(--bg)","minHeight":"100vh","fontFamily":"var(--mono)"}, children=[
 
-    # ── NAVBAR ──────────────────────────────────────────────
-    html.Div(style={
-        "backgroundColor":"var(--bg2)","borderBottom":"1px solid var(--border)",
-        "padding":"0 40px","height":"56px","display":"flex",
-        "justifyContent":"space-between","alignItems":"center",
-        "position":"sticky","top":"0","zIndex":"100",
-    }, children=[
-        html.Div(style={"display":"flex","alignItems":"center","gap":"12px"}, children=[
-            html.Div(style={
-                "width":"28px","height":"28px","background":"var(--gold)",
-                "borderRadius":"50%","display":"flex","alignItems":"center",
-                "justifyContent":"center","fontSize":"14px","color":"var(--bg)","fontWeight":"bold"
-            }, children="I"),
-            html.Div(style={"display":"flex","gap":"1px"}, children=[
-                html.Span("Intel", style={"color":"#fff","fontSize":"15px","fontFamily":"var(--serif)","fontWeight":"600","letterSpacing":"0.5px"}),
-                html.Span("Corp", style={"color":"var(--gold)","fontSize":"15px","fontFamily":"var(--serif)","fontWeight":"600","letterSpacing":"0.5px"}),
+        # ── NAVBAR ──────────────────────────────────────────────
+        html.Div(style={
+            "backgroundColor":"var(--bg2)","borderBottom":"1px solid var(--border)",
+            "padding":"0 40px","height":"56px","display":"flex",
+            "justifyContent":"space-between","alignItems":"center",
+            "position":"sticky","top":"0","zIndex":"100",
+        }, children=[
+            html.Div(style={"display":"flex","alignItems":"center","gap":"12px"}, children=[
+                html.Div(style={
+                    "width":"28px","height":"28px","background":"var(--gold)",
+                    "borderRadius":"50%","display":"flex","alignItems":"center",
+                    "justifyContent":"center","fontSize":"14px","color":"var(--bg)","fontWeight":"bold"
+                }, children="I"),
+                html.Div(style={"display":"flex","gap":"1px"}, children=[
+                    html.Span("Intel", style={"color":"#fff","fontSize":"15px","fontFamily":"var(--serif)","fontWeight":"600","letterSpacing":"0.5px"}),
+                    html.Span("Corp", style={"color":"var(--gold)","fontSize":"15px","fontFamily":"var(--serif)","fontWeight":"600","letterSpacing":"0.5px"}),
+                ]),
+                html.Div("BETA", style={"fontSize":"8px","letterSpacing":"2px","color":"var(--text3)","border":"1px solid var(--border2)","padding":"2px 6px","borderRadius":"2px","marginLeft":"5px"}),
+            ]),
+            html.Div(style={"display":"flex","gap":"30px","alignItems":"center"}, children=[
+                html.Div("COMMODITY · DUE DILIGENCE · GROQ AI", style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"3px"}),
             ]),
-            html.Div("BETA", style={"fontSize":"8px","letterSpacing":"2px","color":"var(--text3)","border":"1px solid var(--border2)","padding":"2px 6px","borderRadius":"2px","marginLeft":"5px"}),
-        ]),
-        html.Div(style={"display":"flex","gap":"30px","alignItems":"center"}, children=[
-            html.Div("COMMODITY · DUE DILIGENCE · GROQ AI", style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"3px"}),
         ]),
-    ]),
-
-    # ── HERO ────────────────────────────────────────────────
-    html.Div(style={
-        "padding":"70px 40px 50px",
-        "background":"linear-gradient(160deg, #0c0f26 0%, var(--bg) 60%)",
-        "borderBottom":"1px solid var(--border)",
-        "position":"relative","overflow":"hidden",
-    }, children=[
-        # Fond décoratif
+
+        # ── HERO ────────────────────────────────────────────────
         html.Div(style={
-            "position":"absolute","top":"-100px","right":"-100px",
-            "width":"400px","height":"400px","borderRadius":"50%",
-            "background":"radial-gradient(circle, rgba(200,169,81,0.06) 0%, transparent 70%)",
-            "pointerEvents":"none",
-        }),
-
-        html.Div(style={"maxWidth":"700px","position":"relative"}, children=[
-            html.Div("DUE DILIGENCE PLATFORM", style={
-                "color":"var(--gold)","fontSize":"10px","letterSpacing":"5px",
-                "marginBottom":"16px","fontWeight":"500",
+            "padding":"70px 40px 50px",
+            "background":"linear-gradient(160deg, #0c0f26 0%, var(--bg) 60%)",
+            "borderBottom":"1px solid var(--border)",
+            "position":"relative","overflow":"hidden",
+        }, children=[
+            # Fond décoratif
+            html.Div(style={
+                "position":"absolute","top":"-100px","right":"-100px",
+                "width":"400px","height":"400px","borderRadius":"50%",
+                "background":"radial-gradient(circle, rgba(200,169,81,0.06) 0%, transparent 70%)",
+                "pointerEvents":"none",
             }),
-            html.H1(style={
-                "fontFamily":"var(--serif)","fontWeight":"600","fontSize":"42px",
-                "color":"#fff","lineHeight":"1.15","marginBottom":"12px","letterSpacing":"-0.5px",
-            }, children=[
-                "Company Intelligence",
-                html.Br(),
-                html.Span("& Risk Assessment", style={"color":"var(--text2)","fontSize":"34px"}),
-            ]),
-            html.P("Recherche instantanée · Dirigeants · Sanctions · Registres officiels · Score de risque IA",
-                style={"color":"var(--text3)","fontSize":"12px","letterSpacing":"1.5px","marginBottom":"40px"}),
-
-            # SEARCH BAR
-            html.Div(style={"display":"flex","gap":"0","marginBottom":"12px"}, children=[
-                html.Div("⌕", style={
-                    "backgroundColor":"var(--bg3)","border":"1px solid var(--border2)",
-                    "borderRight":"none","padding":"0 18px","display":"flex",
-                    "alignItems":"center","fontSize":"20px","color":"var(--text3)",
-                    "borderRadius":"4px 0 0 4px",
+
+            html.Div(style={"maxWidth":"700px","position":"relative"}, children=[
+                html.Div("DUE DILIGENCE PLATFORM", style={
+                    "color":"var(--gold)","fontSize":"10px","letterSpacing":"5px",
+                    "marginBottom":"16px","fontWeight":"500",
                 }),
-                dcc.Input(
-                    id="company-input", type="text",
-                    placeholder="Rechercher une société... ex: Glencore, Rosneft, Microsoft",
-                    debounce=False, n_submit=0,
-                    className="search-input",
-                    style={
-                        "flex":"1","backgroundColor":"var(--bg3)",
-                        "border":"1px solid var(--border2)","borderLeft":"none","borderRight":"none",
-                        "color":"#fff","padding":"16px 20px","fontSize":"15px",
-                        "outline":"none","fontFamily":"var(--mono)",
-                        "transition":"border-color 0.2s",
-                    }
-                ),
-                dcc.Dropdown(
-                    id="filter-country",
-                    options=[
-                        {"label":"🌍  Tous pays","value":""},
-                        {"label":"🇫🇷  France","value":"fr"},{"label":"🇬🇧  Royaume-Uni","value":"gb"},
-                        {"label":"🇺🇸  États-Unis","value":"us"},{"label":"🇨🇭  Suisse","value":"ch"},
-                        {"label":"🇩🇪  Allemagne","value":"de"},{"label":"🇳🇱  Pays-Bas","value":"nl"},
-                        {"label":"🇸🇬  Singapour","value":"sg"},{"label":"🇦🇪  Émirats","value":"ae"},
-                        {"label":"🇷🇺  Russie","value":"ru"},{"label":"🇨🇳  Chine","value":"cn"},
-                        {"label":"🇸🇳  Sénégal","value":"sn"},{"label":"🇲🇦  Maroc","value":"ma"},
-                        {"label":"🇨🇮  Côte d'Ivoire","value":"ci"},{"label":"🇰🇾  Îles Caïmans","value":"ky"},
-                        {"label":"🇱🇺  Luxembourg","value":"lu"},{"label":"🇳🇬  Nigéria","value":"ng"},
-                    ],
-                    value="", clearable=False,
-                    style={"width":"200px","borderRadius":"0","fontFamily":"var(--mono)"},
-                ),
-                html.Button("ANALYSER", id="search-btn", n_clicks=0,
-                    className="analyze-btn",
-                    style={
-                        "backgroundColor":"var(--gold)","color":"var(--bg)","border":"none",
-                        "padding":"0 28px","fontSize":"11px","letterSpacing":"2px",
-                        "cursor":"pointer","fontFamily":"var(--mono)","fontWeight":"500",
-                        "borderRadius":"0 4px 4px 0","transition":"background 0.2s","whiteSpace":"nowrap",
+                html.H1(style={
+                    "fontFamily":"var(--serif)","fontWeight":"600","fontSize":"42px",
+                    "color":"#fff","lineHeight":"1.15","marginBottom":"12px","letterSpacing":"-0.5px",
+                }, children=[
+                    "Company Intelligence",
+                    html.Br(),
+                    html.Span("& Risk Assessment", style={"color":"var(--text2)","fontSize":"34px"}),
+                ]),
+                html.P("Recherche instantanée · Dirigeants · Sanctions · Registres officiels · Score de risque IA",
+                    style={"color":"var(--text3)","fontSize":"12px","letterSpacing":"1.5px","marginBottom":"40px"}),
+
+                # SEARCH BAR
+                html.Div(style={"display":"flex","gap":"0","marginBottom":"12px"}, children=[
+                    html.Div("⌕", style={
+                        "backgroundColor":"var(--bg3)","border":"1px solid var(--border2)",
+                        "borderRight":"none","padding":"0 18px","display":"flex",
+                        "alignItems":"center","fontSize":"20px","color":"var(--text3)",
+                        "borderRadius":"4px 0 0 4px",
                     }),
+                    dcc.Input(
+                        id="company-input", type="text",
+                        placeholder="Rechercher une société... ex: Glencore, Rosneft, Microsoft",
+                        debounce=LIVE_DEBOUNCE, n_submit=0,
+                        className="search-input",
+                        style={
+                            "flex":"1","backgroundColor":"var(--bg3)",
+                            "border":"1px solid var(--border2)","borderLeft":"none","borderRight":"none",
+                            "color":"#fff","padding":"16px 20px","fontSize":"15px",
+                            "outline":"none","fontFamily":"var(--mono)",
+                            "transition":"border-color 0.2s",
+                        }
+                    ),
+                    dcc.Dropdown(
+                        id="filter-country",
+                        options=[
+                            {"label":"🌍  Tous pays","value":""},
+                            {"label":"🇫🇷  France","value":"fr"},{"label":"🇬🇧  Royaume-Uni","value":"gb"},
+                            {"label":"🇺🇸  États-Unis","value":"us"},{"label":"🇨🇭  Suisse","value":"ch"},
+                            {"label":"🇩🇪  Allemagne","value":"de"},{"label":"🇳🇱  Pays-Bas","value":"nl"},
+                            {"label":"🇸🇬  Singapour","value":"sg"},{"label":"🇦🇪  Émirats","value":"ae"},
+                            {"label":"🇷🇺  Russie","value":"ru"},{"label":"🇨🇳  Chine","value":"cn"},
+                            {"label":"🇸🇳  Sénégal","value":"sn"},{"label":"🇲🇦  Maroc","value":"ma"},
+                            {"label":"🇨🇮  Côte d'Ivoire","value":"ci"},{"label":"🇰🇾  Îles Caïmans","value":"ky"},
+                            {"label":"🇱🇺  Luxembourg","value":"lu"},{"label":"🇳🇬  Nigéria","value":"ng"},
+                        ],
+                        value="", clearable=False,
+                        style={"width":"200px","borderRadius":"0","fontFamily":"var(--mono)"},
+                    ),
+                    html.Button("ANALYSER", id="search-btn", n_clicks=0,
+                        className="analyze-btn",
+                        style={
+                            "backgroundColor":"var(--gold)","color":"var(--bg)","border":"none",
+                            "padding":"0 28px","fontSize":"11px","letterSpacing":"2px",
+                            "cursor":"pointer","fontFamily":"var(--mono)","fontWeight":"500",
+                            "borderRadius":"0 4px 4px 0","transition":"background 0.2s","whiteSpace":"nowrap",
+                        }),
+                ]),
+                html.Div(id="search-status", style={"color":"var(--text3)","fontSize":"10px","letterSpacing":"1px","height":"16px"}),
+                # Filtres et tri appliqués dans le navigateur sur les résultats reçus
+                html.Div(className="live-tools", children=[
+                    dcc.Dropdown(id="filter-status", className="tool", value="", clearable=False, searchable=False, options=[
+                        {"label":"Tous statuts","value":""}, {"label":"Actives","value":"active"},
+                        {"label":"Dissoutes","value":"dissoute"}, {"label":"Autres statuts","value":"autre"},
+                    ]),
+                    dcc.Input(id="filter-since", type="number", min=1800, max=2100, debounce=LIVE_DEBOUNCE,
+                        placeholder="Créée depuis (année)", className="tool-input"),
+                    dcc.Dropdown(id="sort-live", className="tool", value="", clearable=False, searchable=False, options=[
+                        {"label":"Tri : pertinence","value":""}, {"label":"Tri : nom A → Z","value":"nom"},
+                        {"label":"Tri : plus récentes","value":"recent"}, {"label":"Tri : plus anciennes","value":"ancien"},
+                    ]),
+                ]),
             ]),
-            html.Div(id="search-status", style={"color":"var(--text3)","fontSize":"10px","letterSpacing":"1px","height":"16px"}),
         ]),
-    ]),
 
-    # ── RESULTS ─────────────────────────────────────────────
-    html.Div(style={"maxWidth":"1200px","margin":"0 auto","padding":"30px 40px"}, children=[
-        html.Div(id="live-results"),
-        html.Div(id="analysis-result"),
-    ]),
-])
+        # ── RESULTS ─────────────────────────────────────────────
+        html.Div(style={"maxWidth":"1200px","margin":"0 auto","padding":"30px 40px"}, children=[
+            dcc.Store(id="search-request"),
+            dcc.Store(id="search-response"),
+            dcc.Store(id="live-more"),
+            dcc.Store(id="search-page"),
+            dcc.Store(id="live-data"),
+            dcc.Store(id="live-window", data=0),
+            html.Div(id="live-results"),
+            dcc.Store(id="analysis-target"),
+            dcc.Store(id="analysis-jobs"),
+            dcc.Interval(id="dossier-poll", interval=700, disabled=True),
+            dcc.Store(id="dossier-ai"),
+            dcc.Store(id="dossier-sanctions"),
+            html.Div(id="analysis-result"),
+        ]),
+    ])
 
 # ── CALLBACK 1 : Live search ─────────────────────────────────
+# Chaque frappe (après debounce) reçoit un numéro de séquence par onglet :
+# le serveur abandonne les requêtes déjà dépassées et le navigateur
+# ignore les réponses arrivées dans le désordre.
+
+# Un changement de pays ne repart au serveur que si le jeu affiché ne suffit
+# pas : il faut une réponse « tous pays » complète (toutes pages reçues) pour
+# la même requête, sinon des sociétés du pays choisi pourraient manquer.
+clientside_callback(
+    """function(query, country, data) {
+        var q = query || "", c = country || "";
+        var trig = (window.dash_clientside.callback_context.triggered[0] || {}).prop_id || "";
+        if (trig.indexOf("filter-country.") === 0 && data && data.seq === window.intelcorpSeq
+                && data.complete && data.country === "" && data.q === q.trim()) {
+            return window.dash_clientside.no_update;
+        }
+        window.intelcorpTab = window.intelcorpTab || Math.random().toString(36).slice(2);
+        window.intelcorpSeq = (window.intelcorpSeq || 0) + 1;
+        return {q: q, country: c, tab: window.intelcorpTab, seq: window.intelcorpSeq};
+    }""",
+    Output("search-request","data"),
+    Input("company-input","value"),
+    Input("filter-country","value"),
+    State("live-data","data"),
+    prevent_initial_call=True
+)
 
-@app.callback(
+# Jeu de lignes reçu : première page (frappe) puis pages suivantes (défilement),
+# accumulées dans le navigateur. Revenir en arrière ou re-filtrer ne
+# redemande rien au serveur.
+clientside_callback(
+    """function(resp, page, data) {
+        var nu = window.dash_clientside.no_update;
+        var trig = (window.dash_clientside.callback_context.triggered[0] || {}).prop_id || "";
+        if (trig.indexOf("search-response.") === 0) {
+            return resp && resp.seq === window.intelcorpSeq ? resp : nu;
+        }
+        if (!page || !data || !data.rows || page.seq !== data.seq || page.offset !== data.next) { return nu; }
+        var key = function(co) { return [co.nom || "", co.pays || "", co.jcode || co.cc || "", co.numero || ""].join("||"); };
+        var seen = {};
+        data.rows.forEach(function(co) { seen[key(co)] = true; });
+        var rows = data.rows.concat(page.rows.filter(function(co) { return !seen[key(co)]; }));
+        var total = page.total || data.total;
+        return Object.assign({}, data, {rows: rows, next: page.next, total: total, error: page.error,
+            complete: page.next === null && !page.error && (!total || rows.length >= total)});
+    }""",
+    Output("live-data","data"),
+    Input("search-response","data"),
+    Input("search-page","data"),
+    State("live-data","data"),
+    prevent_initial_call=True
+)
+
+# Filtres (pays, statut, année), tri et balisage appliqués ici (mêmes classes
+# CSS). Liste fenêtrée : seules ~50 lignes autour de la zone visible sont
+# montées, des espaceurs tiennent la hauteur du reste. Le défilement met à
+# jour « live-window » (dernière ligne visible, par pas de 10) ; près de la
+# fin des lignes reçues, la page suivante est demandée via « live-more ».
+clientside_callback(
+    """function(data, country, statut, since, order, last) {
+        var nu = window.dash_clientside.no_update;
+        if (!data || data.seq !== window.intelcorpSeq) { return [nu, nu, nu]; }
+        var ROW_H = 68, STEP = 10;  // hauteur d'une ligne (cf. .live-list), pas de défilement
+        if (!window.intelcorpScroll) {
+            window.intelcorpScroll = true;
+            document.addEventListener("scroll", function(e) {
+                var vp = e.target;
+                if (!vp || vp.id !== "live-viewport") { return; }
+                var bottom = Math.floor((vp.scrollTop + vp.clientHeight) / ROW_H / STEP) * STEP;
+                if (bottom !== window.intelcorpLast) {
+                    window.intelcorpLast = bottom;
+                    window.dash_clientside.set_props("live-window", {data: bottom});
+                }
+            }, true);
+        }
+        // nouvelle recherche, filtre ou tri : retour en haut de liste
+        var trig = (window.dash_clientside.callback_context.triggered[0] || {}).prop_id || "";
+        if (trig.indexOf("live-window.") !== 0 && (trig.indexOf("live-data.") !== 0 || window.intelcorpShown !== data.seq)) {
+            var vp = document.getElementById("live-viewport");
+            if (vp) { vp.scrollTop = 0; }
+            last = window.intelcorpLast = 0;
+        }
+        window.intelcorpShown = data.seq;
+        var h = function(type, cls, children, props) {
+            return {type: type, namespace: "dash_html_components",
+                    props: Object.assign({className: cls, children: children}, props || {})};
+        };
+        var empty = function(text) { return h("Div", "empty", [h("Div", "empty-icon", "○"), h("Div", "", text)]); };
+        if (!data.rows) { return [null, data.status, nu]; }
+        if (!data.rows.length) { return [empty("Aucun résultat pour « " + data.q + " »"), data.status, nu]; }
+        var etat = function(co) {
+            var s = (co.statut || "").toLowerCase();
+            if (s.indexOf("active") >= 0) { return ["active", "ACTIVE", "tag-green"]; }
+            if (s.indexOf("dissolved") >= 0 || s.indexOf("struck") >= 0) { return ["dissoute", "DISSOUTE", "tag-red"]; }
+            return ["autre", s.toUpperCase().slice(0, 10) || "—", "tag-orange"];
+        };
+        var year = function(co) { return parseInt((co.date || "").slice(0, 4), 10) || 0; };
+        var shown = data.rows.filter(function(co) {
+            return (!country || co.cc === country) && (!statut || etat(co)[0] === statut) && (!since || year(co) >= since);
+        });
+        if (order === "nom") { shown.sort(function(a, b) { return (a.nom || "").localeCompare(b.nom || ""); }); }
+        if (order === "recent") { shown.sort(function(a, b) { return year(b) - year(a); }); }
+        if (order === "ancien") { shown.sort(function(a, b) { return (year(a) || 9999) - (year(b) || 9999); }); }
+        last = last || 0;
+        var start = Math.max(0, last - 3 * STEP), end = Math.min(shown.length, last + 2 * STEP);
+        // page suivante : fin de liste en vue, ou filtres qui laissent la liste presque vide
+        var more = nu, pending = data.next !== null && data.next !== undefined;
+        var near = last + STEP >= shown.length || shown.length < STEP;
+        if (pending && near && window.intelcorpMore !== data.seq + ":" + data.next) {
+            window.intelcorpMore = data.seq + ":" + data.next;
+            more = {q: data.q, country: data.country, src: data.src, offset: data.next, seq: data.seq, tab: window.intelcorpTab};
+        }
+        var note = data.note + (data.error ? " · ⚠ pages suivantes indisponibles" : "");
+        var status = shown.length === data.rows.length
+            ? "✓ " + data.rows.length + (data.total > data.rows.length ? " sur " + data.total : "") + " résultat(s) · " + note
+            : "✓ " + shown.length + "/" + data.rows.length + " affiché(s) · " + note;
+        if (!shown.length) {
+            return [empty(pending ? "Recherche dans les pages suivantes…" : "Aucun résultat ne correspond aux filtres"), status, more];
+        }
+        var rows = shown.slice(start, end).map(function(co) {
+            var e = etat(co);
+            var meta = [h("Span", "loc", "📍 " + (co.pays || "") + " " + (co.ville ? "· " + co.ville : ""))];
+            if (co.type) { meta.push(h("Span", "", "🏢 " + co.type.slice(0, 32))); }
+            if (co.date) { meta.push(h("Span", "", "📅 " + co.date)); }
+            if (co.numero && co.numero !== "—") { meta.push(h("Span", "num", "#" + co.numero)); }
+            var index = [co.nom || "", co.pays || "", co.jcode || co.cc || "", co.numero || ""].join("||");
+            return h("Div", "result-row", [
+                h("Div", "row-main", [
+                    h("Div", "row-flag", co.flag || "🏳️"),
+                    h("Div", "row-body", [h("Div", "row-name", co.nom || ""), h("Div", "row-meta", meta)]),
+                ]),
+                h("Div", "row-side", [
+                    h("Span", "tag " + e[2], e[1]),
+                    h("Button", "row-btn ghost-btn", "ANALYSER →", {id: {type: "row-btn", index: index}, n_clicks: 0}),
+                ]),
+            ], {key: index});
+        });
+        var spacer = function(n, key) { return h("Div", "", null, {key: key, style: {height: n * ROW_H + "px"}}); };
+        return [h("Div", "live fade-in", [
+            h("Div", "live-head", [
+                h("Div", "", [h("Span", "live-count", shown.length + " SOCIÉTÉS TROUVÉES"
+                                + (data.total > data.rows.length ? " · " + data.total + " AU TOTAL" : "")),
+                              h("Span", "live-src tone-" + data.tone, data.label)]),
+                h("Span", "live-hint", "Cliquez sur ANALYSER pour la fiche complète"),
+            ]),
+            h("Div", "live-list", [spacer(start, "haut")].concat(rows, [spacer(shown.length - end, "bas"),
+                pending ? h("Div", "live-loading", "⬡  Chargement des résultats suivants…", {key: "suite"}) : null]),
+              {id: "live-viewport"}),
+        ]), status, more];
+    }""",
     Output("live-results","children"),
     Output("search-status","children"),
-    Input("company-input","value"),
+    Output("live-more","data"),
+    Input("live-data","data"),
     Input("filter-country","value"),
+    Input("filter-status","value"),
+    Input("filter-since","value"),
+    Input("sort-live","value"),
+    Input("live-window","data"),
     prevent_initial_call=True
 )
-def update_live(query, country):
+
+_latest_seq, _seq_lock = OrderedDict(), threading.Lock()
+
+def _is_stale(tab, seq, register=False):
+    with _seq_lock:
+        if register and seq > _latest_seq.get(tab, 0):
+            _latest_seq[tab] = seq
+            _latest_seq.move_to_end(tab)
+            while len(_latest_seq) > 4096:
+                _latest_seq.popitem(last=False)
+        return _latest_seq.get(tab, 0) > seq
+
+def update_live(req):
+    tab, seq = req.get("tab"), req.get("seq", 0)
+    if _is_stale(tab, seq, register=True):
+        return no_update
+    with span("layout_live"):
+        payload = live_payload(req.get("q"), req.get("country"))
+    if _is_stale(tab, seq):
+        return no_update
+    return {"seq": seq, **payload}
+
+async def aupdate_live(req):
+    # sous ASYNC_SERVING : la frappe attend l'amont sans occuper de thread
+    tab, seq = req.get("tab"), req.get("seq", 0)
+    if _is_stale(tab, seq, register=True):
+        return no_update
+    with span("layout_live"):
+        payload = await alive_payload(req.get("q"), req.get("country"))
+    if _is_stale(tab, seq):
+        return no_update
+    return {"seq": seq, **payload}
+
+callback(
+    Output("search-response","data"),
+    Input("search-request","data"),
+    prevent_initial_call=True
+)(aupdate_live if ASYNC_SERVING else update_live)
+
+def more_live(req):
+    # page suivante d'une recherche encore affichée
+    if not req or _is_stale(req.get("tab"), req.get("seq", 0)):
+        return no_update
+    with span("layout_live_more"):
+        payload = live_more_payload(req.get("q", ""), req.get("country", ""), req.get("src"), int(req.get("offset", 0)))
+    return {"seq": req["seq"], "offset": req["offset"], **payload}
+
+async def amore_live(req):
+    # pages au défilement, moins fréquentes : chemin synchrone dans un thread
+    return await asyncio.to_thread(more_live, req)
+
+callback(
+    Output("search-page","data"),
+    Input("live-more","data"),
+    prevent_initial_call=True
+)(amore_live if ASYNC_SERVING else more_live)
+
+LIVE_SOURCES = {  # libellé, teinte CSS
+    "opencorporates": ("OPENCORPORATES", "blue"),
+    "registry":       ("REGISTRE LOCAL", "green"),
+    "groq":           ("GROQ AI", "gold"),
+    "stale":          ("CACHE · MODE DÉGRADÉ", "orange"),
+}
+PROVIDER_LABELS = {"opencorporates": "OpenCorporates", "opensanctions": "OpenSanctions", "groq": "Groq"}
+LIVE_FIELDS = ("nom", "numero", "cc", "jcode", "pays", "flag", "statut", "date", "ville", "type")
+
+def _live_rows(results):
+    return [{k: co[k][:32] if k == "type" else co[k] for k in LIVE_FIELDS if co.get(k)} for co in results]
+
+def live_payload(query, country):
+    # Données seules : filtres, tri et rendu des lignes sont faits côté navigateur.
+    # « next » : curseur de la page suivante (None si tout est là) ;
+    # « complete » : résultats registre tous reçus → filtrable localement.
     if not query or len(query.strip()) < 2:
-        return html.Div(), ""
+        return {"rows": None, "status": ""}
 
-    results, source = live_search(query.strip(), country or "")
+    query, country = query.strip(), country or ""
+    results, source = live_search(query, country)
+    return _live_payload(query, country, results, source, last_cache_hit())
 
+async def alive_payload(query, country):
+    if not query or len(query.strip()) < 2:
+        return {"rows": None, "status": ""}
+    query, country = query.strip(), country or ""
+    results, source = await alive_search(query, country)
+    # degraded() lit l'état partagé des disjoncteurs (flock)
+    return await _off_loop(LOCK_DIR, _live_payload, query, country, results, source, last_cache_hit())
+
+def _live_payload(query, country, results, source, from_cache):
+    paged = source in ("opencorporates", "registry")
+    nxt = len(results) if paged and len(results) >= LIVE_PAGE else None
+    head = {"q": query, "country": country, "src": source, "next": nxt, "complete": paged and nxt is None}
+    # mode dégradé : disjoncteurs ouverts (ou quota OpenCorporates épuisé pour cette frappe)
+    down = [PROVIDER_LABELS[p] for p in degraded()]
+    if source in ("stale", "degraded") and "OpenCorporates" not in down:
+        down.insert(0, "OpenCorporates")
+    warn = f" · ⚠ mode dégradé : {', '.join(down)} en pause" if down else ""
     if not results:
-        return html.Div(style={"textAlign":"center","padding":"40px","color":"var(--text3)","fontSize":"13px"}, children=[
-            html.Div("○", style={"fontSize":"30px","marginBottom":"10px"}),
-            html.Div(f"Aucun résultat pour « {query} »"),
-        ]), "0 résultat"
-
-    source_label = "OPENCORPORATES" if source == "opencorporates" else "GROQ AI"
-    source_color = "#4a9eff" if source == "opencorporates" else "var(--gold)"
-
-    rows = []
-    for co in results:
-        s = co.get("statut","").lower()
-        if "active" in s: sc, sl, stag = "var(--green)", "ACTIVE", "tag-green"
-        elif "dissolved" in s or "struck" in s: sc, sl, stag = "var(--red)", "DISSOUTE", "tag-red"
-        else: sc, sl, stag = "var(--orange)", s.upper()[:10] or "—", "tag-orange"
-
-        rows.append(html.Div(className="result-row", style={
-            "display":"flex","justifyContent":"space-between","alignItems":"center",
-            "padding":"14px 20px","borderBottom":"1px solid var(--border)",
-            "transition":"background 0.15s","cursor":"default",
-        }, children=[
-            html.Div(style={"display":"flex","alignItems":"center","gap":"16px","flex":"1"}, children=[
-                html.Div(co.get("flag","🏳️"), style={"fontSize":"26px","lineHeight":"1","minWidth":"34px","textAlign":"center"}),
-                html.Div(style={"flex":"1"}, children=[
-                    html.Div(co.get("nom",""), style={"color":"#fff","fontSize":"14px","fontWeight":"500","marginBottom":"4px","letterSpacing":"0.3px"}),
-                    html.Div(style={"display":"flex","gap":"16px","flexWrap":"wrap","alignItems":"center"}, children=[
-                        html.Span(f"📍 {co.get('pays','')} {('· '+co.get('ville','')) if co.get('ville') else ''}", style={"color":"var(--text2)","fontSize":"11px"}),
-                        html.Span(f"🏢 {co.get('type','')[:32]}", style={"color":"var(--text3)","fontSize":"11px"}) if co.get("type") else html.Span(),
-                        html.Span(f"📅 {co.get('date','')}", style={"color":"var(--text3)","fontSize":"11px"}) if co.get("date") else html.Span(),
-                        html.Span(f"#{co.get('numero','')}", style={"color":"var(--border2)","fontSize":"10px"}) if co.get("numero") and co.get("numero") != "—" else html.Span(),
-                    ]),
-                ]),
-            ]),
-            html.Div(style={"display":"flex","alignItems":"center","gap":"12px","marginLeft":"20px"}, children=[
-                html.Span(sl, className=f"tag {stag}"),
-                html.Button("ANALYSER →",
-                    id={"type":"row-btn","index":f"{co.get('nom','')}||{co.get('pays','')}"},
-                    n_clicks=0, className="row-btn",
-                    style={
-                        "backgroundColor":"transparent","color":"var(--gold)",
-                        "border":"1px solid rgba(200,169,81,0.4)","padding":"7px 16px",
-                        "fontSize":"10px","letterSpacing":"1.5px","cursor":"pointer",
-                        "fontFamily":"var(--mono)","borderRadius":"3px","transition":"all 0.2s",
-                        "whiteSpace":"nowrap",
-                    }),
-            ]),
-        ]))
+        return {**head, "rows": [], "status": f"0 résultat{warn}"}
 
-    return html.Div(className="fade-in", style={
-        "backgroundColor":"var(--bg2)","border":"1px solid var(--border)",
-        "borderRadius":"6px","overflow":"hidden","marginBottom":"24px",
-    }, children=[
-        html.Div(style={
-            "padding":"12px 20px","borderBottom":"1px solid var(--border)",
-            "display":"flex","justifyContent":"space-between","alignItems":"center",
-        }, children=[
-            html.Div(style={"display":"flex","alignItems":"center","gap":"10px"}, children=[
-                html.Span(f"{len(results)} SOCIÉTÉS TROUVÉES", style={"color":"var(--gold)","fontSize":"9px","letterSpacing":"3px","fontWeight":"500"}),
-                html.Span(source_label, style={"color":source_color,"fontSize":"8px","letterSpacing":"2px","border":f"1px solid {source_color}","padding":"2px 7px","borderRadius":"2px","opacity":"0.7"}),
-            ]),
-            html.Span("Cliquez sur ANALYSER pour la fiche complète", style={"color":"var(--text3)","fontSize":"10px"}),
-        ]),
-        html.Div(rows),
-    ]), f"✓ {len(results)} résultat(s) · source: {source_label}"
+    label, tone = LIVE_SOURCES.get(source, LIVE_SOURCES["groq"])
+    # le compte de lignes est préfixé côté navigateur (il grandit avec les pages)
+    note = f"source: {label}{' · cache' if from_cache else ''}{warn}"
+    return {**head, "rows": _live_rows(results), "label": label, "tone": tone, "note": note}
 
+def live_more_payload(query, country, source, offset):
+    try:
+        results, nxt, total = live_more(query, country, source, offset)
+    except (requests.RequestException, ValueError) as e:
+        log.warning("OpenCorporates page error: %s", e)
+        return {"rows": [], "next": None, "error": True}
+    return {"rows": _live_rows(results), "next": nxt, "total": total}
 
 # ── CALLBACK 2 : Analyse complète ───────────────────────────
+# Rendu progressif : le clic fixe la cible et soumet les jobs (sanctions +
+# sections IA de AI_EAGER) ; le polling remplit les Stores et le dossier est
+# re-rendu à chaque arrivée. Les autres sections IA s'affichent repliées et
+# ne sont générées qu'à l'ouverture de leur panneau.
 
-@app.callback(
-    Output("analysis-result","children"),
+@callback(
+    Output("analysis-target","data"),
+    Output("analysis-jobs","data"),
+    Output("dossier-ai","data"),
+    Output("dossier-sanctions","data"),
+    Output("dossier-poll","disabled"),
     Input({"type":"row-btn","index":ALL},"n_clicks"),
     Input("search-btn","n_clicks"),
     State({"type":"row-btn","index":ALL},"id"),
     State("company-input","value"),
     prevent_initial_call=True
 )
+@threaded_callback
 def analyze(row_clicks, btn_clicks, ids, input_value):
     triggered = ctx.triggered_id
+    skip = (no_update,) * 5
 
     # Bouton ANALYSER principal
     if triggered == "search-btn":
         if not input_value or not input_value.strip():
-            return no_update
-        name, country = input_value.strip(), ""
-    # Bouton ANALYSER d'une ligne
+            return skip
+        name, country, jcode, numero = input_value.strip(), "", "", ""
+    # Bouton ANALYSER d'une ligne : « nom||pays||juridiction complète (us_de)||numéro »
     elif isinstance(triggered, dict) and triggered.get("type") == "row-btn":
         if not any(n for n in row_clicks if n):
-            return no_update
+            return skip
         raw = triggered.get("index","")
-        parts = raw.split("||")
-        name, country = parts[0], (parts[1] if len(parts) > 1 else "")
+        name, country, jcode, numero = (raw.split("||") + ["", "", ""])[:4]
     else:
-        return no_update
+        return skip
 
-    ai = ai_research(name, country)
-    sc_count, sc_hits = check_sanctions(name)
-    pe_count, pe_hits = check_persons(name)
+    target = {"name": name, "country": country, "seq": time.time(), "entity": entity_key(name, jcode or country, numero)}
+    # sources encore valides dans l'historique : reprises telles quelles
+    prev, stored = DOSSIERS.fresh(target["entity"]) if DOSSIERS else (None, {})
+    if prev:
+        target["history"] = {"version": prev["version"], "ts": prev["ts"]}
+    if WATCH:
+        target["watched"] = WATCH.is_watched(name)
+    reused = [s for s in DOSSIER_SECTIONS if f"ai:{s}" in stored]
+    ai_seed = {k: v for s in reused for k, v in stored[f"ai:{s}"].items()}
+    eager = ",".join(s for s in AI_EAGER if s not in reused)
+    jobs = {}
+    stores = {"sanctions": None, "ai": {"seq": target["seq"], "ai": ai_seed, "sections": reused, "stored": reused,
+                                        "loading": [s for s in AI_EAGER if s not in reused]}}
+    if "sanctions" in stored and "pep" in stored:
+        stores["sanctions"] = {"sanctions": stored["sanctions"], "pep": stored["pep"], "missing": [], "seq": target["seq"], "stored": True}
+    gouvernance = stored.get("ai:gouvernance")
+    for key, task, args in (("sanctions", "sanctions", (name,)), (f"ai:{eager}", "ai", (name, country, eager)),
+                            ("graph", "graph", (name, gouvernance))):
+        if task == "ai" and not eager or task == "sanctions" and stores["sanctions"] or task == "graph" and not gouvernance:
+            continue
+        try:
+            jobs[key] = JOBS.submit(task, *args)
+        except QueueFull as e:
+            log.warning("Queue full: %s", e)
+            if task == "graph":  # parties liées non contrôlées : bloc absent du dossier
+                continue
+            keys = ["sanctions", "pep"] if task == "sanctions" else ["ai"]
+            stores[task] = {**(stores[task] or {}), "seq": target["seq"], "missing": keys, "busy": True, "loading": []}
+    return target, jobs, stores["ai"], stores["sanctions"], not jobs
 
-    if not ai:
-        return html.Div("Erreur analyse IA — vérifiez votre GROQ_API_KEY", style={"color":"var(--red)","padding":"20px"})
+def merge_ai(store, result, sections):
+    # Fusionne le résultat d'un job IA (une ou plusieurs sections) dans le Store
+    store = dict(store or {})
+    store["ai"] = {**store.get("ai", {}), **((result or {}).get("ai") or {})}
+    store["sections"] = [s for s in DOSSIER_SECTIONS if s in store.get("sections", []) or s in (result or {}).get("sections", [])]
+    store["loading"] = [s for s in store.get("loading", []) if s not in sections]
+    store["missing"] = sorted(set(store.get("missing", [])) | set((result or {}).get("missing", ["ai"])))
+    if (result or {}).get("parties") is not None:
+        store["parties"] = result["parties"]
+    return store
 
-    score = ai.get("score_risque", 0)
-    if sc_count > 0: score = max(score, 75)
-    niveau = "ELEVE" if sc_count > 0 else ai.get("niveau_risque","MODERE")
-    cmap = {"ELEVE":"var(--red)","MODERE":"var(--orange)","FAIBLE":"var(--green)"}
-    couleur = cmap.get(niveau,"var(--orange)")
-
-    # Helpers
-    def section(title, children, accent="var(--gold)"):
-        return html.Div(style={
-            "backgroundColor":"var(--bg2)","border":"1px solid var(--border)",
-            "borderRadius":"6px","padding":"22px 26px","marginBottom":"16px",
-        }, children=[
-            html.Div(title, style={"color":accent,"fontSize":"9px","letterSpacing":"4px",
-                "fontWeight":"500","marginBottom":"18px","paddingBottom":"10px",
-                "borderBottom":"1px solid var(--border)"}),
-            *children,
-        ])
-
-    def info_row(label, val, highlight=False):
-        if not val or str(val).strip() in ["","null","None"]: return html.Div()
-        return html.Div(style={"display":"flex","padding":"8px 0","borderBottom":"1px solid var(--border)"}, children=[
-            html.Div(label, style={"color":"var(--text3)","fontSize":"11px","minWidth":"210px","letterSpacing":"0.5px"}),
-            html.Div(str(val), style={"color":"var(--gold)" if highlight else "var(--text)","fontSize":"12px","flex":"1","letterSpacing":"0.3px"}),
-        ])
-
-    # ── SCORE HEADER ──
-    score_section = html.Div(className="fade-in", style={
-        "backgroundColor":"var(--bg2)","border":f"1px solid var(--border)",
-        "borderTop":f"3px solid {couleur}","borderRadius":"6px",
-        "padding":"28px 30px","marginBottom":"16px",
-    }, children=[
-        html.Div(style={"display":"flex","justifyContent":"space-between","alignItems":"flex-start"}, children=[
-            html.Div(style={"flex":"1"}, children=[
-                html.Div(ai.get("pays","").upper() + "  ·  " + ai.get("secteur","").upper(),
-                    style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"3px","marginBottom":"10px"}),
-                html.H2(ai.get("nom_complet", name), style={
-                    "fontFamily":"var(--serif)","color":"#fff","fontSize":"28px",
-                    "fontWeight":"600","marginBottom":"8px","letterSpacing":"-0.3px",
-                }),
-                html.P(ai.get("description",""), style={
-                    "color":"var(--text2)","fontSize":"13px","lineHeight":"1.7",
-                    "maxWidth":"600px","fontStyle":"italic",
-                }),
+@callback(
+    Output("analysis-jobs","data", allow_duplicate=True),
+    Output("dossier-ai","data", allow_duplicate=True),
+    Output("dossier-poll","disabled", allow_duplicate=True),
+    Input({"type":"section-btn","index":ALL},"n_clicks"),
+    State("analysis-jobs","data"),
+    State("analysis-target","data"),
+    State("dossier-ai","data"),
+    prevent_initial_call=True
+)
+@threaded_callback
+def load_section(clicks, jobs, target, ai_data):
+    # Ouverture d'un panneau replié : génération de sa seule section
+    section = ctx.triggered_id["index"] if isinstance(ctx.triggered_id, dict) else None
+    if not section or not ctx.triggered[0]["value"] or not target or not ai_data:
+        return no_update, no_update, no_update
+    try:
+        job = JOBS.submit("ai", target["name"], target["country"], section)
+    except QueueFull as e:
+        log.warning("Queue full: %s", e)
+        return no_update, {**ai_data, "busy": True}, no_update
+    ai_data = {**ai_data, "busy": False, "loading": ai_data.get("loading", []) + [section]}
+    return {**(jobs or {}), f"ai:{section}": job}, ai_data, False
+
+@callback(
+    Output("dossier-ai","data", allow_duplicate=True),
+    Output("dossier-sanctions","data", allow_duplicate=True),
+    Output("analysis-jobs","data", allow_duplicate=True),
+    Output("dossier-poll","disabled", allow_duplicate=True),
+    Input("dossier-poll","n_intervals"),
+    State("analysis-jobs","data"),
+    State("analysis-target","data"),
+    State("dossier-ai","data"),
+    State("dossier-sanctions","data"),
+    prevent_initial_call=True
+)
+@threaded_callback
+def poll_jobs(n, jobs, target, ai_data, sc_data):
+    if not jobs or not target:
+        return no_update, no_update, no_update, True
+    out, left = {"ai": no_update, "sanctions": no_update}, {}
+    for key, job_id in jobs.items():
+        job = JOBS.get(job_id)
+        if job["status"] in ("queued", "running"):
+            left[key] = job_id
+        elif key.startswith("ai:"):  # terminé, en erreur ou perdu : result vaut None sauf si « done »
+            ai_data = merge_ai(ai_data, job["result"] if job["status"] == "done" else None, key[3:].split(","))
+            out["ai"] = {**ai_data, "seq": target["seq"]}
+        elif key == "graph":  # graphe d'une gouvernance reprise de l'historique
+            ai_data = {**(ai_data or {}), "parties": job["result"] if job["status"] == "done" else None}
+            out["ai"] = {**ai_data, "seq": target["seq"]}
+        elif job["status"] == "done":
+            out["sanctions"] = {**job["result"], "seq": target["seq"]}
+        else:
+            out["sanctions"] = {"seq": target["seq"], "missing": ["sanctions", "pep"]}
+    if not left and DOSSIERS and target.get("entity"):
+        sc_data = sc_data if out["sanctions"] is no_update else out["sanctions"]
+        ai_new, sc_new = record_dossier(target, ai_data, sc_data)
+        if ai_new is not ai_data:
+            out["ai"] = {**ai_new, "seq": target["seq"]}
+        if sc_new is not sc_data:
+            out["sanctions"] = sc_new
+    return out["ai"], out["sanctions"], left, not left
+
+def record_dossier(target, ai_data, sc_data):
+    # Tous les jobs sont terminés : les sources collectées (et pas reprises de
+    # l'historique) forment une nouvelle version ; les changements s'affichent.
+    stored = (ai_data or {}).get("stored", [])
+    fresh = [s for s in (ai_data or {}).get("sections", []) if s not in stored]
+    collected = {f"ai:{s}": {k: v for k, v in ai_data["ai"].items() if k in DOSSIER_SECTIONS[s]} for s in fresh}
+    sc_fresh = sc_data and not sc_data.get("stored") and not sc_data.get("missing") and sc_data.get("sanctions") is not None
+    if sc_fresh:
+        collected.update(sanctions=sc_data["sanctions"], pep=sc_data["pep"])
+    version, changes = DOSSIERS.record(target["entity"], target["name"], collected)
+    if version is None:
+        return ai_data, sc_data
+    ai_data = {**(ai_data or {}), "stored": stored + fresh, "version": version,
+               "changes": (ai_data or {}).get("changes", []) + changes}
+    return ai_data, {**sc_data, "stored": True} if sc_fresh else sc_data
+
+@callback(
+    Output({"type":"watch-btn","index":ALL},"children"),
+    Output({"type":"watch-btn","index":ALL},"disabled"),
+    Output("analysis-target","data", allow_duplicate=True),
+    Input({"type":"watch-btn","index":ALL},"n_clicks"),
+    State("analysis-target","data"),
+    State("dossier-ai","data"),
+    prevent_initial_call=True
+)
+@threaded_callback
+def watch_company(clicks, target, ai_data):
+    # société + dirigeants déjà connus du dossier (section gouvernance chargée)
+    if not WATCH or not target or not any(clicks):
+        return [no_update] * len(clicks), [no_update] * len(clicks), no_update
+    dirs = [d.get("nom") for d in ((ai_data or {}).get("ai") or {}).get("dirigeants", []) if d.get("nom")]
+    WATCH.add(target["name"], target.get("country", ""), dirs)
+    return ["✓ SOUS SURVEILLANCE"] * len(clicks), [True] * len(clicks), {**target, "watched": True}
+
+# Rendu côté navigateur : le serveur n'envoie que les Stores (JSON du dossier,
+# une fois par arrivée de job), le balisage est construit ici à chaque mise à
+# jour — mêmes classes CSS, aucun style inline hors largeur de la jauge.
+# Teintes via .tone-* (cf. CSS) ; libellés injectés depuis les tables Python.
+TONES = {"ELEVE":"red", "MODERE":"orange", "FAIBLE":"green", "…":"muted"}
+FLAG_TONES = {"rouge":"red", "orange":"orange", "vert":"green"}
+ROLE_LABELS = {"maison_mere":"MAISON MÈRE", "actionnaire":"ACTIONNAIRE", "dirigeant":"DIRIGEANT", "filiale":"FILIALE"}
+
+DOSSIER_JS = """function(ai_data, sc_data, target) {
+    if (!target) { return window.dash_clientside.no_update; }
+    var K = __DOSSIER_LABELS__;
+    // une réponse d'une analyse précédente arrivée en retard est ignorée
+    var fresh = function(d) { return d && d.seq === target.seq ? d : null; };
+    ai_data = fresh(ai_data); sc_data = fresh(sc_data);
+    var h = function(type, cls, children, props) {
+        return {type: type, namespace: "dash_html_components",
+                props: Object.assign(cls ? {className: cls} : {}, {children: children}, props || {})};
+    };
+    var get = function(o, k, def) { return o[k] === undefined ? def : o[k]; };
+    var card = function(title, children, tone, extra) {
+        var cls = ["card", tone ? "tone-" + tone : "", extra || ""].filter(Boolean).join(" ");
+        return h("Div", cls, [h("Div", "card-title", title)].concat(children));
+    };
+    var info = function(label, val, hl) {
+        var s = val === null || val === undefined ? "" : String(val).trim();
+        if (!val || s === "" || s === "null" || s === "None") { return null; }
+        return h("Div", "info-row", [h("Div", "info-label", label), h("Div", hl ? "info-val hl" : "info-val", String(val))]);
+    };
+    var pending = function(title, label) { return card(title, [h("Div", "loading pending", "⬡  " + label)]); };
+    var lazy = function(title, sec) {
+        return card(title, [h("Button", "row-btn ghost-btn", "AFFICHER ↓", {id: {type: "section-btn", index: sec}, n_clicks: 0})]);
+    };
+    var banner = function(title, detail, tone, tcls) { return h("Div", "banner tone-" + tone, [h("Div", tcls || "flag-title", title), detail]); };
+    var bullet = function(mark, text, tone) { return h("Div", "bullet tone-" + tone, [h("Span", "", mark), h("Span", "", text)]); };
+    var stat = function(label, val, tone) {
+        return h("Div", "stat", [h("Div", "stat-label", label), h("Div", tone ? "stat-val tone-" + tone : "stat-val", val)]);
+    };
+    var tag = function(text, tone) { return h("Span", "tag tag-" + tone, text); };
+    // miroir de risk() : graph = exposition des parties liées (0-75)
+    var risk = function(ai, count, graph) {
+        var score = ai.score_risque || 0, exposure = (graph || {}).exposure || 0;
+        if (count > 0) { score = Math.max(score, 75); }
+        score = Math.max(score, exposure);
+        var niveau = count > 0 || exposure >= 60 ? "ELEVE" : ai.niveau_risque || "MODERE";
+        if (exposure >= 30 && niveau === "FAIBLE") { niveau = "MODERE"; }
+        return [score, niveau];
+    };
+
+    // sc_data vaut null tant qu'OpenSanctions n'a pas répondu ; côté IA,
+    // sections = reçues, loading = en cours ; history : version précédente
+    // ({version, ts}) ; watched : absent sans watchlist
+    var ad = ai_data || {}, sd = sc_data || {};
+    var ai = ad.ai || {}, loaded = ad.sections || [], loading = ad.loading || [];
+    var missing = (ad.missing || []).concat(sd.missing || []);
+    var sc = sd.sanctions || [0, []], pe = sd.pep || [0, []];
+    var parties = ad.parties, busy = ad.busy || sd.busy, history = target.history;
+    if (missing.length === Object.keys(K.sources).length) {
+        return h("Div", "error", "Erreur analyse IA — vérifiez votre GROQ_API_KEY");
+    }
+    var r = risk(ai, sc[0], parties), score = r[0], niveau = r[1];
+    if (loaded.indexOf("risque") < 0 && !sc[0]) { niveau = "…"; }
+    var tone = K.tones[niveau] || "orange";
+    var panel = function(title, sec, render) {
+        if (loaded.indexOf(sec) >= 0) { return render(); }
+        if (loading.indexOf(sec) >= 0) { return pending(title, "Génération en cours…"); }
+        return lazy(title, sec);
+    };
+
+    // ── SOURCES MANQUANTES ──
+    var missingSection = missing.length ? h("Div", "banner sources tone-orange", [
+        h("Div", "banner-title", busy ? "SERVEUR SATURÉ — RÉESSAYEZ DANS QUELQUES INSTANTS" : "RAPPORT INCOMPLET — SOURCES NON DISPONIBLES"),
+        h("Div", "tags", missing.map(function(k) { return tag(K.sources[k], "orange"); })),
+    ]) : null;
+
+    // ── HISTORIQUE ──
+    var historySection = null;
+    if (history) {
+        var changes = ad.changes || [], lines;
+        if (changes.length) {
+            lines = changes.map(function(c) {
+                return h("Div", "list-row", [
+                    h("Div", "", c.avant ? c.champ + " : " + c.avant + " → " + c.apres : c.champ),
+                    h("Div", "tags", (c.ajouts || []).map(function(n) { return tag("+ " + n, "orange"); })
+                        .concat((c.retraits || []).map(function(n) { return tag("− " + n, "gold"); }))),
+                ]);
+            });
+        } else if (ad.version) {
+            lines = [h("Div", "note tone-green", "✓  Aucun changement sur les sources ré-interrogées")];
+        } else if (loading.length || !sc_data) {
+            lines = [h("Div", "loading pending", "⬡  Comparaison en fin d'analyse…")];
+        } else {
+            lines = [h("Div", "note tone-green", "✓  Sources reprises de l'historique — aucune n'a expiré")];
+        }
+        var d = new Date(history.ts * 1000), p2 = function(n) { return (n < 10 ? "0" : "") + n; };
+        var since = p2(d.getDate()) + "/" + p2(d.getMonth() + 1) + "/" + d.getFullYear() + " " + p2(d.getHours()) + ":" + p2(d.getMinutes());
+        historySection = card("HISTORIQUE — VERSION DU " + since, lines, changes.length ? "orange" : null);
+    }
+
+    // ── SCORE HEADER ──
+    var watch = target.watched === undefined || target.watched === null ? null
+        : h("Button", "row-btn ghost-btn watch-btn", target.watched ? "✓ SOUS SURVEILLANCE" : "＋ SURVEILLER",
+            {id: {type: "watch-btn", index: "dossier"}, n_clicks: 0, disabled: target.watched});
+    var scoreSection = h("Div", "card score-card fade-in tone-" + tone, [
+        h("Div", "score-head", [
+            h("Div", "score-id", [
+                h("Div", "kicker", (ai.pays || "").toUpperCase() + "  ·  " + (ai.secteur || "").toUpperCase()),
+                h("H2", "score-name", ai.nom_complet || target.name),
+                h("P", "score-desc", ai.description || ""),
             ]),
-            html.Div(style={"textAlign":"right","paddingLeft":"30px","minWidth":"160px"}, children=[
-                html.Div("RISK ASSESSMENT", style={"color":"var(--text3)","fontSize":"8px","letterSpacing":"3px","marginBottom":"6px"}),
-                html.Div(niveau, style={"color":couleur,"fontSize":"30px","fontFamily":"var(--serif)","fontWeight":"600","marginBottom":"4px"}),
-                html.Div(style={"display":"flex","alignItems":"center","gap":"8px","justifyContent":"flex-end"}, children=[
-                    html.Div(style={"flex":"1","height":"4px","background":"var(--border)","borderRadius":"2px","overflow":"hidden"}, children=[
-                        html.Div(style={"height":"100%","width":f"{score}%","background":couleur,"borderRadius":"2px","transition":"width 1s ease"})
-                    ]),
-                    html.Div(f"{score}/100", style={"color":"var(--text3)","fontSize":"10px","whiteSpace":"nowrap"}),
+            h("Div", "score-risk", [
+                h("Div", "kicker", "RISK ASSESSMENT"),
+                h("Div", "score-level", niveau),
+                h("Div", "score-bar", [
+                    h("Div", "bar", h("Div", "bar-fill", null, {style: {width: score + "%"}})),
+                    h("Div", "bar-label", score + "/100"),
                 ]),
+                watch,
             ]),
         ]),
-    ])
+    ]);
 
-    # ── GRILLE 2 COL ──
-    grid = html.Div(style={"display":"grid","gridTemplateColumns":"1fr 1fr","gap":"16px","marginBottom":"16px"}, children=[
-        section("IDENTITÉ LÉGALE", [
-            info_row("Pays", ai.get("pays")),
-            info_row("Ville / Siège", ai.get("ville_siege")),
-            info_row("Adresse", ai.get("adresse")),
-            info_row("Date de création", ai.get("date_creation")),
-            info_row("Forme juridique", ai.get("forme_juridique")),
-            info_row("N° enregistrement", ai.get("numero_enregistrement")),
-            info_row("Site web", ai.get("site_web"), True),
-            info_row("Email", ai.get("email_contact")),
-            info_row("Téléphone", ai.get("telephone")),
-            info_row("Activité principale", ai.get("activite_principale")),
-            info_row("Maison mère", ai.get("maison_mere")),
-            info_row("Filiales", ", ".join(ai.get("filiales",[])[:4])),
-        ]),
-        html.Div([
-            section("DONNÉES FINANCIÈRES", [
-                info_row("Chiffre d'affaires", ai.get("financier",{}).get("chiffre_affaires"), True),
-                info_row("Bénéfice net", ai.get("financier",{}).get("benefice_net")),
-                info_row("Capitalisation boursière", ai.get("financier",{}).get("capitalisation_boursiere")),
-                info_row("Effectifs", ai.get("financier",{}).get("effectifs")),
-                info_row("Notation crédit", ai.get("financier",{}).get("notation_credit")),
-                info_row("Cotation", ai.get("financier",{}).get("bourse_cotation")),
-                info_row("Ticker", ai.get("financier",{}).get("ticker")),
-            ]),
-            section("PRÉSENCE DIGITALE", [
-                info_row("LinkedIn", ai.get("presence_digitale",{}).get("linkedin"), True),
-                info_row("Twitter/X", ai.get("presence_digitale",{}).get("twitter")),
-                info_row("Wikipedia", ai.get("presence_digitale",{}).get("wikipedia")),
-            ]),
+    // ── GRILLE 2 COL ──
+    var fin = ai.financier || {}, web = ai.presence_digitale || {};
+    var grid = h("Div", "grid2", [
+        panel("IDENTITÉ LÉGALE", "identite", function() { return card("IDENTITÉ LÉGALE", [
+            info("Pays", ai.pays),
+            info("Ville / Siège", ai.ville_siege),
+            info("Adresse", ai.adresse),
+            info("Date de création", ai.date_creation),
+            info("Forme juridique", ai.forme_juridique),
+            info("N° enregistrement", ai.numero_enregistrement),
+            info("Site web", ai.site_web, true),
+            info("Email", ai.email_contact),
+            info("Téléphone", ai.telephone),
+            info("Activité principale", ai.activite_principale),
+            info("Maison mère", ai.maison_mere),
+            info("Filiales", (ai.filiales || []).slice(0, 4).join(", ")),
+        ]); }),
+        h("Div", "", [
+            panel("DONNÉES FINANCIÈRES", "financier", function() { return card("DONNÉES FINANCIÈRES", [
+                info("Chiffre d'affaires", fin.chiffre_affaires, true),
+                info("Bénéfice net", fin.benefice_net),
+                info("Capitalisation boursière", fin.capitalisation_boursiere),
+                info("Effectifs", fin.effectifs),
+                info("Notation crédit", fin.notation_credit),
+                info("Cotation", fin.bourse_cotation),
+                info("Ticker", fin.ticker),
+            ]); }),
+            panel("PRÉSENCE DIGITALE", "reputation", function() { return card("PRÉSENCE DIGITALE", [
+                info("LinkedIn", web.linkedin, true),
+                info("Twitter/X", web.twitter),
+                info("Wikipedia", web.wikipedia),
+            ]); }),
         ]),
-    ])
+    ]);
 
-    # ── DIRIGEANTS ──
-    dirs = [d for d in ai.get("dirigeants",[]) if d.get("nom")]
-    dir_section = html.Div()
-    if dirs:
-        dir_cards = [html.Div(style={
-            "backgroundColor":"var(--bg)","border":"1px solid var(--border)",
-            "borderRadius":"5px","padding":"16px","position":"relative",
-        }, children=[
-            html.Div(style={"display":"flex","justifyContent":"space-between","alignItems":"flex-start","marginBottom":"6px"}, children=[
-                html.Div(d.get("nom",""), style={"color":"#fff","fontSize":"14px","fontWeight":"500"}),
-                html.Span(d.get("poste",""), className="tag tag-gold"),
-            ]),
-            html.Div(d.get("parcours_anterieur",""), style={"color":"var(--text3)","fontSize":"11px","marginBottom":"8px","lineHeight":"1.5"}),
-            html.Div(style={"display":"flex","gap":"16px"}, children=[
-                html.Span(f"🌍 {d.get('nationalite','—')}", style={"color":"var(--text3)","fontSize":"10px"}),
-                html.Span(f"📅 Depuis {d.get('depuis','—')}", style={"color":"var(--text3)","fontSize":"10px"}),
-            ]),
-        ]) for d in dirs[:6]]
-        dir_section = section("DIRIGEANTS", [
-            html.Div(style={"display":"grid","gridTemplateColumns":"1fr 1fr","gap":"10px"}, children=dir_cards)
-        ])
-
-    # ── ACTIONNAIRES ──
-    acts = [a for a in ai.get("actionnaires",[]) if a.get("nom")]
-    act_section = html.Div()
-    if acts:
-        act_cards = [html.Div(style={
-            "backgroundColor":"var(--bg)","border":"1px solid var(--border)",
-            "borderRadius":"5px","padding":"14px 18px","textAlign":"center","minWidth":"130px",
-        }, children=[
-            html.Div(a.get("nom",""), style={"color":"var(--text)","fontSize":"12px","fontWeight":"500","marginBottom":"4px"}),
-            html.Div(a.get("pourcentage",""), style={"color":"var(--gold)","fontSize":"20px","fontFamily":"var(--serif)","fontWeight":"600","marginBottom":"2px"}),
-            html.Span(a.get("type",""), className="tag tag-gold"),
-        ]) for a in acts[:8]]
-        act_section = section("ACTIONNARIAT", [
-            html.Div(style={"display":"flex","gap":"10px","flexWrap":"wrap"}, children=act_cards)
-        ])
-
-    # ── SANCTIONS ──
-    sc_col = "var(--red)" if sc_count > 0 else "var(--green)"
-    sanctions_section = section("SANCTIONS & PEP CHECK", [
-        html.Div(style={"display":"grid","gridTemplateColumns":"repeat(4,1fr)","gap":"10px","marginBottom":"16px"}, children=[
-            html.Div(style={"backgroundColor":"var(--bg)","border":"1px solid var(--border)","borderRadius":"5px","padding":"14px","textAlign":"center"}, children=[
-                html.Div(lbl, style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"2px","marginBottom":"6px"}),
-                html.Div(val, style={"color":col,"fontSize":"11px","fontWeight":"500"}),
-            ]) for lbl,val,col in [
-                ("OFAC", ai.get("sanctions",{}).get("ofac","—"), "var(--text2)"),
-                ("UNION EUROPÉENNE", ai.get("sanctions",{}).get("ue","—"), "var(--text2)"),
-                ("NATIONS UNIES", ai.get("sanctions",{}).get("onu","—"), "var(--text2)"),
-                ("OPENSANCTIONS", f"{sc_count} hit(s)", sc_col),
-            ]
-        ]),
-        *([html.Div(style={"backgroundColor":"rgba(255,68,85,0.06)","borderLeft":"3px solid var(--red)","padding":"12px 16px","marginBottom":"8px","borderRadius":"3px"}, children=[
-            html.Div(f"⚠  {h.get('caption','')}", style={"color":"#ff8899","fontSize":"13px","fontWeight":"500","marginBottom":"3px"}),
-            html.Div(", ".join(h.get("datasets",[]))[:100], style={"color":"var(--text3)","fontSize":"10px"}),
-        ]) for h in sc_hits] if sc_hits else [html.Div("✓  Société non listée dans les bases de données de sanctions (OFAC · ONU · UE · +100 listes)", style={"color":"var(--green)","fontSize":"12px"})]),
-        *([html.Div(style={"marginTop":"14px","paddingTop":"14px","borderTop":"1px solid var(--border)"}, children=[
-            html.Div(f"PERSONNES LIÉES : {pe_count} résultat(s)", style={"color":"var(--red)","fontSize":"10px","letterSpacing":"2px","marginBottom":"8px"}),
-            *[html.Div(style={"display":"flex","justifyContent":"space-between","padding":"5px 0","borderBottom":"1px solid var(--border)"}, children=[
-                html.Div(h.get("caption",""), style={"color":"var(--text)","fontSize":"12px"}),
-                html.Span(", ".join(h.get("properties",{}).get("topics",[])), className="tag tag-red"),
-            ]) for h in pe_hits]
-        ])] if pe_count > 0 else []),
-    ], accent=sc_col)
-
-    # ── RED FLAGS ──
-    flags = ai.get("red_flags",[])
-    flags_section = html.Div()
-    if flags:
-        flag_items = []
-        for i,f in enumerate(flags[:8],1):
-            n = f.get("niveau","orange")
-            c = "var(--red)" if n=="rouge" else ("var(--orange)" if n=="orange" else "var(--green)")
-            bg = "rgba(255,68,85,0.05)" if n=="rouge" else ("rgba(255,140,0,0.05)" if n=="orange" else "rgba(0,204,102,0.05)")
-            flag_items.append(html.Div(style={"background":bg,"borderLeft":f"3px solid {c}","padding":"12px 16px","marginBottom":"8px","borderRadius":"3px"}, children=[
-                html.Div(style={"display":"flex","justifyContent":"space-between","marginBottom":"3px"}, children=[
-                    html.Div(f"RF#{i}  —  {f.get('titre','')}", style={"color":c,"fontSize":"11px","fontWeight":"500","letterSpacing":"0.5px"}),
-                    html.Span(n.upper(), className=f"tag {'tag-red' if n=='rouge' else 'tag-orange' if n=='orange' else 'tag-green'}"),
-                ]),
-                html.Div(f.get("detail",""), style={"color":"var(--text2)","fontSize":"11px","lineHeight":"1.5"}),
-            ]))
-        flags_section = section("RED FLAGS — SIGNAUX D'ALERTE", flag_items)
-
-    # ── RÉPUTATION ──
-    rep = ai.get("reputation",{})
-    positifs = rep.get("positif",[])
-    negatifs = rep.get("negatif",[]) + rep.get("controverses",[])
-    rep_section = section("RÉPUTATION & CONTROVERSES", [
-        html.Div(style={"display":"grid","gridTemplateColumns":"1fr 1fr","gap":"16px"}, children=[
-            html.Div([
-                html.Div("POINTS POSITIFS", style={"color":"var(--green)","fontSize":"9px","letterSpacing":"3px","marginBottom":"10px"}),
-                *[html.Div(style={"display":"flex","gap":"8px","marginBottom":"6px","alignItems":"flex-start"}, children=[
-                    html.Span("✓", style={"color":"var(--green)","fontSize":"12px","marginTop":"1px"}),
-                    html.Span(p, style={"color":"var(--text2)","fontSize":"12px","lineHeight":"1.5"}),
-                ]) for p in positifs[:5]],
-            ]) if positifs else html.Div(),
-            html.Div([
-                html.Div("POINTS NÉGATIFS", style={"color":"var(--orange)","fontSize":"9px","letterSpacing":"3px","marginBottom":"10px"}),
-                *[html.Div(style={"display":"flex","gap":"8px","marginBottom":"6px","alignItems":"flex-start"}, children=[
-                    html.Span("⚠", style={"color":"var(--orange)","fontSize":"12px","marginTop":"1px"}),
-                    html.Span(n, style={"color":"var(--text2)","fontSize":"12px","lineHeight":"1.5"}),
-                ]) for n in negatifs[:5]],
-            ]) if negatifs else html.Div(),
+    // ── DIRIGEANTS & ACTIONNAIRES ──
+    var dirs = (ai.dirigeants || []).filter(function(x) { return x.nom; });
+    var dirSection = dirs.length ? card("DIRIGEANTS", [h("Div", "grid2 tight", dirs.slice(0, 6).map(function(x) {
+        return h("Div", "mini-card", [
+            h("Div", "dir-head", [h("Div", "dir-name", get(x, "nom", "")), tag(get(x, "poste", ""), "gold")]),
+            h("Div", "dir-bio", get(x, "parcours_anterieur", "")),
+            h("Div", "dir-meta", [h("Span", "", "🌍 " + get(x, "nationalite", "—")), h("Span", "", "📅 Depuis " + get(x, "depuis", "—"))]),
+        ]);
+    }))]) : null;
+    var acts = (ai.actionnaires || []).filter(function(x) { return x.nom; });
+    var actSection = acts.length ? card("ACTIONNARIAT", [h("Div", "shares", acts.slice(0, 8).map(function(x) {
+        return h("Div", "share", [h("Div", "share-name", get(x, "nom", "")), h("Div", "share-pct", get(x, "pourcentage", "")),
+                                  tag(get(x, "type", ""), "gold")]);
+    }))]) : null;
+
+    // ── SANCTIONS ──
+    var scMissing = missing.indexOf("sanctions") >= 0;
+    var scTone = sc[0] > 0 ? "red" : (scMissing ? "orange" : "green");
+    var scLines = sc[1].length ? sc[1].map(function(x) {
+        return banner("⚠  " + get(x, "caption", ""), h("Div", "hit-detail", (x.datasets || []).join(", ").slice(0, 100)), "red", "hit-title");
+    }) : [scMissing ? h("Div", "note tone-orange", "⚠  Vérification sanctions non effectuée — relancez l'analyse")
+                    : h("Div", "note tone-green", "✓  Société non listée dans les bases de données de sanctions (OFAC · ONU · UE · +100 listes)")];
+    var aiSc = ai.sanctions || {};
+    var partiesMissing = parties && (parties.missing || []).length;
+    var sanctionsSection = card("SANCTIONS & PEP CHECK", [
+        h("Div", "grid4", [
+            stat("OFAC", aiSc.ofac || "—"),
+            stat("UNION EUROPÉENNE", aiSc.ue || "—"),
+            stat("NATIONS UNIES", aiSc.onu || "—"),
+            stat("OPENSANCTIONS", scMissing ? "INDISPONIBLE" : sc[0] + " hit(s)", scTone),
         ]),
-    ])
+    ].concat(scLines, [
+        pe[0] > 0 ? h("Div", "sub-block tone-red", [h("Div", "sub-title", "PERSONNES LIÉES : " + pe[0] + " résultat(s)")].concat(
+            pe[1].map(function(x) {
+                return h("Div", "list-row", [h("Div", "", get(x, "caption", "")),
+                                             tag(((x.properties || {}).topics || []).join(", "), "red")]);
+            }))) : null,
+        parties ? h("Div", "sub-block tone-" + (parties.hits.length ? "red" : partiesMissing ? "orange" : "green"), [
+            h("Div", "sub-title", "PARTIES LIÉES CONTRÔLÉES : " + parties.checked + " · " + parties.hits.length + " alerte(s)"
+                                  + (partiesMissing ? " · " + partiesMissing + " non vérifiée(s)" : "")),
+        ].concat(parties.hits.map(function(x) {
+            return h("Div", "list-row", [
+                h("Div", "", x.nom + "  →  " + get(x.hits[0], "caption", "")),
+                h("Div", "tags", [x.via ? tag("VIA " + x.via, "gold") : null, tag(K.roles[x.role] || x.role.toUpperCase(), "red")]),
+            ]);
+        }))) : null,
+    ]), scTone);
 
-    # ── VERDICT ──
-    verdict_section = html.Div(style={
-        "backgroundColor":"var(--bg2)","border":f"1px solid var(--border)",
-        "borderLeft":f"4px solid {couleur}","borderRadius":"6px",
-        "padding":"24px 28px","marginBottom":"16px",
-    }, children=[
-        html.Div("VERDICT FINAL", style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"4px","marginBottom":"12px"}),
-        html.P(ai.get("verdict",""), style={"color":"var(--text)","fontSize":"14px","lineHeight":"1.8","marginBottom":"20px","fontFamily":"var(--serif)"}),
-        html.Div("RECOMMANDATIONS", style={"color":"var(--text3)","fontSize":"9px","letterSpacing":"4px","marginBottom":"12px","paddingTop":"16px","borderTop":"1px solid var(--border)"}),
-        html.Div([html.Div(style={"display":"flex","gap":"10px","marginBottom":"8px","alignItems":"flex-start"}, children=[
-            html.Div(f"{i:02d}", style={"color":"var(--gold)","fontSize":"11px","fontFamily":"var(--serif)","fontWeight":"600","minWidth":"24px","marginTop":"2px"}),
-            html.Div(r, style={"color":"var(--text2)","fontSize":"12px","lineHeight":"1.6"}),
-        ]) for i,r in enumerate(ai.get("recommandations",[])[:6], 1)]),
-    ])
+    // ── RED FLAGS ──
+    var flags = ai.red_flags || [];
+    var flagsSection = flags.length ? card("RED FLAGS — SIGNAUX D'ALERTE", flags.slice(0, 8).map(function(f, i) {
+        var n = get(f, "niveau", "orange"), t = K.flags[n] || "orange";
+        return banner(h("Div", "flag-head", [h("Div", "", "RF#" + (i + 1) + "  —  " + get(f, "titre", "")), tag(n.toUpperCase(), t)]),
+                      h("Div", "flag-detail", get(f, "detail", "")), t);
+    })) : null;
 
-    return html.Div(className="fade-in", children=[
-        score_section, grid, dir_section, act_section,
-        sanctions_section, flags_section, rep_section, verdict_section,
-    ])
+    // ── RÉPUTATION ──
+    var rep = ai.reputation || {};
+    var positifs = rep.positif || [], negatifs = (rep.negatif || []).concat(rep.controverses || []);
+    var repSection = card("RÉPUTATION & CONTROVERSES", [h("Div", "grid2 tight", [
+        positifs.length ? h("Div", "tone-green", [h("Div", "col-title", "POINTS POSITIFS")].concat(
+            positifs.slice(0, 5).map(function(x) { return bullet("✓", x, "green"); }))) : null,
+        negatifs.length ? h("Div", "tone-orange", [h("Div", "col-title", "POINTS NÉGATIFS")].concat(
+            negatifs.slice(0, 5).map(function(x) { return bullet("⚠", x, "orange"); }))) : null,
+    ])]);
 
+    // ── VERDICT ──
+    var verdictSection = h("Div", "card verdict tone-" + tone, [
+        h("Div", "kicker wide", "VERDICT FINAL"),
+        h("P", "verdict-text", ai.verdict || ""),
+        h("Div", "kicker wide sep", "RECOMMANDATIONS"),
+        h("Div", "", (ai.recommandations || []).slice(0, 6).map(function(x, i) {
+            return h("Div", "reco", [h("Div", "reco-num", (i < 9 ? "0" : "") + (i + 1)), h("Div", "reco-text", x)]);
+        })),
+    ]);
 
-server = app.server
+    if (!sc_data) { sanctionsSection = pending("SANCTIONS & PEP CHECK", "Interrogation OpenSanctions en cours…"); }
+    if (missing.indexOf("ai") >= 0 && !loaded.length && !loading.length) {
+        return h("Div", "fade-in", [missingSection, historySection, sanctionsSection]);
+    }
+    var govSection = panel("DIRIGEANTS & ACTIONNARIAT", "gouvernance", function() { return h("Div", "", [dirSection, actSection]); });
+    return h("Div", "fade-in", [
+        missingSection, scoreSection, historySection, grid, govSection, sanctionsSection,
+        panel("RED FLAGS — SIGNAUX D'ALERTE", "risque", function() { return flagsSection; }),
+        panel("RÉPUTATION & CONTROVERSES", "reputation", function() { return repSection; }),
+        loaded.indexOf("risque") >= 0 ? verdictSection : null,
+    ]);
+}""".replace("__DOSSIER_LABELS__", json.dumps(
+    {"sources": SOURCE_LABELS, "tones": TONES, "flags": FLAG_TONES, "roles": ROLE_LABELS}, ensure_ascii=False))
 
-if __name__ == "__main__":
+clientside_callback(
+    DOSSIER_JS,
+    Output("analysis-result","children"),
+    Input("dossier-ai","data"),
+    Input("dossier-sanctions","data"),
+    State("analysis-target","data"),
+    prevent_initial_call=True
+)
+
+
+def metrics():
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+def _web():
+    # module du serveur HTTP : flask, ou quart sous ASYNC_SERVING (même API)
+    return importlib.import_module(BACKEND)
+
+def _hook(fn):
+    # Quart exécute les hooks synchrones dans un thread, hors du contexte de la
+    # requête : la trace ne suivrait pas. Enveloppe coroutine sous ASYNC_SERVING.
+    if not ASYNC_SERVING:
+        return fn
+    @functools.wraps(fn)
+    async def run(*args):
+        return fn(*args)
+    return run
+
+def custom_css():
+    return _web().Response(CUSTOM_CSS, mimetype="text/css", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+def _start_monitor():
+    ensure_monitor()
+
+def _start_trace():
+    web = _web()
+    if web.request.headers.get("X-Intelcorp-Trace"):
+        web.g.trace = (_trace.set([]), time.perf_counter())
+
+def _server_timing(response):
+    g = _web().g
+    if getattr(g, "trace", None):
+        token, t = g.trace
+        stages = token.var.get()
+        parts = [f"{stage};dur={dt * 1000:.1f}" for stage, dt in stages]
+        parts.append(f"total;dur={(time.perf_counter() - t) * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(parts)
+        _trace.reset(token)
+    return response
+
+# Compression des réponses (JSON des callbacks, bundles Dash, CSS) : br si le
+# module brotli est installé et accepté par le client, sinon gzip. Sous
+# COMPRESS_MIN octets l'en-tête coûte plus que le gain. Les fichiers statiques
+# sont compressés une fois au niveau fort et gardés en LRU ; les réponses de
+# callback au niveau rapide. Octets bruts / envoyés comptés par route et callback.
+COMPRESS_MIN = int(os.environ.get("INTELCORP_COMPRESS_MIN", "500"))
+COMPRESS_TYPES = {"application/json", "application/javascript", "text/javascript", "text/css", "text/html", "text/plain"}
+STATIC_PREFIXES = ("/_dash-component-suites/", "/_intelcorp/")
+_packed, _packed_lock = OrderedDict(), threading.Lock()
+
+def _encode(data, encoding, static):
+    if encoding == "br":
+        return brotli.compress(data, quality=9 if static else 4)
+    return gzip.compress(data, 9 if static else 6, mtime=0)
+
+def _packed_body(key, data, encoding, static):
+    if not static:
+        return _encode(data, encoding, static)
+    with _packed_lock:
+        if key in _packed:
+            _packed.move_to_end(key)
+            return _packed[key]
+    body = _encode(data, encoding, static)
+    with _packed_lock:
+        _packed[key] = body
+        while len(_packed) > 64:
+            _packed.popitem(last=False)
+    return body
+
+def _pack_plan(request, response):
+    # (encodage ou None, statique) si la réponse est compressible, sinon None
+    if (response.status_code != 200 or response.content_encoding or response.mimetype not in COMPRESS_TYPES
+            or getattr(response, "direct_passthrough", False)):
+        return None
+    accept = request.accept_encodings
+    encoding = "br" if brotli and accept["br"] else "gzip" if accept["gzip"] else None
+    return encoding, request.path.startswith(STATIC_PREFIXES)
+
+def _byte_labels(request, body):
+    # callback = première sortie ; id pattern-matching → son « type »
+    labels = {"route": request.url_rule.rule if request.url_rule else "other"}
+    out = body.get("outputs") if isinstance(body, dict) else None
+    out = out[0] if isinstance(out, list) and out else out
+    out = out[0] if isinstance(out, list) and out else out
+    if isinstance(out, dict):
+        cid = out.get("id")
+        labels["callback"] = f"{cid.get('type') if isinstance(cid, dict) else cid}.{out.get('property')}"
+    return labels
+
+def _pack(response, data, encoding, body, labels):
+    if len(data) >= COMPRESS_MIN:
+        response.vary.add("Accept-Encoding")
+    if body is not None:
+        response.set_data(body)
+        response.content_encoding = encoding
+    METRICS.inc("intelcorp_response_raw_bytes_total", len(data), **labels)
+    METRICS.inc("intelcorp_response_sent_bytes_total", len(data if body is None else body), **labels)
+    return response
+
+def _compress(response):
+    request = _web().request
+    plan = _pack_plan(request, response)
+    if plan is None:
+        return response
+    (encoding, static), data = plan, response.get_data()
+    body = None
+    if encoding and len(data) >= COMPRESS_MIN:
+        body = _packed_body((request.full_path, encoding), data, encoding, static)
+    return _pack(response, data, encoding, body, _byte_labels(request, request.get_json(silent=True)))
+
+async def _acompress(response):
+    # variante Quart : corps et JSON de la requête sont des coroutines ; la
+    # première compression d'un bundle statique (niveau fort) part en thread
+    request = _web().request
+    plan = _pack_plan(request, response)
+    if plan is None:
+        return response
+    (encoding, static), data = plan, await response.get_data()
+    body = None
+    if encoding and len(data) >= COMPRESS_MIN:
+        key = (request.full_path, encoding)
+        body = await asyncio.to_thread(_packed_body, key, data, encoding, static) if static else _packed_body(key, data, encoding, static)
+    return _pack(response, data, encoding, body, _byte_labels(request, await request.get_json(silent=True)))
+
+_app = None
+
+def create_app():
+    # Fabrique : layout construit une fois, callbacks (dash.callback) rattachés
+    # à l'instance. Sous gunicorn --preload elle tourne dans le master : les
+    # workers forkés partagent modules et layout en copy-on-write.
+    global _app
+    if _app is None:
+        app = Dash(__name__, suppress_callback_exceptions=True, backend=BACKEND)
+        app.index_string = INDEX_STRING
+        app.config.external_stylesheets = [FONTS_URL, app.get_relative_path(f"/_intelcorp/{CSS_FILE}")]
+        app.layout = layout()
+        server = app.server
+        server.add_url_rule("/metrics", view_func=metrics)
+        server.add_url_rule(f"/_intelcorp/{CSS_FILE}", view_func=custom_css)
+        server.before_request(_hook(_start_monitor))
+        server.before_request(_hook(_start_trace))
+        server.after_request(_hook(_server_timing))
+        server.after_request(_acompress if ASYNC_SERVING else _compress)
+        _app = app
+    return _app
+
+def create_server(preload=False):
+    # Point d'entrée gunicorn : "intelcorp_v2:create_server(preload=True)" --preload.
+    # preload : le SDK Groq est importé dans le master (partagé) plutôt qu'au
+    # premier appel de chaque worker. Aucune connexion n'est ouverte avant le fork.
+    # Sous INTELCORP_BACKEND=quart, rend l'application ASGI (worker uvicorn) :
+    #   gunicorn "intelcorp_v2:create_server(preload=True)" --preload -k uvicorn.workers.UvicornWorker
+    if isinstance(JOBS, MemoryQueue) and int(os.environ.get("WEB_CONCURRENCY") or 1) > 1:
+        # un job soumis dans un worker serait introuvable depuis les autres
+        raise RuntimeError("INTELCORP_QUEUE=memory avec plusieurs workers gunicorn : utilisez sqlite:/chemin/jobs.db")
+    if preload:
+        _groq_sdk()
+    return create_app().server
+
+def __getattr__(name):
+    # intelcorp_v2.app / intelcorp_v2.server : construits au premier accès
+    if name == "app":
+        return create_app()
+    if name == "server":
+        return create_app().server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def serve():
     if not os.environ.get("GROQ_API_KEY"):
         print("⚠  GROQ_API_KEY manquante !")
         print("   Tape : export GROQ_API_KEY='gsk_...'")
@@ -661,4 +3852,88 @@ if __name__ == "__main__":
     print("━" * 48)
     print("🌐  http://127.0.0.1:8051")
     print("━" * 48)
-    app.run(debug=True, port=8051)
+    ensure_monitor()
+    create_app().run(debug=True, port=8051)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="intelcorp_v2.py")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("serve", help="lance le serveur Dash (défaut)")
+    p = sub.add_parser("build-registry", help="construit l'index local des sociétés")
+    p.add_argument("src", help="export bulk CSV ou JSONL (.gz accepté)")
+    p.add_argument("--db", default=None, help="fichier SQLite cible (défaut : $INTELCORP_REGISTRY_DB)")
+    p = sub.add_parser("build-sanctions", help="construit l'index local OpenSanctions")
+    p.add_argument("src", help="export FollowTheMoney JSON lines (.gz accepté)")
+    p.add_argument("--db", default=None, help="fichier SQLite cible (défaut : $INTELCORP_SANCTIONS_DB)")
+    p = sub.add_parser("update-sanctions", help="applique un fichier delta OpenSanctions")
+    p.add_argument("src", help="delta JSON lines (.gz accepté)")
+    p.add_argument("--db", default=None, help="fichier SQLite (défaut : $INTELCORP_SANCTIONS_DB)")
+    p = sub.add_parser("batch", help="screening d'un fichier de contreparties → JSONL")
+    p.add_argument("src", help="CSV ou JSONL avec colonnes nom/name et pays/country")
+    p.add_argument("-o", "--out", required=True, help="fichier JSONL de sortie (sert aussi de checkpoint)")
+    p.add_argument("-w", "--workers", type=int, default=4, help="contreparties traitées en parallèle")
+    p.add_argument("--sources", default=",".join(BATCH_SOURCES), help="sources à interroger (live,ai,sanctions,pep,graph)")
+    p.add_argument("--budget", type=float, default=120, help="budget en secondes par contrepartie")
+    p.add_argument("--rate", action="append", default=[], metavar="SOURCE=N",
+        help="limite d'appels/s par fournisseur, ex : --rate groq=0.5 --rate opencorporates=2")
+    p = sub.add_parser("watch", help="watchlist : ajout, passe de screening, alertes")
+    p.add_argument("action", choices=("add", "run", "alerts"))
+    p.add_argument("src", nargs="?", help="add : CSV ou JSONL (nom, pays, dirigeants séparés par « ; »)")
+    p.add_argument("--loop", type=int, default=0, metavar="S", help="run : une passe toutes les S secondes")
+    p.add_argument("--all", action="store_true", help="alerts : y compris les entités retirées des listes")
+    p.add_argument("--db", default=None, help="fichier SQLite (défaut : $INTELCORP_WATCH_DB)")
+    p = sub.add_parser("history", help="versions d'un dossier et changements de l'une à l'autre")
+    p.add_argument("nom", help="raison sociale")
+    p.add_argument("--pays", default="", help="code juridiction complet (fr, us_de…), comme dans le fichier batch")
+    p.add_argument("--numero", default="", help="numéro d'immatriculation")
+    p.add_argument("--db", default=None, help="fichier SQLite (défaut : $INTELCORP_DOSSIER_DB)")
+    args = parser.parse_args(argv)
+
+    t = time.time()
+    if args.cmd == "build-registry":
+        n = build_registry(args.src, args.db)
+        print(f"✓ {n} sociétés indexées en {time.time() - t:.1f}s")
+    elif args.cmd == "build-sanctions":
+        n = build_sanctions(args.src, args.db)
+        print(f"✓ {n} entités indexées en {time.time() - t:.1f}s")
+    elif args.cmd == "update-sanctions":
+        c = update_sanctions(args.src, args.db)
+        print(f"✓ +{c['ADD']} ~{c['MOD']} -{c['DEL']} en {time.time() - t:.1f}s")
+    elif args.cmd == "batch":
+        for spec in args.rate:
+            provider, _, rate = spec.partition("=")
+            GUARDS[provider.strip()] = make_guard(provider.strip(), float(rate))
+        run_batch(args.src, args.out, args.workers, tuple(args.sources.split(",")), args.budget)
+    elif args.cmd == "watch":
+        if not (args.db or WATCH_DB):
+            parser.error("watchlist non configurée : INTELCORP_WATCH_DB ou --db")
+        watch = Watchlist(args.db or WATCH_DB)
+        if args.action == "add":
+            if not args.src:
+                parser.error("watch add : fichier source requis")
+            print(f"✓ {watch.import_file(args.src)} sociétés surveillées")
+        elif args.action == "run" and args.loop:
+            _watch_loop(watch, args.loop)
+        elif args.action == "run":
+            alerts = watch_pass(watch)
+            print(f"✓ passe terminée en {time.time() - t:.1f}s · {len(alerts)} nouvelle(s) alerte(s)")
+        else:
+            for a in watch.alerts(active=not args.all):
+                who = f"{a['nom']} [{a['societe']}]" if a["societe"] else a["nom"]
+                gone = f"  (retirée le {datetime.fromtimestamp(a['removed']):%d/%m/%Y})" if a["removed"] else ""
+                print(f"{datetime.fromtimestamp(a['ts']):%d/%m/%Y %H:%M}  {who}  →  {a['caption']} ({a['entity_id']}, {a['score']:.2f}){gone}")
+    elif args.cmd == "history":
+        if not (args.db or DOSSIER_DB):
+            parser.error("historique non configuré : INTELCORP_DOSSIER_DB ou --db")
+        store = DossierStore(args.db or DOSSIER_DB)
+        for v, sources, changes in store.timeline(entity_key(args.nom, args.pays, args.numero)):
+            print(f"v{v['version']}  {datetime.fromtimestamp(v['ts']):%d/%m/%Y %H:%M}  {v['nom']}  ← {', '.join(sources)}")
+            for c in changes:
+                moves = [f"+{n}" for n in c.get("ajouts", [])] + [f"-{n}" for n in c.get("retraits", [])]
+                detail = f"{c['avant']} → {c['apres']}" if c.get("avant") else ""
+                print(f"    {c['champ']} : {' '.join([detail, *moves]).strip()}")
+    else:
+        serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# le module est à la racine du dépôt (application en un seul fichier)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
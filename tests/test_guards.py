@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import intelcorp_v2 as ic
+
+
+# ── SCREENING ────────────────────────────────────────────────
+
+def test_screen_score_ignores_word_order():
+    assert ic.screen_score("igor sechin", "sechin igor") == 1.0
+
+
+def test_screen_score_tolerates_transliteration():
+    assert ic.screen_score("igor setchine", "igor sechin") >= ic.SCREEN_MIN
+    assert ic.screen_score("igor sechin", "igor ivanovich sechin") < 1.0  # mot en trop pénalisé
+    assert ic.screen_score("vitol", "glencore") < 0.5
+    assert ic.screen_score("", "vitol") == 0.0
+
+
+def test_name_key_drops_legal_forms():
+    assert ic.name_key("Vitol SA") == "vitol"
+    assert ic.name_key("Glencore International AG") == "glencore international"
+    assert ic.name_key("Ltd") == "ltd"  # rien d'autre : on garde le nom tel quel
+
+
+# ── DISJONCTEUR ET QUOTA ─────────────────────────────────────
+
+@pytest.fixture
+def guard(monkeypatch):
+    monkeypatch.setattr(ic, "BREAKER_FAILS", 3)
+    monkeypatch.setattr(ic, "BREAKER_COOLDOWN", 0.05)
+    return ic.Guard("test")
+
+
+def test_breaker_opens_after_consecutive_failures(guard):
+    for _ in range(2):
+        guard.failure()
+    guard.reserve()
+    guard.failure()
+    assert guard.is_open()
+    with pytest.raises(ic.CircuitOpen):
+        guard.reserve()
+
+
+def test_breaker_half_open_lets_one_probe_through(guard):
+    for _ in range(3):
+        guard.failure()
+    time.sleep(0.06)
+    guard.reserve()  # la sonde passe…
+    with pytest.raises(ic.CircuitOpen):
+        guard.reserve()  # …les autres attendent son verdict
+    guard.success()
+    assert not guard.is_open()
+    guard.reserve()
+
+
+def test_breaker_success_resets_failures(guard):
+    guard.failure()
+    guard.failure()
+    guard.success()
+    guard.failure()
+    assert not guard.is_open()
+
+
+def test_quota_rejects_interactive_wait_and_halves_on_429():
+    guard = ic.Guard("test", rate=1.0)
+    assert guard.reserve() == 0
+    with pytest.raises(ic.CircuitOpen) as e:
+        guard.reserve(max_wait=0.1)
+    assert e.value.reason == "quota"
+    guard.failure(throttled=True)
+    assert guard._mem["rate"] == 0.5
+    guard.success()
+    assert guard._mem["rate"] == 0.5 + 1.0 / 8
+
+
+# ── FAN-OUT ──────────────────────────────────────────────────
+
+def test_fan_out_reports_late_and_failed_calls():
+    res, missing = ic.fan_out({"ok": (lambda: 1,), "lent": (time.sleep, 0.5), "boom": (lambda: 1 / 0,)}, 0.2)
+    assert res == {"ok": 1} and missing == ["lent", "boom"]
+
+
+def test_fan_out_passes_deadline_to_calls():
+    def late():
+        time.sleep(0.15)
+        return ic.budget_left()
+    res, missing = ic.fan_out({"left": (ic.budget_left,), "late": (late,)}, 0.1)
+    assert 0 < res["left"] <= 0.1 and missing == ["late"]
+    assert ic.budget_left() is None  # hors fan_out : pas d'échéance
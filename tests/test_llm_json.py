@@ -0,0 +1,61 @@
+import pytest
+
+import intelcorp_v2 as ic
+
+
+def test_repair_json_closes_truncated_output():
+    # coupé en plein milieu d'une chaîne (max_tokens) : on garde les valeurs complètes
+    text = '{"nom_complet": "Vitol SA", "filiales": ["Vitol Asia", "Vitol Ba'
+    assert ic._repair_json(text) == {"nom_complet": "Vitol SA", "filiales": ["Vitol Asia"]}
+
+
+def test_repair_json_ignores_brackets_inside_strings():
+    text = '{"description": "négoce {pétrole, gaz}", "verdict": "ok", "red_flags": [{"titre": "x"'
+    assert ic._repair_json(text) == {"description": "négoce {pétrole, gaz}", "verdict": "ok"}
+
+
+def test_repair_json_gives_up_without_complete_value():
+    with pytest.raises(ValueError):
+        ic._repair_json('{"nom_complet": "Vit')
+
+
+def test_parse_llm_json_strips_fences_and_prose():
+    assert ic.parse_llm_json('Voici :\n```json\n{"pays": "CH"}\n```') == ({"pays": "CH"}, False)
+    assert ic.parse_llm_json('réponse : {"pays": "CH"}') == ({"pays": "CH"}, False)
+
+
+def test_parse_llm_json_flags_repaired_output():
+    data, repaired = ic.parse_llm_json('{"pays": "CH", "ville_siege": "Gen')
+    assert data == {"pays": "CH"} and repaired
+
+
+def test_parse_llm_json_without_json():
+    with pytest.raises(ValueError):
+        ic.parse_llm_json("désolé, je ne sais pas")
+
+
+def test_dossier_coerces_llm_values():
+    dossier = ic.Dossier.model_validate({
+        "score_risque": "55/100", "niveau_risque": "élevée", "produits_services": "pétrole brut",
+        "red_flags": [{"niveau": " ROUGE ", "titre": "PEP"}],
+    })
+    assert dossier.score_risque == 55
+    assert dossier.niveau_risque == "ELEVE"
+    assert dossier.red_flags[0].niveau == "rouge"
+
+
+def test_dossier_clamps_score():
+    assert ic.Dossier.model_validate({"score_risque": 250}).score_risque == 100
+    assert ic.Dossier.model_validate({"score_risque": None}).score_risque == 0
+
+
+def test_validate_dossier_drops_invalid_fields():
+    dossier, dropped = ic.validate_dossier({"nom_complet": "Vitol", "niveau_risque": "CATASTROPHIQUE",
+                                            "red_flags": [{"niveau": "violet"}]})
+    assert dropped == {"niveau_risque", "red_flags"}
+    assert dossier.nom_complet == "Vitol" and dossier.niveau_risque == "" and dossier.red_flags == []
+
+
+def test_validate_dossier_rejects_non_object():
+    with pytest.raises(ValueError):
+        ic.validate_dossier(["pas", "un", "objet"])
@@ -0,0 +1,144 @@
+import time
+
+import pytest
+
+import intelcorp_v2 as ic
+
+
+# ── FILE DE JOBS ─────────────────────────────────────────────
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setitem(ic.JOB_TASKS, "echo", lambda *args: {"args": list(args)})
+    monkeypatch.setitem(ic.JOB_TASKS, "boom", lambda: 1 / 0)
+    return ic.SqliteQueue(str(tmp_path / "jobs.db"), workers=0, maxsize=3)  # sans thread : on réclame à la main
+
+
+def _run_one(queue):
+    job_id, task, args = queue._claim()
+    result = ic.json.dumps(ic.JOB_TASKS[task](*ic.json.loads(args)))
+    queue._db().execute("UPDATE jobs SET status='done', result=?, finished=? WHERE id=?", (result, time.time(), job_id))
+    return job_id
+
+
+def test_queue_merges_identical_jobs(queue):
+    first = queue.submit("echo", "Vitol", "ch")
+    assert queue.submit("echo", "Vitol", "ch") == first
+    assert queue.submit("echo", "Trafigura", "ch") != first
+    assert queue.get(first) == {"status": "queued", "result": None}
+
+
+def test_queue_claims_in_order_and_returns_result(queue):
+    first, second = queue.submit("echo", "a"), queue.submit("echo", "b")
+    assert _run_one(queue) == first
+    assert queue.get(first) == {"status": "done", "result": {"args": ["a"]}}
+    assert queue.get(second)["status"] == "queued"
+    assert queue.get("inconnu") == {"status": None, "result": None}
+
+
+def test_queue_full(queue):
+    for i in range(3):
+        queue.submit("echo", i)
+    with pytest.raises(ic.QueueFull):
+        queue.submit("echo", 99)
+
+
+def test_queue_resumes_abandoned_job(queue):
+    # job « running » d'un worker mort : repris après JOB_TIMEOUT, pas avant
+    job_id = queue.submit("echo", "x")
+    assert queue._claim()[0] == job_id
+    assert queue._claim() is None
+    queue._db().execute("UPDATE jobs SET started=? WHERE id=?", (time.time() - ic.JOB_TIMEOUT - 1, job_id))
+    assert queue._claim()[0] == job_id
+
+
+def test_queue_worker_records_errors(queue):
+    worker = ic.SqliteQueue(queue.path, workers=1)
+    job_id = worker.submit("boom")
+    deadline = time.time() + 5
+    while worker.get(job_id)["status"] != "error" and time.time() < deadline:
+        time.sleep(0.05)
+    assert worker.get(job_id) == {"status": "error", "result": None}
+
+
+# ── HISTORIQUE DES DOSSIERS ──────────────────────────────────
+
+SANCTIONS_0 = [0, []]
+SANCTIONS_1 = [1, [{"caption": "Vitol Sanctioned Ltd"}]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ic.DossierStore(str(tmp_path / "dossiers.db"))
+
+
+def test_store_records_versions_and_changes(store):
+    assert store.record("ch|vitol", "Vitol", {"sanctions": SANCTIONS_0, "ai:identite": {"adresse": "Genève"}}) == (1, [])
+    version, changes = store.record("ch|vitol", "Vitol", {"sanctions": SANCTIONS_1})
+    assert version == 2
+    assert changes == [{"champ": "OpenSanctions · sociétés", "ajouts": ["Vitol Sanctioned Ltd"], "retraits": [],
+                        "avant": "0 hit(s)", "apres": "1 hit(s)"}]
+    latest = store.versions("ch|vitol")[0]
+    assert set(latest["sources"]) == {"sanctions", "ai:identite"}  # source non recollectée reprise
+
+
+def test_store_skips_duplicate_record(store):
+    collected = {"sanctions": SANCTIONS_0, "pep": SANCTIONS_0}
+    assert store.record("ch|vitol", "Vitol", collected) == (1, [])
+    assert store.record("ch|vitol", "Vitol", dict(collected)) == (1, [])
+    assert len(store.versions("ch|vitol")) == 1
+
+
+def test_store_fresh_drops_expired_sources(store, monkeypatch):
+    store.record("ch|vitol", "Vitol", {"sanctions": SANCTIONS_0, "ai:reputation": {"reputation": {}}})
+    monkeypatch.setitem(ic.SECTION_TTL, "reputation", -1)
+    prev, fresh = store.fresh("ch|vitol")
+    assert prev["version"] == 1 and set(fresh) == {"sanctions"}
+    assert store.fresh("inconnue") == (None, {})
+
+
+def test_store_timeline(store):
+    store.record("ch|vitol", "Vitol", {"ai:risque": {"niveau_risque": "FAIBLE"}})
+    store.record("ch|vitol", "Vitol", {"ai:risque": {"niveau_risque": "ELEVE"}})
+    (v1, src1, ch1), (v2, src2, ch2) = store.timeline("ch|vitol")
+    assert (v1["version"], src1, ch1) == (1, ["ai:risque"], [])
+    assert ch2 == [{"champ": "Niveau de risque", "avant": "FAIBLE", "apres": "ELEVE"}]
+
+
+def test_diff_versions_compares_lists_by_name():
+    old = {"ai:gouvernance": {"dirigeants": [{"nom": "Russell Hardy"}, {"nom": "Ian Taylor"}]}}
+    new = {"ai:gouvernance": {"dirigeants": [{"nom": "RUSSELL HARDY"}, {"nom": "Javier Blas"}]}}
+    assert ic.diff_versions(old, new) == [{"champ": "Dirigeants", "ajouts": ["Javier Blas"], "retraits": ["Ian Taylor"]}]
+
+
+def test_diff_versions_ignores_case_and_missing_fields():
+    old = {"ai:identite": {"adresse": "Rue du Rhône 1, Genève"}}
+    assert ic.diff_versions(old, {"ai:identite": {"adresse": "rue du rhone 1,  genève"}}) == []
+    assert ic.diff_versions(old, {"ai:identite": {"pays": "CH"}}) == []
+
+
+# ── CACHE ────────────────────────────────────────────────────
+
+def test_cache_evicts_least_recently_used():
+    cache = ic.Cache(maxsize=2)
+    cache.set("ns", "a", 1, 60)
+    cache.set("ns", "b", 2, 60)
+    cache.get("ns", "a")
+    cache.set("ns", "c", 3, 60)
+    assert [cache.get("ns", k) for k in "abc"] == [(True, 1), (False, None), (True, 3)]
+
+
+def test_cache_promotes_sqlite_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ic.Cache(path=path).set("ns", "k", {"v": 1}, 60)
+    cache = ic.Cache(path=path)  # autre worker : mémoire vide, même fichier
+    assert cache.peek("ns", "k") == (False, None)
+    assert cache.get("ns", "k") == (True, {"v": 1})
+    assert cache.peek("ns", "k") == (True, {"v": 1})
+
+
+def test_cache_keeps_stale_entries(tmp_path):
+    cache = ic.Cache(path=str(tmp_path / "cache.db"))
+    cache.set("ns", "k", "ancien", -1)
+    assert cache.get("ns", "k") == (False, None)
+    assert ic.Cache(path=cache.path).get_stale("ns", "k") == "ancien"